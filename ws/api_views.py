@@ -19,10 +19,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView, ListView, View
 from django.views.generic.detail import SingleObjectMixin
 
+import ws.signups as signup_service
 import ws.utils.geardb as geardb_utils
 import ws.utils.membership as membership_utils
 import ws.utils.perms as perm_utils
-import ws.utils.signups as signup_utils
 from ws import enums, models
 from ws.decorators import group_required
 from ws.middleware import RequestWithParticipant
@@ -205,10 +205,9 @@ class AdminTripSignupsView(
         maximum_participants: int | None,
     ) -> None:
         """Take parsed input data and apply the changes."""
+        # (Either change locks the trip, so that signups can't change meanwhile)
         if maximum_participants:
-            trip.maximum_participants = maximum_participants
-            trip.full_clean()  # Raises ValidationError
-            trip.save()
+            signup_service.resize(trip, maximum_participants)  # Raises ValidationError
         # Anything already on should be waitlisted
         self.update_signups(signup_list, trip)
 
@@ -216,7 +215,7 @@ class AdminTripSignupsView(
     def signups_to_update(
         signup_list: list[JsonSignup],
         trip: models.Trip,
-    ) -> tuple[QuerySet[models.SignUp], QuerySet[models.SignUp]]:
+    ) -> tuple[list[models.SignUp], QuerySet[models.SignUp]]:
         """From the payload, break signups into deletion & those that stay.
 
         All signups are given (in order) in `signup_list`. If the `deleted` key
@@ -231,47 +230,20 @@ class AdminTripSignupsView(
         deletions = [s["id"] for s in signup_list if s.get("deleted")]
         normal_signups = [s["id"] for s in signup_list if not s.get("deleted")]
 
-        # Use raw SQL to maintain the original list order in our QuerySet
-        ordering = " ".join(
-            f"when ws_signup.id={pk} then {i}" for i, pk in enumerate(normal_signups)
+        signups_by_pk = trip.signup_set.select_related("waitlistsignup").in_bulk(
+            normal_signups
         )
-
-        # Return unevaluated QuerySet objects (allows update() and all() calls)
-        keep_on_trip = (
-            trip.signup_set.filter(pk__in=normal_signups)
-            .extra(  # noqa: S610
-                select={"ordering": f"case {ordering} end"},
-                order_by=("ordering",),
-            )
-            .select_related("waitlistsignup")
-        )
-        to_delete = trip.signup_set.filter(pk__in=deletions)
-
-        if keep_on_trip.count() != len(normal_signups):
+        if len(signups_by_pk) != len(normal_signups):
             raise ValidationError("At least one passed ID no longer exists!")
+        keep_on_trip = [signups_by_pk[pk] for pk in normal_signups]
+        to_delete = trip.signup_set.filter(pk__in=deletions)
 
         return (keep_on_trip, to_delete)
 
     def update_signups(self, signup_list: list[JsonSignup], trip: models.Trip) -> None:
-        """Mark all signups as not on trip, then add signups in order."""
+        """Delete removed signups, then place the others in order."""
         keep_on_trip, to_delete = self.signups_to_update(signup_list, trip)
-
-        # Clear the trip first (delete removals, set others to not on trip)
-        # Both methods (update and skip_signals) ignore waitlist-bumping
-        keep_on_trip.update(on_trip=False)
-        for kill_signup in to_delete:
-            # Setting properties dynamically on an object is a huge anti-pattern.
-            # *Almost* as bad as using Django signals in the first place...
-            # Hopefully we change this at a later date.
-            kill_signup.skip_signals = True  # type: ignore[attr-defined]
-            kill_signup.delete()
-
-        # `all()` hits the db, will fetch current (`on_trip=False`) signups
-        ordered_signups = keep_on_trip.all()
-
-        for order, signup in enumerate(ordered_signups):
-            signup_utils.trip_or_wait(signup, trip_must_be_open=False)
-            signup_utils.next_in_order(signup, order)
+        signup_service.reorder(trip, keep_on_trip, removed=to_delete)
 
     def get_signups(self) -> QuerySet[models.SignUp]:
         """Trip signups with selected models for use in describe_signup.
@@ -358,7 +330,7 @@ class LeaderParticipantSignupView(
                     {"message": f"{par.name} is already on the {queue}"}, status=409
                 )
 
-        signup = signup_utils.trip_or_wait(signup)
+        signup = signup_service.sign_up(signup)
 
         trip_participants = {
             s.participant
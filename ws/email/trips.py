@@ -4,10 +4,10 @@ from django.template.loader import get_template
 
 import ws.utils.dates as date_utils
 from ws import models
-from ws.templatetags.trip_tags import AnnotatedTrip, annotated_for_trip_list
+from ws.templatetags.trip_tags import annotated_for_trip_list
 
 
-def _eligible_trips() -> QuerySet[AnnotatedTrip]:
+def _eligible_trips() -> QuerySet[models.Trip]:
     """Identify all trips that are open for signups, or will be."""
     now = date_utils.local_now()
 
@@ -0,0 +1,231 @@
+"""Rush a first-come, first-serve trip with concurrent signups (and drops).
+
+When a popular trip opens, many participants sign up at the very same moment.
+This load test reproduces that rush: a trip & participants are created with the
+test factories, then a pool of threads signs participants up (and has some of
+them drop) through the real signup views, each thread with its own connection.
+
+Since every worker must see what the others commit, nothing can be rolled back.
+The rush must run against a disposable database (the management command
+creates, then destroys, a test database).
+
+Once the rush is over, the trip is checked:
+
+- it never had more participants than `maximum_participants`
+- participants were placed (then waitlisted) in the order they signed up
+
+Latency of each request (p50/p95/p99) is reported, as is time spent waiting
+for the trip's row lock.
+"""
+
+import queue
+import random
+import statistics
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import Any, NamedTuple
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from ws import enums, models
+from ws.lottery.benchmark import MD5_HASHER, current_commit
+from ws.tests import factories
+
+
+class Rush(NamedTuple):
+    """How many participants rush a single trip."""
+
+    signups: int
+    drops: int  # Participants who drop right after signing up
+    workers: int  # Concurrent requests
+    trip_size: int
+
+
+RUSHES: dict[str, Rush] = {
+    "small": Rush(signups=50, drops=10, workers=8, trip_size=12),
+    "medium": Rush(signups=200, drops=30, workers=16, trip_size=20),
+    "large": Rush(signups=500, drops=50, workers=32, trip_size=40),
+}
+
+
+class _Task(NamedTuple):
+    client: Client
+    participant: models.Participant
+    drops: bool
+
+
+class LockTimer:
+    """Time every query that locks rows (installed on each worker's connection)."""
+
+    def __init__(self) -> None:
+        self.waits: list[float] = []
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        if "FOR UPDATE" not in sql:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.waits.append(time.perf_counter() - start)
+
+
+def percentiles(seconds: Sequence[float]) -> dict[str, float | int | None]:
+    """Summarize durations (in milliseconds)."""
+    if not seconds:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+    ms = [1000 * duration for duration in seconds]
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms
+    return {
+        "count": len(ms),
+        "p50": cuts[min(49, len(cuts) - 1)],
+        "p95": cuts[min(94, len(cuts) - 1)],
+        "p99": cuts[min(98, len(cuts) - 1)],
+    }
+
+
+def problems_with(trip: models.Trip, peak_on_trip: int) -> list[str]:
+    """Describe any way in which the trip was not first-come, first-serve."""
+    problems = []
+    if peak_on_trip > trip.maximum_participants:
+        problems.append(
+            f"{peak_on_trip} participants were on a trip for "
+            f"{trip.maximum_participants}"
+        )
+
+    remaining = list(trip.signup_set.order_by("time_created", "pk"))
+    on_trip = [signup for signup in remaining if signup.on_trip]
+    if on_trip != remaining[: len(on_trip)]:
+        problems.append("Later signups were placed before earlier signups")
+    if len(on_trip) < min(len(remaining), trip.maximum_participants):
+        problems.append("Spots on the trip were left open")
+    if list(trip.waitlist.signups) != remaining[len(on_trip) :]:
+        problems.append("The waitlist is not in the order of signup")
+    return problems
+
+
+def _create_rush(rush: Rush, seed: int) -> tuple[models.Trip, list[_Task]]:
+    rng = random.Random(seed)
+    trip = factories.TripFactory.create(
+        name="Popular trip",
+        algorithm="fcfs",
+        program=enums.Program.CLIMBING.value,
+        maximum_participants=rush.trip_size,
+        let_participants_drop=True,
+    )
+    participants = [
+        factories.ParticipantFactory.create(name=f"Participant {i}")
+        for i in range(rush.signups)
+    ]
+    dropping = {par.pk for par in rng.sample(participants, rush.drops)}
+
+    tasks = []
+    for par in participants:
+        client = Client()
+        client.force_login(par.user)
+        tasks.append(_Task(client, par, drops=par.pk in dropping))
+    return trip, tasks
+
+
+def _work(
+    trip: models.Trip,
+    tasks: "queue.SimpleQueue[_Task]",
+    lock_timer: LockTimer,
+    latencies: dict[str, list[float]],
+    errors: list[str],
+) -> None:
+    """Sign up (and possibly drop) participants until no tasks remain."""
+    try:
+        with connection.execute_wrapper(lock_timer):
+            while True:
+                try:
+                    task = tasks.get_nowait()
+                except queue.Empty:
+                    return
+
+                start = time.perf_counter()
+                resp = task.client.post(reverse("trip_signup"), {"trip": trip.pk})
+                latencies["signup"].append(time.perf_counter() - start)
+                if resp.status_code != 302:
+                    errors.append(f"Signup for {task.participant} failed")
+                    continue
+                if not task.drops:
+                    continue
+
+                signup = models.SignUp.objects.get(
+                    trip=trip, participant=task.participant
+                )
+                start = time.perf_counter()
+                resp = task.client.post(reverse("delete_signup", args=(signup.pk,)))
+                latencies["drop"].append(time.perf_counter() - start)
+                if resp.status_code != 302:
+                    errors.append(f"Drop for {task.participant} failed")
+    finally:
+        connection.close()
+
+
+def _watch_trip(trip: models.Trip, done: threading.Event, peak: list[int]) -> None:
+    """Record the most participants ever seen on the trip."""
+    try:
+        while not done.wait(0.001):
+            on_trip = models.SignUp.objects.filter(trip=trip, on_trip=True).count()
+            peak[0] = max(peak[0], on_trip)
+    finally:
+        connection.close()
+
+
+def rush_trip(rush: Rush, seed: int = 0) -> dict[str, Any]:
+    """Rush a new trip with concurrent signups, returning a JSON-serializable report.
+
+    Everything is committed: only run this against a disposable database!
+    """
+    # Every participant gets a user (hashing passwords with MD5, so creation is fast)
+    with override_settings(PASSWORD_HASHERS=[MD5_HASHER]):
+        trip, task_list = _create_rush(rush, seed)
+    tasks: queue.SimpleQueue[_Task] = queue.SimpleQueue()
+    for task in task_list:
+        tasks.put(task)
+
+    lock_timer = LockTimer()
+    latencies: dict[str, list[float]] = {"signup": [], "drop": []}
+    errors: list[str] = []
+    peak = [0]
+    done = threading.Event()
+    watcher = threading.Thread(target=_watch_trip, args=(trip, done, peak))
+    workers = [
+        threading.Thread(
+            target=_work, args=(trip, tasks, lock_timer, latencies, errors)
+        )
+        for _ in range(rush.workers)
+    ]
+
+    start = time.perf_counter()
+    watcher.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+    done.set()
+    watcher.join()
+
+    trip.refresh_from_db()
+    return {
+        "commit": current_commit(),
+        "rush": rush._asdict(),
+        "seconds": seconds,
+        "requests": {kind: percentiles(times) for kind, times in latencies.items()},
+        "lock_waits": percentiles(lock_timer.waits),
+        "peak_on_trip": peak[0],
+        "problems": errors + problems_with(trip, peak[0]),
+    }
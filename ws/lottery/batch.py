@@ -0,0 +1,109 @@
+"""Run lotteries for many single trips at once, once their signups close.
+
+Many trips tend to close at the same time (e.g. midnight before a busy
+weekend). Rather than scheduling a task for each trip, we periodically collect
+every trip whose signups have closed, then run their lotteries in batches.
+
+Trips which share no participants are independent, so they may be run in
+separate batches (in parallel, by different workers). Each batch loads the
+lottery preferences of all its participants just once.
+"""
+
+from collections.abc import Collection, Mapping
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+from ws import enums, models
+from ws.lottery.run import SingleTripLotteryRunner
+from ws.utils.dates import local_now
+
+
+def closed_lottery_trips(now: datetime | None = None) -> QuerySet[models.Trip]:
+    """Return upcoming trips whose lottery should be run (WS runs its own).
+
+    Past trips are never run, even if left in lottery mode.
+    """
+    now = now or local_now()
+    return models.Trip.objects.filter(
+        algorithm="lottery",
+        signups_close_at__lte=now,
+        trip_date__gte=now.date(),
+    ).exclude(program=enums.Program.WINTER_SCHOOL.value)
+
+
+def independent_batches(trip_ids: Collection[int]) -> list[list[int]]:
+    """Group trips so that no participant is signed up for trips in two batches.
+
+    Trips are ordered by ID within each batch, and batches by their first trip.
+    """
+    # Union-find, where each trip starts in its own batch
+    parent: dict[int, int] = {trip_id: trip_id for trip_id in trip_ids}
+
+    def root(trip_id: int) -> int:
+        while parent[trip_id] != trip_id:
+            parent[trip_id] = parent[parent[trip_id]]
+            trip_id = parent[trip_id]
+        return trip_id
+
+    first_trip_by_participant: dict[int, int] = {}
+    for trip_id, participant_id in models.SignUp.objects.filter(
+        trip_id__in=trip_ids
+    ).values_list("trip_id", "participant_id"):
+        other_trip_id = first_trip_by_participant.setdefault(participant_id, trip_id)
+        parent[root(trip_id)] = root(other_trip_id)
+
+    batches: dict[int, list[int]] = {}
+    for trip_id in sorted(trip_ids):
+        batches.setdefault(root(trip_id), []).append(trip_id)
+    return list(batches.values())
+
+
+def load_lottery_infos(trip_ids: Collection[int]) -> dict[int, models.LotteryInfo]:
+    """Load preferences for everybody signed up for any of the trips."""
+    return {
+        info.participant_id: info
+        for info in models.LotteryInfo.objects.filter(
+            participant__signup__trip_id__in=trip_ids
+        )
+        .select_related("paired_with")
+        .distinct()
+    }
+
+
+class BatchedSingleTripLotteryRunner(SingleTripLotteryRunner):
+    """Run one trip's lottery with preferences loaded for the whole batch."""
+
+    def __init__(
+        self,
+        trip: models.Trip,
+        lottery_infos: Mapping[int, models.LotteryInfo],
+    ) -> None:
+        # Preferences of participants on other trips are just never consulted.
+        self.lottery_infos = lottery_infos
+        super().__init__(trip)
+
+
+def run_batch(trip_ids: Collection[int]) -> list[int]:
+    """Run the lottery for each trip (idempotent), returning trips actually run.
+
+    Just like `ws.tasks.run_lottery`, each trip is locked while its lottery
+    runs, and trips no longer in lottery mode are left alone. Trips which
+    are locked by another worker (most likely running the same lottery)
+    are skipped.
+    """
+    lottery_infos = load_lottery_infos(trip_ids)
+    ran: list[int] = []
+    for trip_id in trip_ids:
+        with transaction.atomic():
+            trip = (
+                models.Trip.objects.select_for_update(skip_locked=True)
+                .filter(pk=trip_id, algorithm="lottery")
+                .first()
+            )
+            if trip is None:
+                continue
+            BatchedSingleTripLotteryRunner(trip, lottery_infos)()
+            ran.append(trip_id)
+    return ran
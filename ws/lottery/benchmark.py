@@ -0,0 +1,294 @@
+"""Measure how long the Winter School lottery takes, and how many queries it makes.
+
+A synthetic Winter School week is generated with the test factories (at a
+chosen scale), the lottery is run against it, and everything is then rolled
+back. Each phase of the run (ranking, placement, and converting trips to
+first-come, first-serve) is timed separately, with the number of queries made.
+
+Results are plain JSON, so runs from different commits may be compared.
+"""
+
+import contextlib
+import logging
+import random
+import subprocess
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple
+
+from django.db import transaction
+from django.test import override_settings
+from mitoc_const import affiliations
+
+from ws import enums, models
+from ws.lottery.ledger import DRIVER_CAR_STATUSES
+from ws.lottery.run import InMemoryWinterSchoolLotteryRunner, WinterSchoolLotteryRunner
+from ws.tests import factories
+from ws.utils.dates import local_now
+from ws.utils.signups import signups_changed
+
+MD5_HASHER = "django.contrib.auth.hashers.MD5PasswordHasher"
+
+# Roughly how Winter School participants have been affiliated in past years
+AFFILIATION_WEIGHTS: dict[str, int] = {
+    affiliations.MIT_UNDERGRAD.CODE: 25,
+    affiliations.MIT_GRAD_STUDENT.CODE: 35,
+    affiliations.MIT_AFFILIATE.CODE: 5,
+    affiliations.MIT_ALUM.CODE: 10,
+    affiliations.NON_MIT_UNDERGRAD.CODE: 5,
+    affiliations.NON_MIT_GRAD_STUDENT.CODE: 5,
+    affiliations.NON_AFFILIATE.CODE: 15,
+}
+
+
+class Scale(NamedTuple):
+    """How large a Winter School week to generate."""
+
+    participants: int
+    trips: int
+
+    # Fraction of participants with each trait
+    drivers: float = 0.15
+    paired: float = 0.06  # (Reciprocally paired, so always an even number)
+    separated: float = 0.01
+    flaked: float = 0.05
+    attended: float = 0.3  # Attended a trip earlier in Winter School
+    adjusted: float = 0.005
+
+    # Participants rank between 1 and this many trips
+    max_choices: int = 5
+
+
+SCALES: dict[str, Scale] = {
+    "small": Scale(participants=500, trips=50),
+    "medium": Scale(participants=2000, trips=100),
+    "large": Scale(participants=5000, trips=200),
+}
+
+
+def generate_week(
+    scale: Scale,
+    execution_datetime: datetime,
+    seed: int = 0,
+) -> list[models.Trip]:
+    """Create a realistic Winter School week, returning its lottery trips.
+
+    Trips vary in popularity, so some are heavily oversubscribed. Participants
+    who are paired sign up for the same trips (in the same order). Past trips
+    give some participants attendance & flake history, and leaders a history
+    of leading trips.
+
+    The same seed always generates the same week.
+    """
+    rng = random.Random(seed)
+    lottery_date = execution_datetime.date()
+
+    leaders = [
+        factories.ParticipantFactory.create(name=f"Leader {i}")
+        for i in range(scale.trips)
+    ]
+    trips = []
+    for i in range(scale.trips):
+        trip = factories.TripFactory.create(
+            name=f"Lottery trip {i}",
+            algorithm="lottery",
+            program=enums.Program.WINTER_SCHOOL.value,
+            trip_date=lottery_date + timedelta(days=rng.choice([3, 4])),
+            maximum_participants=rng.randint(6, 14),
+            creator=leaders[i],
+        )
+        trip.leaders.add(leaders[i], rng.choice(leaders))
+        trips.append(trip)
+
+    # Earlier trips give participants a history (attended, flaked, or led)
+    past_trips = []
+    for i in range(max(scale.trips // 10, 1)):
+        past_trip = factories.TripFactory.create(
+            name=f"Past trip {i}",
+            algorithm="fcfs",
+            program=enums.Program.WINTER_SCHOOL.value,
+            trip_date=lottery_date - timedelta(days=rng.choice([3, 4])),
+            creator=leaders[i],
+        )
+        past_trip.leaders.add(leaders[i])
+        past_trips.append(past_trip)
+
+    participants = [
+        factories.ParticipantFactory.create(
+            name=f"Participant {i}",
+            affiliation=rng.choices(
+                list(AFFILIATION_WEIGHTS), weights=list(AFFILIATION_WEIGHTS.values())
+            )[0],
+        )
+        for i in range(scale.participants)
+    ]
+
+    def sample(fraction: float) -> list[models.Participant]:
+        return rng.sample(participants, round(fraction * len(participants)))
+
+    # Lottery preferences: drivers (including some leaders) & pairs
+    car_status: dict[int, str] = {par.pk: "none" for par in participants}
+    for par in sample(scale.drivers) + rng.sample(leaders, len(leaders) // 5):
+        car_status[par.pk] = rng.choice(sorted(DRIVER_CAR_STATUSES))
+    paired = sample(scale.paired)
+    partners: dict[int, models.Participant] = {}
+    for one, other in zip(paired[::2], paired[1::2], strict=False):
+        partners[one.pk], partners[other.pk] = other, one
+    models.LotteryInfo.objects.bulk_create(
+        factories.LotteryInfoFactory.build(
+            participant=par,
+            car_status=car_status[par.pk],
+            paired_with=partners.get(par.pk),
+        )
+        for par in [*participants, *leaders]
+        if par.pk in car_status
+    )
+
+    models.LotterySeparation.objects.bulk_create(
+        factories.LotterySeparationFactory.build(
+            creator=initiator, initiator=initiator, recipient=rng.choice(participants)
+        )
+        for initiator in sample(scale.separated)
+    )
+    models.LotteryAdjustment.objects.bulk_create(
+        factories.LotteryAdjustmentFactory.build(
+            creator=leaders[0],
+            participant=par,
+            expires=execution_datetime + timedelta(days=1),
+            adjustment=rng.choice([-1, 1]),
+        )
+        for par in sample(scale.adjusted)
+    )
+
+    # A few trips are much more popular than others (`paretovariate` is long-tailed)
+    popularity = {trip.pk: rng.paretovariate(1.5) for trip in trips}
+
+    def ranked_trips() -> list[models.Trip]:
+        """Pick some trips, more likely picking (and preferring) popular trips."""
+        weighted = sorted(
+            trips, key=lambda trip: rng.random() ** (1 / popularity[trip.pk])
+        )
+        return weighted[-rng.randint(1, scale.max_choices) :][::-1]
+
+    choices: dict[int, list[models.Trip]] = {}
+    for par in participants:
+        partner = partners.get(par.pk)
+        if partner and partner.pk in choices:
+            choices[par.pk] = choices[partner.pk]
+        else:
+            choices[par.pk] = ranked_trips()
+    models.SignUp.objects.bulk_create(
+        factories.SignUpFactory.build(participant=par, trip=trip, order=order)
+        for par in participants
+        for order, trip in enumerate(choices[par.pk], start=1)
+    )
+
+    past_signups = [
+        (par, rng.choice(past_trips))
+        for par in sample(scale.attended) + sample(scale.flaked)
+    ]
+    models.SignUp.objects.bulk_create(
+        factories.SignUpFactory.build(participant=par, trip=trip, on_trip=True)
+        for par, trip in dict(past_signups).items()
+    )
+    signups_changed(trip_ids=[trip.pk for trip in [*trips, *past_trips]])
+    models.Feedback.objects.bulk_create(
+        factories.FeedbackFactory.build(
+            participant=par,
+            trip=trip,
+            leader=leaders[0],
+            showed_up=False,
+            comments="Did not show up",
+        )
+        for par, trip in past_signups[round(scale.attended * len(participants)) :]
+    )
+    return trips
+
+
+class BenchmarkedLotteryRunner(WinterSchoolLotteryRunner):
+    def configure_logger(self) -> None:
+        """Write no log file (the handler is still closed after running)."""
+        self.handler = logging.NullHandler()
+
+
+class BenchmarkedInMemoryLotteryRunner(InMemoryWinterSchoolLotteryRunner):
+    def configure_logger(self) -> None:
+        """Write no log file (the handler is still closed after running)."""
+        self.handler = logging.NullHandler()
+
+
+def current_commit() -> str | None:
+    """Return the commit being benchmarked, if known."""
+    with contextlib.suppress(OSError):
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    return None
+
+
+def benchmark(scale: Scale, in_memory: bool = False, seed: int = 0) -> dict[str, Any]:
+    """Run the lottery on a generated week, then roll back all changes.
+
+    Returns a JSON-serializable summary of time spent & queries made per phase.
+    """
+    execution_datetime = local_now()
+    runner_class = (
+        BenchmarkedInMemoryLotteryRunner if in_memory else BenchmarkedLotteryRunner
+    )
+    with transaction.atomic():
+        # Every participant gets a user (hashing passwords with MD5, for speed)
+        with override_settings(PASSWORD_HASHERS=[MD5_HASHER]):
+            trips = generate_week(scale, execution_datetime, seed)
+        runner = runner_class(execution_datetime)
+        runner()
+        signups = models.SignUp.objects.filter(trip__in=trips)
+        outcome = {
+            "signups": signups.count(),
+            "placed": signups.filter(on_trip=True).count(),
+            "waitlisted": signups.filter(waitlistsignup__isnull=False).count(),
+            "unplaced": signups.filter(
+                on_trip=False, waitlistsignup__isnull=True
+            ).count(),
+        }
+        transaction.set_rollback(True)
+
+    return {
+        "commit": current_commit(),
+        "recorded_at": execution_datetime.isoformat(),
+        "runner": "in_memory" if in_memory else "database",
+        "seed": seed,
+        "scale": scale._asdict(),
+        "phases": {
+            phase: {"seconds": seconds, "queries": runner.query_counts[phase]}
+            for phase, seconds in runner.timings.items()
+        },
+        "outcome": outcome,
+    }
+
+
+def compare(
+    previous: dict[str, Any],
+    current: dict[str, Any],
+) -> dict[str, dict[str, float | int | None]]:
+    """Compare each phase of two benchmarks (e.g. from different commits).
+
+    Time is given as a ratio (2.0 means the phase takes twice as long),
+    queries as the number of additional queries made.
+    """
+    comparison: dict[str, dict[str, float | int | None]] = {}
+    for phase, stats in current["phases"].items():
+        before = previous["phases"].get(phase)
+        if before is None:
+            comparison[phase] = {"time_ratio": None, "extra_queries": None}
+            continue
+        comparison[phase] = {
+            "time_ratio": (
+                stats["seconds"] / before["seconds"] if before["seconds"] else None
+            ),
+            "extra_queries": stats["queries"] - before["queries"],
+        }
+    return comparison
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 
 from ws import models
 
@@ -58,17 +58,37 @@ class Cycle:
 
 
 class SeparationGraph:
-    def __init__(self, relevant_participants):
+    def __init__(self, relevant_participants: Iterable[models.Participant]) -> None:
         """Create the graph, ignores blocks by or against any excluded participants.
 
         This allows us to easily ignore participants who have a separation request
         in place, but have not signed up for trips on a given Winter School week.
         """
+        participants = list(relevant_participants)
+        self._participants: dict[int, models.Participant] = {
+            par.pk: par for par in participants
+        }
+
         # Start with all relevant blocks. We'll remove nodes as we continue
-        self._graph = self._make_graph(relevant_participants)
+        # Blocks are indexed both ways (by initiator & by recipient), using IDs.
+        blocks: dict[int, set[int]] = defaultdict(set)
+        blocked_by: dict[int, set[int]] = defaultdict(set)
+        for initiator_id, recipient_id in self._relevant_blocks(participants):
+            blocks[initiator_id].add(recipient_id)
+            blocked_by[recipient_id].add(initiator_id)
+        self._blocks = dict(blocks)
+        self._blocked_by = dict(blocked_by)
+
+        # Strongly-connected components, computed only when needed
+        self._components_stale = True
+        self._component: dict[int, int] = {}
+        self._members: list[set[int]] = []
+        self._reaches_terminus: list[bool] = []
 
     @staticmethod
-    def _make_graph(participants):
+    def _relevant_blocks(
+        participants: list[models.Participant],
+    ) -> Iterator[tuple[int, int]]:
         """Express all separations as a directed graph of participants.
 
         This graph may be a tree (a directed acyclic graph, or DAG) or it could have cycles.
@@ -82,47 +102,52 @@ class SeparationGraph:
             initiator__in=participants,
             recipient__in=participants,
         )
-        mapping = defaultdict(set)
-        for block in relevant_blocks:
-            mapping[block.initiator].add(block.recipient)
-        return dict(mapping)
+        yield from relevant_blocks.values_list("initiator_id", "recipient_id")
 
     @property
     def participants_affected_by_blocks(self):
         seen_recipients = set()
-        for initiator, blocked in self._graph.items():
-            yield initiator
+        for initiator, blocked in self._blocks.items():
+            yield self._participants[initiator]
             for recipient in blocked:
-                if recipient not in self._graph and recipient not in seen_recipients:
-                    yield recipient
+                if recipient not in self._blocks and recipient not in seen_recipients:
+                    yield self._participants[recipient]
                 seen_recipients.add(recipient)
 
     @property
-    def current_graph(self):
-        return self._graph
+    def current_graph(self) -> dict[models.Participant, set[models.Participant]]:
+        return {
+            self._participants[initiator]: {
+                self._participants[recipient] for recipient in recipients
+            }
+            for initiator, recipients in self._blocks.items()
+        }
 
     def remove(self, par):
-        """Mark a participant as handled, so remove them from the graph."""
-        # None of the blocks made by this participant are relevant anymore!
-        self._graph.pop(par, None)
+        """Mark a participant as handled, so remove them from the graph.
 
-        # There may be people blocking only this participant. We can remove them from the graph.
-        participants_now_blocking_nobody = set()
+        Only the participant's neighbors are touched.
+        """
+        # None of the blocks made by this participant are relevant anymore!
+        for recipient in self._blocks.pop(par.pk, set()):
+            self._blocked_by[recipient].discard(par.pk)
+            if not self._blocked_by[recipient]:
+                del self._blocked_by[recipient]
 
         # Similarly, we don't need to consider any blocks by people towards this par
-        for initiator, recipients in self._graph.items():
-            recipients.discard(par)
-            if not recipients:
-                participants_now_blocking_nobody.add(initiator)
+        # There may be people blocking only this participant. We can remove them from the graph.
+        for initiator in self._blocked_by.pop(par.pk, set()):
+            self._blocks[initiator].discard(par.pk)
+            if not self._blocks[initiator]:
+                del self._blocks[initiator]
 
-        for initiator in participants_now_blocking_nobody:
-            self._graph.pop(initiator)
+        self._components_stale = True
 
     @property
     def empty(self) -> bool:
         """Return true if all participants have been handled."""
         # TODO: Should also allow a key with an empty set?
-        return not bool(self._graph)
+        return not bool(self._blocks)
 
     def isolated_cycles(self, start_par: models.Participant) -> list[Cycle]:
         r"""Return any directed cycles containing this participant (with no terminal nodes reachable)
@@ -181,42 +206,116 @@ class SeparationGraph:
             |         |
             +--< C <--+
         """
-        if start_par not in self._graph:
+        if start_par.pk not in self._blocks:
             return []
 
-        termini = set()
-
-        seen = {start_par}
-        path = []
-
-        def dfs(par: models.Participant) -> Iterator[Cycle]:
-            """Depth-first search, starting with the participant
+        if self._components_stale:
+            self._find_components()
+        component = self._component[start_par.pk]
 
-            Yield any found cycles, note if a terminal node is found.
-            """
-            nonlocal path, termini
+        # If any terminal node is reachable, it should be handled first.
+        if self._reaches_terminus[component]:
+            return []
 
-            blocked_participants = self._graph.get(par, set())
+        # Importantly, ignore any cycles that do not directly involve this participant.
+        # Every such cycle lies entirely within the participant's component.
+        return list(self._cycles_through(start_par.pk, self._members[component]))
 
-            seen.add(par)
-            path.append(par)
+    def _cycles_through(self, start: int, members: set[int]) -> Iterator[Cycle]:
+        """Depth-first search, starting with the participant.
 
-            if not blocked_participants:
-                termini.add(par)
-            for child in blocked_participants:
+        Yield any cycles back to the participant found along the way.
+        (Iterative, so that large graphs can't exceed the recursion limit)
+        """
+        seen = {start}
+        path = [start]
+        to_visit = [iter(self._blocks[start])]
+        while to_visit:
+            for child in to_visit[-1]:
+                if child not in members:
+                    continue
                 if child not in seen:
-                    yield from dfs(child)
-                elif child in path:  # Current path contains a cycle!
-                    # Make sure we report "A -> B -> C" if `child` is D in this scenario:
-                    #   A ------> B <--- D
-                    #   ^         v
-                    #   +--< C <--+
-                    just_cycle_subpath = path[path.index(child) :]
-                    yield Cycle(just_cycle_subpath)
-
-            path.pop()
-
-        # Importantly, ignore any cycles that do not directly involve this participant.
-        # (Also, exhaust the generator now, so as to set `termini`)
-        member_cycles = [cycle for cycle in dfs(start_par) if start_par in cycle]
-        return [] if termini else member_cycles
+                    seen.add(child)
+                    path.append(child)
+                    to_visit.append(iter(self._blocks[child]))
+                    break
+                if child == start:  # Current path is a cycle!
+                    yield Cycle([self._participants[pk] for pk in path])
+            else:
+                to_visit.pop()
+                path.pop()
+
+    def _find_components(self) -> None:
+        """Identify strongly-connected components with (iterative) Tarjan's algorithm.
+
+        Also note which components can reach a terminus (a participant blocking
+        nobody). Tarjan's algorithm completes components in reverse topological
+        order, so any component reachable from another is always completed first.
+        """
+        self._component = {}
+        self._members = []
+        self._reaches_terminus = []
+
+        index: dict[int, int] = {}
+        lowlink: dict[int, int] = {}
+        stack: list[int] = []
+        on_stack: set[int] = set()
+
+        def visit(node: int) -> None:
+            index[node] = lowlink[node] = len(index)
+            stack.append(node)
+            on_stack.add(node)
+            to_visit.append((node, iter(self._blocks.get(node, ()))))
+
+        for root in [*self._blocks, *self._blocked_by]:
+            if root in index:
+                continue
+            to_visit: list[tuple[int, Iterator[int]]] = []
+            visit(root)
+            while to_visit:
+                node, children = to_visit[-1]
+                for child in children:
+                    if child not in index:
+                        visit(child)
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    to_visit.pop()
+                    if to_visit:
+                        parent = to_visit[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        self._complete_component(node, stack, on_stack)
+
+        self._components_stale = False
+
+    def _complete_component(
+        self,
+        root: int,
+        stack: list[int],
+        on_stack: set[int],
+    ) -> None:
+        members = set()
+        while True:
+            member = stack.pop()
+            on_stack.discard(member)
+            members.add(member)
+            if member == root:
+                break
+
+        component = len(self._members)
+        for member in members:
+            self._component[member] = component
+        self._members.append(members)
+        self._reaches_terminus.append(
+            any(
+                not self._blocks.get(member)
+                or any(
+                    self._reaches_terminus[self._component[recipient]]
+                    for recipient in self._blocks[member]
+                    if recipient not in members
+                )
+                for member in members
+            )
+        )
@@ -1,18 +1,22 @@
 # We make use of f-strings for advanced formatting.
 # Ignore rules that recommend lazy interpolation
 # ruff: noqa: G004
-import logging
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
 from datetime import date
 from typing import TYPE_CHECKING
 
-from django.db.models import Q, QuerySet
+from django.db.models import QuerySet
 
 from ws import enums, models
-from ws.utils.signups import add_to_waitlist
 
 if TYPE_CHECKING:
     from ws.lottery import AnnotatedParticipant
-    from ws.lottery.run import LotteryRunner, WinterSchoolLotteryRunner
+    from ws.lottery.run import (
+        LotteryRunner,
+        SingleTripLotteryRunner,
+        WinterSchoolLotteryRunner,
+    )
 
 
 def par_is_driver(participant: models.Participant) -> bool:
@@ -37,12 +41,56 @@ def ranked_signups(
     ).order_by("order", "time_created", "pk")
 
 
-def place_on_trip(signup: models.SignUp, logger: logging.Logger) -> None:
-    trip = signup.trip
-    slots = "slot" if trip.open_slots == 1 else "slots"
-    logger.info(f"{trip} has {trip.open_slots} {slots}, adding {signup.participant}")
-    signup.on_trip = True
-    signup.save()
+class RankedSignupTable:
+    """Future lottery signups for every participant, in the order they ranked them.
+
+    Loading every signup at once spares a query for each participant handled
+    (and each one bumped). The table must be told of any change to a signup
+    (see `update()`), so that signups placed on a trip are no longer ranked.
+    """
+
+    def __init__(self, signups: Iterable[models.SignUp]) -> None:
+        self._signups: dict[int, models.SignUp] = {}
+        self._by_participant: dict[int, list[int]] = defaultdict(list)
+        self._by_participant_and_trip: dict[tuple[int, int], int] = {}
+        for signup in signups:  # (Expected in ranked order)
+            self._signups[signup.pk] = signup
+            self._by_participant[signup.participant_id].append(signup.pk)
+            self._by_participant_and_trip[signup.participant_id, signup.trip_id] = (
+                signup.pk
+            )
+
+    @classmethod
+    def load(cls, after: date) -> "RankedSignupTable":
+        """Load all WS lottery signups for trips after the date, in one query."""
+        return cls(
+            models.SignUp.objects.filter(
+                trip__algorithm="lottery",
+                trip__trip_date__gt=after,
+                trip__program=enums.Program.WINTER_SCHOOL.value,
+            )
+            .select_related("participant", "trip")
+            .order_by("order", "time_created", "pk")
+        )
+
+    def update(self, signup: models.SignUp) -> None:
+        """Record that the signup changed (always holding the latest instance)."""
+        if signup.pk in self._signups:
+            self._signups[signup.pk] = signup
+
+    def ranked_signups(self, participant_id: int) -> list[models.SignUp]:
+        """Return signups not yet on a trip (as with `ranked_signups()`)."""
+        signups = (self._signups[pk] for pk in self._by_participant[participant_id])
+        return [signup for signup in signups if not signup.on_trip]
+
+    def trip_ids(self, participant_id: int) -> set[int]:
+        return {
+            self._signups[pk].trip_id for pk in self._by_participant[participant_id]
+        }
+
+    def get(self, participant_id: int, trip_id: int) -> models.SignUp | None:
+        pk = self._by_participant_and_trip.get((participant_id, trip_id))
+        return None if pk is None else self._signups[pk]
 
 
 class ParticipantHandler:
@@ -69,7 +117,7 @@ class ParticipantHandler:
 
     @property
     def is_driver(self) -> bool:
-        return any(par_is_driver(par) for par in self.to_be_placed)
+        return any(self.runner.is_driver(par) for par in self.to_be_placed)
 
     @property
     def paired(self) -> bool:
@@ -86,10 +134,7 @@ class ParticipantHandler:
 
     @property
     def paired_par(self):
-        try:
-            return self.participant.lotteryinfo.paired_with
-        except models.LotteryInfo.DoesNotExist:
-            return None
+        return self.runner.paired_with(self.participant)
 
     @property
     def to_be_placed(self) -> tuple[models.Participant, ...]:
@@ -101,33 +146,33 @@ class ParticipantHandler:
     def _par_text(self) -> str:
         return " + ".join(map(str, self.to_be_placed))
 
+    def place_on_trip(self, signup: models.SignUp) -> None:
+        open_slots = self.runner.open_slots(signup.trip)
+        slots = "slot" if open_slots == 1 else "slots"
+        self.logger.info(
+            f"{signup.trip} has {open_slots} {slots}, adding {signup.participant}"
+        )
+        self.runner.add_to_trip(signup)
+
     def place_all_on_trip(self, signup: models.SignUp) -> None:
-        place_on_trip(signup, self.logger)
+        self.place_on_trip(signup)
         if self.paired:
-            par_signup = models.SignUp.objects.get(
-                participant=self.paired_par, trip=signup.trip
-            )
-            place_on_trip(par_signup, self.logger)
-
-    def _count_drivers_on_trip(self, trip: models.Trip) -> int:
-        participant_drivers = models.SignUp.objects.filter(
-            trip=trip,
-            participant__lotteryinfo__car_status__in=["own", "rent"],
-            on_trip=True,
-        )
-        lottery_leaders = trip.leaders.filter(lotteryinfo__isnull=False)
-        num_leader_drivers: int = sum(
-            leader.lotteryinfo.is_driver for leader in lottery_leaders
-        )
-        return participant_drivers.count() + num_leader_drivers
+            par_signup = self.runner.get_signup(self.paired_par, signup.trip)
+            self.place_on_trip(par_signup)
 
     def _num_drivers_needed(self, trip: models.Trip) -> int:
-        num_drivers = self._count_drivers_on_trip(trip)
+        num_drivers = self.runner.count_drivers_on_trip(trip)
         return max(self.min_drivers - num_drivers, 0)
 
     def bump_participant(self, signup: models.SignUp) -> None:
-        add_to_waitlist(signup, prioritize=True)
+        self.runner.add_to_waitlist(signup, prioritize=True)
         self.logger.info("Moved %s to the top of the waitlist", signup)
+        self.runner.record(
+            "bump",
+            participant_pk=signup.participant_id,
+            trip_pk=signup.trip_id,
+            placed_trip_pk=None,
+        )
 
     def _try_to_place(self, signup: models.SignUp) -> bool:
         """Try to place participant (and partner) on the trip.
@@ -135,10 +180,11 @@ class ParticipantHandler:
         Returns if successful.
         """
         trip = signup.trip
-        if trip.open_slots >= self.slots_needed:
+        open_slots = self.runner.open_slots(trip)
+        if open_slots >= self.slots_needed:
             self.place_all_on_trip(signup)
             return True
-        if self.is_driver and not trip.open_slots and not self.paired:  # noqa: SIM102
+        if self.is_driver and not open_slots and not self.paired:  # noqa: SIM102
             # A driver may displace somebody else.
             # At present, we don't allow pairs of drivers to displace 2.
             # TODO: Support the above scenario!
@@ -154,8 +200,7 @@ class ParticipantHandler:
                 self.logger.info(
                     "Adding driver %s to %r", signup.participant.name, trip.name
                 )
-                signup.on_trip = True
-                signup.save()
+                self.runner.add_to_trip(signup)
                 return True
         return False
 
@@ -169,9 +214,10 @@ class SingleTripParticipantHandler(ParticipantHandler):
     def __init__(
         self,
         participant: "AnnotatedParticipant",
-        runner: "LotteryRunner",
+        runner: "SingleTripLotteryRunner",
         trip: models.Trip,
     ) -> None:
+        self.runner: SingleTripLotteryRunner = runner
         self.trip = trip
         allow_pairs = trip.honor_participant_pairing
         # TODO: Minimum driver requirements should be supported
@@ -179,14 +225,15 @@ class SingleTripParticipantHandler(ParticipantHandler):
 
     @property
     def paired(self) -> bool:
-        if not self.participant.reciprocally_paired:
-            return False
+        """A participant is only paired if both signed up for this trip."""
+        return self.runner.trip_partner(self.participant) is not None
 
-        # A participant is only paired if both signed up for this trip
-        partner_signed_up = Q(trip=self.trip, participant=self.paired_par)
-        return models.SignUp.objects.filter(partner_signed_up).exists()
+    def place_participant(self) -> dict[str, int | bool | str | None] | None:
+        """Place the participant (and any partner) on the trip, or its waitlist.
 
-    def place_participant(self) -> None:
+        If the participant's partner has yet to be seen, None will be returned
+        (they will be handled together once the partner comes up).
+        """
         # Indicate that this participant's number has come up!
         # (The issue of ranking is external to this module)
         self.runner.mark_seen(self.participant)
@@ -195,20 +242,30 @@ class SingleTripParticipantHandler(ParticipantHandler):
             self.logger.info(f"{self.participant} is paired with {self.paired_par}")
             if not self.runner.seen(self.paired_par):
                 self.logger.info(f"Will handle signups when {self.paired_par} comes")
-                return
+                return None
 
         # Try to place all participants, otherwise add them to the waitlist
-        signup = models.SignUp.objects.get(participant=self.participant, trip=self.trip)
-        if not self._try_to_place(signup):
+        signup = self.runner.get_signup(self.participant, self.trip)
+        placed = self._try_to_place(signup)
+        if not placed:
             for par in self.to_be_placed:
                 self.logger.info(f"Adding {par.name} to the waitlist")
-                add_to_waitlist(
-                    models.SignUp.objects.get(trip=self.trip, participant=par)
-                )
+                self.runner.add_to_waitlist(self.runner.get_signup(par, self.trip))
         self.runner.mark_handled(self.participant)
         if self.paired_par:
             self.runner.mark_handled(self.paired_par)
 
+        # JSON-serializable object we can use to analyze outputs.
+        return {
+            "participant_pk": self.participant.pk,
+            "paired_with_pk": self.paired_par and self.paired_par.pk,
+            "is_paired": bool(self.paired),
+            "affiliation": self.participant.affiliation,
+            "trip_pk": self.trip.pk,
+            "placed": placed,
+            "waitlisted": not placed,
+        }
+
 
 class WinterSchoolParticipantHandler(ParticipantHandler):
     def __init__(
@@ -216,7 +273,7 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         participant: "AnnotatedParticipant",
         runner: "WinterSchoolLotteryRunner",
     ) -> None:
-        self.lottery_rundate = runner.execution_datetime.date()
+        self.runner: WinterSchoolLotteryRunner = runner
         super().__init__(participant, runner, min_drivers=2, allow_pairs=True)
 
     def bump_participant(self, signup):
@@ -236,40 +293,41 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         self.logger.info("Bumping %s off %s", par.name, signup.trip.name)
 
         # Paired participants would generally prefer to stick together
-        try:
-            lotteryinfo = par.lotteryinfo
-        except models.LotteryInfo.DoesNotExist:
-            pass  # Definitely not paired.
-        else:
-            # Choose to just stay on the waitlist in hopes of joining their partner
-            # NOTE: (cannot use `reciprocally_paired`, since that's a rank-annotated prop)
-            if lotteryinfo.reciprocally_paired_with:
-                super().bump_participant(signup)
-                return
+        # Choose to just stay on the waitlist in hopes of joining their partner
+        # NOTE: (cannot use `reciprocally_paired`, since that's a rank-annotated prop)
+        if self.runner.reciprocally_paired_with(par):
+            super().bump_participant(signup)
+            return
 
         self.logger.debug("Searching all signups for a potentially open trip.")
         # Do not bother being picky about potentially being bumped by a driver
-        future_signups = ranked_signups(par, after=self.lottery_rundate)
-        for other_signup in future_signups.exclude(pk=signup.pk):
-            if not other_signup.trip.open_slots:
+        for other_signup in self.runner.ranked_signups(par):
+            if other_signup.pk == signup.pk:
+                continue
+            if not self.runner.open_slots(other_signup.trip):
                 self.logger.debug("%r is full", other_signup.trip.name)
                 continue
-            place_on_trip(other_signup, self.logger)
+            self.place_on_trip(other_signup)
             self.logger.debug("Placed on %r", other_signup.trip.name)
-            signup.on_trip = False
-            signup.save()
+            self.runner.remove_from_trip(signup)
+            self.runner.record(
+                "bump",
+                participant_pk=par.pk,
+                trip_pk=signup.trip_id,
+                placed_trip_pk=other_signup.trip_id,
+            )
             return
 
         # No slots are open - just waitlist them on their top trip!
         super().bump_participant(signup)
 
-    def _future_signups(self) -> QuerySet[models.SignUp]:
-        return ranked_signups(self.participant, after=self.lottery_rundate)
+    def _future_signups(self) -> list[models.SignUp]:
+        return self.runner.ranked_signups(self.participant)
 
-    def _desired_signups(
+    def desired_signups(
         self,
-        signups: QuerySet[models.SignUp],
-    ) -> QuerySet[models.SignUp]:
+        signups: Sequence[models.SignUp],
+    ) -> list[models.SignUp]:
         """Of a collection of signups, filter down to just those desired.
 
         In the normal case, *all* signups in a WS week indicate trips that the
@@ -279,8 +337,9 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         """
         if self.paired:  # Restrict signups to those both signed up for
             # TODO: If paired par has no signups, consider only trips where leading!
-            signups = signups.filter(trip__in=self.paired_par.trip_set.all())
-        return signups
+            partner_trip_ids = self.runner.signed_up_trip_ids(self.paired_par)
+            return [s for s in signups if s.trip_id in partner_trip_ids]
+        return list(signups)
 
     def place_participant(self) -> dict | None:
         """Attempt to place the participant (and their partner, if any) on the best trip.
@@ -307,7 +366,7 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         # Identify all the signups that this participant elected, then the subset
         # of the trips that they would currently want to be placed on.
         all_future_signups = self._future_signups()
-        desired_signups = self._desired_signups(all_future_signups)
+        desired_signups = self.desired_signups(all_future_signups)
 
         info = self._place_or_waitlist(all_future_signups, desired_signups)
         self.runner.mark_handled(self.participant)
@@ -325,7 +384,7 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         This is invoked for every signup, so we make attempts to exit early
         (for efficiency) in most scenarios.
         """
-        open_slots = signup.trip.open_slots
+        open_slots = self.runner.open_slots(signup.trip)
 
         if open_slots < self.slots_needed:
             return False  # Cannot place anyway, driver has nothing to do with it.
@@ -350,23 +409,14 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
 
         # At this point, potential drivers could bump some of the last signups!
         # If other unhandled participants ranked this trip, consider it jeopardized
-        driver_signups = models.SignUp.objects.filter(
-            trip=signup.trip,
-            on_trip=False,  # If on the trip, we know they're handled.
-            participant__lotteryinfo__car_status__in=["own", "rent"],
-            # TODO (Django 2): Exclude reciprocally-paired participants where both are signed up.
-            # These participants cannot bump.
-            # This is simpler in Django 2 (see `annotate_reciprocally_paired()`)
-        ).exclude(participant_id__in=self.to_be_placed)
-
-        return any(
-            not self.runner.handled(signup.participant) for signup in driver_signups
+        return self.runner.has_unhandled_drivers(
+            signup.trip, excluding=self.to_be_placed
         )
 
     def _place_or_waitlist(
         self,
-        future_signups: QuerySet[models.SignUp],
-        desired_signups: QuerySet[models.SignUp],
+        future_signups: Sequence[models.SignUp],
+        desired_signups: Sequence[models.SignUp],
     ) -> dict[str, int | bool | str | list[int] | None]:
         # JSON-serializable object we can use to analyze outputs.
         info = {
@@ -376,6 +426,7 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
             "affiliation": self.participant.affiliation,
             "ranked_trips": [signup.trip_id for signup in future_signups],
             "placed_on_choice": None,  # One-indexed rank
+            "trip_pk": None,  # Trip placed on (or waitlisted for)
             "waitlisted": False,
         }
 
@@ -388,9 +439,10 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
             return info
 
         # Try to place participants on their first choice available trip
+        desired_pks = {signup.pk for signup in desired_signups}
         skipped_to_avoid_driver_bump: list[tuple[int, models.SignUp]] = []
         for rank, signup in enumerate(future_signups, start=1):
-            if signup not in desired_signups:
+            if signup.pk not in desired_pks:
                 self.logger.debug("Ignoring undesired signup %s", signup)
                 continue
             trip_name = signup.trip.name
@@ -400,7 +452,7 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
                 continue
             if self._try_to_place(signup):
                 self.logger.debug(f"Placed on trip #{rank} of {len(future_signups)}")
-                return {**info, "placed_on_choice": rank}
+                return {**info, "placed_on_choice": rank, "trip_pk": signup.trip_id}
             self.logger.info("Can't place %s on %r", self._par_text, trip_name)
 
         # At this point, there were no trips that could take the participant or pair
@@ -409,18 +461,14 @@ class WinterSchoolParticipantHandler(ParticipantHandler):
         for rank, signup in skipped_to_avoid_driver_bump:
             if self._try_to_place(signup):
                 self.logger.debug(f"Placed on trip #{rank} of {len(future_signups)}")
-                return {**info, "placed_on_choice": rank}
+                return {**info, "placed_on_choice": rank, "trip_pk": signup.trip_id}
 
         self.logger.info(f"None of {self._par_text}'s desired trips are open.")
-        top_signup = desired_signups.first()
-        assert top_signup is not None  # (should have been checked above)
-        favorite_trip = top_signup.trip
+        favorite_trip = desired_signups[0].trip  # (non-empty, checked above)
         for participant in self.to_be_placed:
-            favorite_signup = models.SignUp.objects.get(
-                participant=participant, trip=favorite_trip
-            )
-            add_to_waitlist(favorite_signup)
+            favorite_signup = self.runner.get_signup(participant, favorite_trip)
+            self.runner.add_to_waitlist(favorite_signup)
             with_email = f"{self._par_text} ({participant.email})"
             self.logger.info(f"Waitlisted {with_email} on {favorite_trip.name}")
 
-        return {**info, "waitlisted": True}
+        return {**info, "waitlisted": True, "trip_pk": favorite_trip.pk}
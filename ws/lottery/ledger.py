@@ -0,0 +1,94 @@
+"""Track open slots & drivers on each trip throughout a lottery run.
+
+Placement decisions constantly ask how many slots remain on a trip, and
+how many drivers are going. Rather than count signups with a query every
+time, a ledger counts them once, then is updated with every placement.
+"""
+
+from collections.abc import Collection
+from typing import NamedTuple
+
+from django.db.models import Count
+
+from ws import models
+
+DRIVER_CAR_STATUSES = frozenset({"own", "rent"})
+
+
+class TripCount(NamedTuple):
+    on_trip: int
+    drivers: int
+
+
+class TripLedger:
+    def __init__(
+        self,
+        trips: Collection[models.Trip],
+        on_trip: dict[int, int],
+        drivers_on_trip: dict[int, int],
+        leader_drivers: dict[int, int],
+    ) -> None:
+        self.trips: dict[int, models.Trip] = {trip.pk: trip for trip in trips}
+        self._on_trip = {pk: on_trip.get(pk, 0) for pk in self.trips}
+        self._drivers_on_trip = {pk: drivers_on_trip.get(pk, 0) for pk in self.trips}
+        self._leader_drivers = leader_drivers
+
+    @classmethod
+    def load(cls, trips: Collection[models.Trip]) -> "TripLedger":
+        """Count participants & drivers on each trip, using a fixed number of queries."""
+        on_trip = models.SignUp.objects.filter(trip__in=trips, on_trip=True)
+        return cls(
+            trips,
+            on_trip=dict(on_trip.values_list("trip_id").annotate(Count("pk"))),
+            drivers_on_trip=dict(
+                on_trip.filter(
+                    participant__lotteryinfo__car_status__in=DRIVER_CAR_STATUSES
+                )
+                .values_list("trip_id")
+                .annotate(Count("pk"))
+            ),
+            leader_drivers=cls.count_leader_drivers(trips),
+        )
+
+    @staticmethod
+    def count_leader_drivers(trips: Collection[models.Trip]) -> dict[int, int]:
+        return dict(
+            models.Trip.leaders.through.objects.filter(
+                trip__in=trips,
+                participant__lotteryinfo__car_status__in=DRIVER_CAR_STATUSES,
+            )
+            .values_list("trip_id")
+            .annotate(Count("participant_id"))
+        )
+
+    def tracks(self, trip: models.Trip) -> bool:
+        return trip.pk in self.trips
+
+    def open_slots(self, trip_id: int) -> int:
+        return self.trips[trip_id].maximum_participants - self._on_trip[trip_id]
+
+    def num_drivers(self, trip_id: int) -> int:
+        """Count drivers going on the trip (including leaders)."""
+        return self._drivers_on_trip[trip_id] + self._leader_drivers.get(trip_id, 0)
+
+    def record(self, trip_id: int, *, is_driver: bool, change: int) -> None:
+        """Record that a participant joined (+1) or left (-1) the trip."""
+        self._on_trip[trip_id] += change
+        if is_driver:
+            self._drivers_on_trip[trip_id] += change
+
+    def counts(self) -> dict[int, TripCount]:
+        return {
+            trip_id: TripCount(self._on_trip[trip_id], self.num_drivers(trip_id))
+            for trip_id in self.trips
+        }
+
+    def discrepancies(self) -> dict[int, tuple[TripCount, TripCount]]:
+        """Return trips where the ledger disagrees with the database (ledger, db)."""
+        tracked = self.counts()
+        actual = TripLedger.load(list(self.trips.values())).counts()
+        return {
+            trip_id: (count, actual[trip_id])
+            for trip_id, count in tracked.items()
+            if count != actual[trip_id]
+        }
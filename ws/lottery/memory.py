@@ -0,0 +1,319 @@
+"""In-memory representation of a Winter School week, for fast lottery placement.
+
+Placing participants one at a time against the database costs several queries
+(and a save) for every single decision. Instead, we can load everything the
+lottery needs up front, make every placement against these structures, then
+write the final outcome back to the database in one transaction.
+"""
+
+from collections import defaultdict
+from collections.abc import Collection, Iterator
+from datetime import date
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ws import enums, models
+from ws.lottery.ledger import DRIVER_CAR_STATUSES, TripLedger
+from ws.utils.signups import signups_changed, widen_priority_bounds
+
+
+class LotteryPrefs(NamedTuple):
+    """The parts of a participant's `LotteryInfo` which affect placement."""
+
+    car_status: str
+    paired_with_id: int | None
+
+    @property
+    def is_driver(self) -> bool:
+        return self.car_status in DRIVER_CAR_STATUSES
+
+
+# The week's state is indexed several ways, each for fast lookups while placing.
+class WinterSchoolWeek:  # pylint: disable=too-many-instance-attributes
+    """All trips, signups, and lottery preferences relevant to one lottery run.
+
+    Every mutation made here mirrors what would have been saved to the
+    database, and is recorded so that it may be persisted with `save()`.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        trips: Collection[models.Trip],
+        signups: Collection[models.SignUp],
+        prefs: dict[int, LotteryPrefs],
+        partners: dict[int, models.Participant],
+        leader_drivers: dict[int, int],
+        waitlist_ids: dict[int, int],
+        waitlist_signups: Collection[models.WaitListSignup],
+        lowest_manual_orders: dict[int, int],
+    ) -> None:
+        self.trips: dict[int, models.Trip] = {trip.pk: trip for trip in trips}
+        self.prefs = prefs
+        self.partners = partners
+        self.waitlist_ids = waitlist_ids
+        # Mirrors `WaitList.lowest_manual_order` (for waitlists which have one)
+        self.lowest_manual_orders = lowest_manual_orders
+
+        # Signups are expected in the order in which participants ranked them.
+        self.signups_by_participant: dict[int, list[models.SignUp]] = defaultdict(list)
+        self.signups_by_trip: dict[int, list[models.SignUp]] = defaultdict(list)
+        self._signups: dict[tuple[int, int], models.SignUp] = {}
+        for signup in signups:
+            signup.trip = self.trips[signup.trip_id]  # (Share one instance per trip)
+            self.signups_by_participant[signup.participant_id].append(signup)
+            self.signups_by_trip[signup.trip_id].append(signup)
+            self._signups[signup.participant_id, signup.trip_id] = signup
+
+        self.ledger = TripLedger(self.trips.values(), {}, {}, leader_drivers)
+        for signup in signups:
+            if signup.on_trip:
+                self._count_on_trip(signup, 1)
+
+        self._initially_on_trip = {signup.pk for signup in signups if signup.on_trip}
+        self.bumped: list[models.SignUp] = []
+
+        self.waitlisted: dict[int, models.WaitListSignup] = {
+            wl_signup.signup_id: wl_signup for wl_signup in waitlist_signups
+        }
+
+        # Everything that must be written back to the database
+        self._changed_signups: dict[int, models.SignUp] = {}
+        self._new_wl_signups: list[models.WaitListSignup] = []
+        self._reordered_wl_signups: dict[int, models.WaitListSignup] = {}
+
+    @classmethod
+    def load(cls, after: date) -> "WinterSchoolWeek":
+        """Load all signups for Winter School lottery trips taking place after a date."""
+        trips = list(
+            models.Trip.objects.filter(
+                algorithm="lottery",
+                trip_date__gt=after,
+                program=enums.Program.WINTER_SCHOOL.value,
+            )
+        )
+        signups = list(
+            models.SignUp.objects.filter(trip__in=trips)
+            .select_related("participant")
+            .order_by("order", "time_created", "pk")
+        )
+        participant_ids = {signup.participant_id for signup in signups}
+        infos = list(
+            models.LotteryInfo.objects.filter(
+                participant_id__in=participant_ids
+            ).select_related("paired_with")
+        )
+        # Partners may not have signed up themselves, but we need their preferences.
+        partner_ids = {info.paired_with_id for info in infos} - participant_ids
+        partner_ids.discard(None)
+        if partner_ids:
+            infos.extend(
+                models.LotteryInfo.objects.filter(
+                    participant_id__in=partner_ids
+                ).select_related("paired_with")
+            )
+        waitlists = models.WaitList.objects.filter(trip__in=trips).values_list(
+            "trip_id", "pk", "lowest_manual_order"
+        )
+
+        return cls(
+            trips=trips,
+            signups=signups,
+            prefs={
+                info.participant_id: LotteryPrefs(info.car_status, info.paired_with_id)
+                for info in infos
+            },
+            partners={
+                info.participant_id: info.paired_with
+                for info in infos
+                if info.paired_with is not None
+            },
+            leader_drivers=TripLedger.count_leader_drivers(trips),
+            waitlist_ids={trip_id: pk for trip_id, pk, _ in waitlists},
+            waitlist_signups=list(
+                models.WaitListSignup.objects.filter(waitlist__trip__in=trips)
+            ),
+            lowest_manual_orders={
+                pk: lowest for _, pk, lowest in waitlists if lowest is not None
+            },
+        )
+
+    def _count_on_trip(self, signup: models.SignUp, change: int) -> None:
+        is_driver = self.is_driver(signup.participant_id)
+        self.ledger.record(signup.trip_id, is_driver=is_driver, change=change)
+
+    def _record_change(self, signup: models.SignUp) -> None:
+        # `save()` would normally set this. Trip ordering depends on the value!
+        signup.last_updated = timezone.now()
+        self._changed_signups[signup.pk] = signup
+
+    # Reading the current state
+    # -------------------------
+    def is_driver(self, participant_id: int) -> bool:
+        prefs = self.prefs.get(participant_id)
+        return prefs is not None and prefs.is_driver
+
+    def paired_with(self, participant_id: int) -> models.Participant | None:
+        return self.partners.get(participant_id)
+
+    def reciprocally_paired(self, participant_id: int) -> bool:
+        prefs = self.prefs.get(participant_id)
+        if prefs is None or prefs.paired_with_id is None:
+            return False
+        partner_prefs = self.prefs.get(prefs.paired_with_id)
+        return partner_prefs is not None and (
+            partner_prefs.paired_with_id == participant_id
+        )
+
+    def get_signup(self, participant_id: int, trip_id: int) -> models.SignUp:
+        try:
+            return self._signups[participant_id, trip_id]
+        except KeyError as err:
+            raise models.SignUp.DoesNotExist(
+                f"No signup for participant {participant_id} on trip {trip_id}"
+            ) from err
+
+    def has_signup(self, participant_id: int, trip_id: int) -> bool:
+        return (participant_id, trip_id) in self._signups
+
+    def ranked_signups(self, participant_id: int) -> list[models.SignUp]:
+        """Return signups not yet on a trip, in the order the participant ranked them."""
+        return [
+            signup
+            for signup in self.signups_by_participant.get(participant_id, [])
+            if not signup.on_trip
+        ]
+
+    def signed_up_trip_ids(self, participant_id: int) -> set[int]:
+        return {
+            signup.trip_id
+            for signup in self.signups_by_participant.get(participant_id, [])
+        }
+
+    def waiting_drivers(self, trip_id: int) -> Iterator[models.SignUp]:
+        """Yield signups for drivers who are not (yet) on the trip."""
+        for signup in self.signups_by_trip[trip_id]:
+            if not signup.on_trip and self.is_driver(signup.participant_id):
+                yield signup
+
+    def has_no_car(self, participant_id: int) -> bool:
+        prefs = self.prefs.get(participant_id)
+        return prefs is None or prefs.car_status == "none"
+
+    def on_trip_non_drivers(self, trip_id: int) -> list[models.SignUp]:
+        """Return signups on the trip for participants who have no car."""
+        return [
+            signup
+            for signup in self.signups_by_trip[trip_id]
+            if signup.on_trip and self.has_no_car(signup.participant_id)
+        ]
+
+    def newly_placed(self, signup: models.SignUp) -> bool:
+        """Return if the signup was placed on its trip since the week was loaded."""
+        return signup.on_trip and signup.pk not in self._initially_on_trip
+
+    # Modifying the current state
+    # ---------------------------
+    def add_to_trip(self, signup: models.SignUp) -> None:
+        if not signup.on_trip:
+            self._count_on_trip(signup, 1)
+        signup.on_trip = True
+        self._record_change(signup)
+
+    def remove_from_trip(self, signup: models.SignUp) -> None:
+        if signup.on_trip:
+            self._count_on_trip(signup, -1)
+            self.bumped.append(signup)
+        signup.on_trip = False
+        self._record_change(signup)
+
+    def _last_of_priority(self, trip_id: int) -> int:
+        """Mirror `WaitList.last_of_priority` (claiming the order returned)."""
+        waitlist_id = self.waitlist_ids[trip_id]
+        lowest = self.lowest_manual_orders.get(waitlist_id)
+        order = 10 if lowest is None else lowest - 1
+        self.lowest_manual_orders[waitlist_id] = order
+        return order
+
+    def add_to_waitlist(
+        self,
+        signup: models.SignUp,
+        prioritize: bool = False,
+    ) -> models.WaitListSignup:
+        """Mirror `ws.utils.signups.add_to_waitlist()` (minus messages)."""
+        self.remove_from_trip(signup)
+
+        wl_signup = self.waitlisted.get(signup.pk)
+        if wl_signup is None:
+            wl_signup = models.WaitListSignup(
+                signup=signup, waitlist_id=self.waitlist_ids[signup.trip_id]
+            )
+            self._new_wl_signups.append(wl_signup)
+
+        if prioritize:
+            wl_signup.manual_order = self._last_of_priority(signup.trip_id)
+            if wl_signup.pk is not None:
+                self._reordered_wl_signups[wl_signup.pk] = wl_signup
+
+        # Only record as waitlisted once fully configured (affects priority!)
+        self.waitlisted[signup.pk] = wl_signup
+        return wl_signup
+
+    def diff(self) -> dict[str, list[dict[str, int | str | None]]]:
+        """Describe all unsaved changes (JSON-serializable)."""
+
+        def describe(signup: models.SignUp) -> dict[str, int | str | None]:
+            return {
+                "participant_pk": signup.participant_id,
+                "participant": signup.participant.name,
+                "trip_pk": signup.trip_id,
+                "trip": signup.trip.name,
+            }
+
+        # Any signup which was waitlisted was also recorded as changed.
+        wl_signups = [*self._new_wl_signups, *self._reordered_wl_signups.values()]
+        return {
+            "placed": [
+                describe(signup)
+                for signup in self._changed_signups.values()
+                if self.newly_placed(signup)
+            ],
+            "waitlisted": [
+                {
+                    **describe(self._changed_signups[wl_signup.signup_id]),
+                    "manual_order": wl_signup.manual_order,
+                }
+                for wl_signup in wl_signups
+            ],
+            "bumped": [describe(signup) for signup in self.bumped],
+        }
+
+    @transaction.atomic
+    def save(self) -> None:
+        """Write all changes made to signups & waitlists to the database."""
+        models.SignUp.objects.bulk_update(
+            self._changed_signups.values(), ["on_trip", "last_updated"]
+        )
+        # Waitlist order is partly determined by creation time.
+        # Timestamps are assigned in list order, so waitlisting order is preserved.
+        models.WaitListSignup.objects.bulk_create(self._new_wl_signups)
+        models.WaitListSignup.objects.bulk_update(
+            self._reordered_wl_signups.values(), ["manual_order"]
+        )
+        widen_priority_bounds(
+            wl_signups=[*self._new_wl_signups, *self._reordered_wl_signups.values()]
+        )
+        signups_changed(
+            trip_ids={signup.trip_id for signup in self._changed_signups.values()}
+        )
+
+        for signup in self._changed_signups.values():
+            if signup.on_trip:
+                self._initially_on_trip.add(signup.pk)
+            else:
+                self._initially_on_trip.discard(signup.pk)
+        self.bumped = []
+        self._changed_signups = {}
+        self._new_wl_signups = []
+        self._reordered_wl_signups = {}
@@ -0,0 +1,340 @@
+"""Place the whole Winter School week at once, as a min-cost assignment.
+
+The standard lottery walks participants in rank order, greedily giving each
+their best available trip. That's simple to explain, but can leave people out
+needlessly: if a high-priority participant takes a trip that was somebody's
+only choice, that somebody goes unplaced even if the first participant would
+have been happy on their second choice.
+
+Here, every participant (or reciprocally-paired pair) is a "unit" to be
+assigned to one of their ranked trips, or left unplaced. Each possible outcome
+has a cost, and we find the assignment with the lowest total cost:
+
+- leaving anybody unplaced costs more than any trip they ranked
+- later choices cost more than earlier choices
+- every cost is scaled by priority, so higher-ranked participants win ties
+
+Units are added in rank order; each new unit is placed along the cheapest
+"augmenting path" (a chain of moves where others may shift to another of their
+choices to make room). This is the successive shortest path algorithm for
+min-cost flow, run on a graph of trips (rather than one of all participants),
+which keeps it fast enough in pure Python.
+
+Some rules can't be expressed as costs, and are instead enforced outright:
+
+- Pairs are only ever placed together (once placed, they're never moved)
+- Participants who asked to be separated never share a trip
+- Trips lacking drivers let unplaced drivers bump the lowest-priority non-driver
+
+With these rules in effect, the result is optimal for everybody else (but not
+necessarily the best possible outcome overall).
+"""
+
+from collections import defaultdict, deque
+from collections.abc import Collection, Mapping, Sequence
+from typing import NamedTuple
+
+# Pseudo-trip for units which are not placed (it has unlimited room)
+UNPLACED = 0
+
+
+class Unit(NamedTuple):
+    """One participant, or a pair of participants placed together."""
+
+    participant_ids: tuple[int, ...]
+    # Trip IDs, in order of preference
+    choices: tuple[int, ...]
+    # How many of the participants could drive
+    drivers: int = 0
+
+
+class Assignment(NamedTuple):
+    # Index of each unit (in priority order) to the trip it's placed on
+    trips: list[int]
+    # Units which were bumped off a trip to make room for a driver
+    # (they may since have been placed on another trip)
+    bumped: dict[int, int]
+    cost: int
+
+
+class _Move(NamedTuple):
+    cost: int
+    unit: int
+
+
+class _Solver:
+    def __init__(
+        self,
+        units: Sequence[Unit],
+        open_slots: Mapping[int, int],
+        separations: Collection[tuple[int, int]],
+    ) -> None:
+        self.units = units
+        self.free = {trip_id: max(slots, 0) for trip_id, slots in open_slots.items()}
+        self.trips = [UNPLACED] * len(units)
+        self.occupants: dict[int, set[int]] = defaultdict(set)
+        self.on_trip: dict[int, set[int]] = defaultdict(set)  # Participant IDs
+
+        self.separated: dict[int, set[int]] = defaultdict(set)
+        for one, other in separations:
+            self.separated[one].add(other)
+            self.separated[other].add(one)
+
+        max_choices = max((len(unit.choices) for unit in units), default=0)
+        self._unplaced_rank = max_choices + 1
+
+    def weight(self, index: int) -> int:
+        """Return a weight for the unit (higher priority, more weight).
+
+        Weights only differ by (at most) a factor of 2. This way, moving one
+        participant to a worse choice is always worth it if that means another
+        participant (of any priority) is placed at all.
+
+        Pairs weigh the same as anybody else, so they can't displace somebody
+        of higher priority just by virtue of taking up more seats.
+        """
+        return 2 * len(self.units) - index
+
+    def cost(self, index: int, trip_id: int) -> int:
+        unit = self.units[index]
+        rank = (
+            self._unplaced_rank if trip_id == UNPLACED else unit.choices.index(trip_id)
+        )
+        return rank * self.weight(index)
+
+    def destinations(self, index: int) -> list[int]:
+        """Trips the unit could go to (without sitting with separated people)."""
+        unit = self.units[index]
+        avoid = set().union(*(self.separated[pk] for pk in unit.participant_ids))
+        destinations = [
+            trip_id
+            for trip_id in unit.choices
+            if trip_id in self.free and not (avoid & self.on_trip[trip_id])
+        ]
+        return [*destinations, UNPLACED]
+
+    def assign(self, index: int, trip_id: int) -> None:
+        previous = self.trips[index]
+        participant_ids = self.units[index].participant_ids
+        if previous != UNPLACED:
+            self.occupants[previous].discard(index)
+            self.on_trip[previous].difference_update(participant_ids)
+            self.free[previous] += len(participant_ids)
+        self.trips[index] = trip_id
+        if trip_id != UNPLACED:
+            self.occupants[trip_id].add(index)
+            self.on_trip[trip_id].update(participant_ids)
+            self.free[trip_id] -= len(participant_ids)
+
+    def _moves(self) -> dict[int, dict[int, _Move]]:
+        """For each pair of trips, the cheapest way to move one person between them.
+
+        Only single participants are ever moved (pairs stay where placed).
+        """
+        moves: dict[int, dict[int, _Move]] = defaultdict(dict)
+        for trip_id, occupants in self.occupants.items():
+            for index in occupants:
+                if len(self.units[index].participant_ids) != 1:
+                    continue
+                current = self.cost(index, trip_id)
+                for destination in self.destinations(index):
+                    if destination == trip_id:
+                        continue
+                    move = _Move(self.cost(index, destination) - current, index)
+                    best = moves[trip_id].get(destination)
+                    if best is None or move < best:
+                        moves[trip_id][destination] = move
+        return moves
+
+    def cheapest_path(
+        self,
+        starts: Mapping[int, _Move],
+        blocked: Collection[int] = (),
+    ) -> tuple[int, list[tuple[int, int]]] | None:
+        """Find the cheapest chain of moves ending at a trip with room.
+
+        `starts` is the cost of the first move to each trip. Returns the total
+        cost, and each move (unit index, destination) to be made (in order).
+        """
+        moves = self._moves()
+        dist: dict[int, int] = {}
+        came_from: dict[int, tuple[int | None, int]] = {}
+        for trip_id, (cost, unit) in starts.items():
+            if trip_id not in blocked:
+                dist[trip_id] = cost
+                came_from[trip_id] = (None, unit)
+
+        # Bellman-Ford (with a queue), since moving somebody may reduce cost.
+        queue = deque(dist)
+        queued = set(queue)
+        relaxations = 0
+        max_relaxations = (len(self.free) + 1) ** 2
+        while queue and relaxations < max_relaxations:
+            trip_id = queue.popleft()
+            queued.discard(trip_id)
+            if trip_id == UNPLACED or self.free[trip_id] > 0:
+                continue  # Chains end once somebody has room
+            for destination, (cost, unit) in moves[trip_id].items():
+                if destination in blocked:
+                    continue
+                new_dist = dist[trip_id] + cost
+                if new_dist < dist.get(destination, new_dist + 1):
+                    relaxations += 1
+                    dist[destination] = new_dist
+                    came_from[destination] = (trip_id, unit)
+                    if destination not in queued:
+                        queue.append(destination)
+                        queued.add(destination)
+
+        ends = [
+            trip_id for trip_id in dist if trip_id == UNPLACED or self.free[trip_id] > 0
+        ]
+        if not ends:
+            return None
+        end = min(ends, key=lambda trip_id: (dist[trip_id], trip_id))
+        return dist[end], self._path_to(end, came_from)
+
+    def _path_to(
+        self,
+        end: int,
+        came_from: Mapping[int, tuple[int | None, int]],
+    ) -> list[tuple[int, int]]:
+        path: list[tuple[int, int]] = []
+        trip_id: int | None = end
+        while trip_id is not None and len(path) <= len(self.free):
+            previous, unit = came_from[trip_id]
+            path.append((unit, trip_id))
+            trip_id = previous
+        path.reverse()
+        return path
+
+    def apply(self, path: list[tuple[int, int]]) -> None:
+        # The last move goes somewhere with room, which makes room for the move before.
+        for unit, destination in reversed(path):
+            self.assign(unit, destination)
+
+    def add_single(self, index: int) -> int:
+        starts = {
+            trip_id: _Move(self.cost(index, trip_id), index)
+            for trip_id in self.destinations(index)
+        }
+        found = self.cheapest_path(starts)
+        assert found is not None, "Leaving the unit unplaced is always possible"
+        cost, path = found
+        self.apply(path)
+        return cost
+
+    def _make_room(self, trip_id: int, seats: int) -> int | None:
+        """Move people off the trip until it has enough room, returning the cost."""
+        total = 0
+        while self.free[trip_id] < seats:
+            moves = self._moves()[trip_id]
+            found = self.cheapest_path(moves, blocked={trip_id})
+            if found is None:
+                return None
+            cost, path = found
+            self.apply(path)
+            total += cost
+        return total
+
+    def add_block(self, index: int) -> int:
+        """Place a unit which must stay together (in the cheapest way possible)."""
+        seats = len(self.units[index].participant_ids)
+        best_cost, best_trip = self.cost(index, UNPLACED), UNPLACED
+        for trip_id in self.destinations(index)[:-1]:
+            snapshot = self._snapshot()
+            room_cost = self._make_room(trip_id, seats)
+            self._restore(snapshot)
+            if room_cost is None:
+                continue
+            cost = room_cost + self.cost(index, trip_id)
+            if cost < best_cost:
+                best_cost, best_trip = cost, trip_id
+
+        if best_trip != UNPLACED:
+            self._make_room(best_trip, seats)
+        self.assign(index, best_trip)
+        return best_cost
+
+    def _snapshot(self) -> tuple[list[int], dict[int, int]]:
+        return list(self.trips), dict(self.free)
+
+    def _restore(self, snapshot: tuple[list[int], dict[int, int]]) -> None:
+        trips, self.free = snapshot
+        self.trips = trips
+        self.occupants = defaultdict(set)
+        self.on_trip = defaultdict(set)
+        for index, trip_id in enumerate(trips):
+            if trip_id != UNPLACED:
+                self.occupants[trip_id].add(index)
+                self.on_trip[trip_id].update(self.units[index].participant_ids)
+
+    def ensure_drivers(
+        self, drivers_on_trip: Mapping[int, int], min_drivers: int
+    ) -> dict[int, int]:
+        """Let unplaced drivers bump non-drivers from trips lacking drivers.
+
+        Like the standard lottery, bumped participants are placed on another
+        of their trips if one has room. Returns bumped units, and the trip
+        each was bumped from.
+        """
+        bumped: dict[int, int] = {}
+        for trip_id in sorted(self.free):
+            drivers = drivers_on_trip.get(trip_id, 0) + sum(
+                self.units[index].drivers for index in self.occupants[trip_id]
+            )
+            for index, unit in enumerate(self.units):
+                if drivers >= min_drivers:
+                    break
+                if not (
+                    unit.drivers
+                    and len(unit.participant_ids) == 1
+                    and self.trips[index] == UNPLACED
+                    and trip_id in self.destinations(index)
+                ):
+                    continue
+                if not self.free[trip_id]:
+                    non_drivers = [
+                        other
+                        for other in self.occupants[trip_id]
+                        if not self.units[other].drivers
+                        and len(self.units[other].participant_ids) == 1
+                    ]
+                    if not non_drivers:
+                        break
+                    lowest = max(non_drivers)  # (Units are in priority order)
+                    self.assign(lowest, UNPLACED)
+                    bumped[lowest] = trip_id
+                    self.assign(index, trip_id)
+                    self._reoffer(lowest)
+                else:
+                    self.assign(index, trip_id)
+                drivers += 1
+        return bumped
+
+    def _reoffer(self, index: int) -> None:
+        """Place a bumped unit on the best of its other trips with room (if any)."""
+        for trip_id in self.destinations(index)[:-1]:
+            if self.free[trip_id] > 0:
+                self.assign(index, trip_id)
+                return
+
+
+def assign(
+    units: Sequence[Unit],
+    open_slots: Mapping[int, int],
+    *,
+    drivers_on_trip: Mapping[int, int] | None = None,
+    separations: Collection[tuple[int, int]] = (),
+    min_drivers: int = 2,
+) -> Assignment:
+    """Assign units (given in priority order) to trips with open slots."""
+    solver = _Solver(units, open_slots, separations)
+    for index, unit in enumerate(units):
+        if len(unit.participant_ids) == 1:
+            solver.add_single(index)
+        else:
+            solver.add_block(index)
+    bumped = solver.ensure_drivers(drivers_on_trip or {}, min_drivers)
+    total = sum(solver.cost(index, trip) for index, trip in enumerate(solver.trips))
+    return Assignment(solver.trips, bumped, total)
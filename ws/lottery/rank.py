@@ -1,17 +1,23 @@
+import abc
+import hashlib
+import hmac
 import random
-from collections.abc import Mapping
-from datetime import datetime, timedelta
+import re
+from bisect import insort
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Mapping
+from datetime import date, datetime, timedelta
 from types import MappingProxyType
-from typing import NamedTuple
+from typing import Any, NamedTuple
 
-from django.db.models import Q, QuerySet
+from django.db.models import Count, Q, QuerySet
 from mitoc_const import affiliations
 
 from ws import enums, models, settings
 from ws.utils.dates import local_now
 from ws.utils.feedback import without_old_feedback
 
-from . import annotate_reciprocally_paired
+from . import AnnotatedParticipant, annotate_reciprocally_paired
 
 _normal_weights: dict[str, float] = {
     affiliations.MIT_UNDERGRAD.CODE: 0.3,
@@ -63,11 +69,10 @@ def seed_for(participant: models.Participant, lottery_key: str) -> str:
           have their own seed.
         - Participants must have their own seed, for obvious reasons (they'd all be
           ranked exactly the same otherwise!)
-    4. NOT be cryptographically secure
-        - CPRNG's are, by design, not deterministic from a given seed. This is an
-          unacceptable trait, since we're aiming for reproducibility. Because this
-          seed is not used for security purposes, it's okay to use Python's
-          Mersenne Twister algorithm (which is not a CPRNG) with this seed.
+    4. Is cheap to compute, for many participants at once
+        - The seed is used as the message of a keyed hash (see `random_floats`).
+          Unlike reseeding a random number generator, this shares no global
+          state, so participants may be ranked in batches (or in parallel).
 
     Params:
         participant: Person the seed is being generated for
@@ -80,10 +85,37 @@ def seed_for(participant: models.Participant, lottery_key: str) -> str:
     return f"{participant.pk}-{lottery_key}-{settings.PRNG_SEED_SECRET}"
 
 
-def affiliation_weighted_rand(
-    participant: models.Participant, lottery_key: str
-) -> float:
-    """Return a float that's meant to rank participants by affiliation.
+def random_floats(
+    participants: Iterable[models.Participant],
+    lottery_key: str,
+    secret: str | None = None,
+) -> dict[int, float]:
+    """Return a uniformly-distributed float in [0, 1) for each participant.
+
+    Each number comes from an HMAC-SHA256 of the participant's seed (see
+    `seed_for`), keyed with the secret. Nobody can predict their number
+    without the secret, but it's identical every time the lottery is run.
+
+    Another secret may be given to simulate alternate lottery outcomes.
+    """
+    key = settings.PRNG_SEED_SECRET if secret is None else secret
+    keyed = hmac.new(key.encode(), digestmod=hashlib.sha256)
+    rands: dict[int, float] = {}
+    for participant in participants:
+        digest = keyed.copy()
+        digest.update(seed_for(participant, lottery_key).encode())
+        # 53 bits is the full precision of a float in [0, 1), as with `random()`
+        bits = int.from_bytes(digest.digest()[:8], "big") >> 11
+        rands[participant.pk] = bits / (1 << 53)
+    return rands
+
+
+def affiliation_weighted_rands(
+    participants: Iterable[models.Participant],
+    lottery_key: str,
+    secret: str | None = None,
+) -> dict[int, float]:
+    """Return floats that are meant to rank participants by affiliation.
 
     A lower number is a "preferable" affiliation. That is to say, ranking
     participants by the result of this function will put MIT students towards
@@ -91,11 +123,35 @@ def affiliation_weighted_rand(
 
     See `seed_for` for a full explanation of `lottery_key`.
     """
-    random.seed(seed_for(participant, lottery_key))
-    return random.random() - WEIGHTS[participant.affiliation]
+    participants = list(participants)
+    rands = random_floats(participants, lottery_key, secret)
+    return {par.pk: rands[par.pk] - WEIGHTS[par.affiliation] for par in participants}
+
+
+def affiliation_weighted_rand(
+    participant: models.Participant, lottery_key: str
+) -> float:
+    """Return the affiliation-weighted float for just one participant."""
+    return affiliation_weighted_rands([participant], lottery_key)[participant.pk]
+
+
+def legacy_affiliation_weighted_rand(
+    participant: models.Participant, lottery_key: str
+) -> float:
+    """Return what `affiliation_weighted_rand` gave before we used keyed hashing.
+
+    Lotteries were once ranked by seeding Python's Mersenne Twister with the
+    participant's seed. This is kept only so that we may compare historical
+    lottery runs to how they would be ranked now (see `compare_with_legacy`).
+    """
+    rand = random.Random(seed_for(participant, lottery_key))
+    return rand.random() - WEIGHTS[participant.affiliation]
 
 
 class ParticipantRanker:
+    # Keys computed in the latest ranking, by participant ID
+    priority_keys: dict[int, Any]
+
     def __iter__(self):
         """Participants in the order they should be placed, with their score.
 
@@ -106,12 +162,22 @@ class ParticipantRanker:
         Each participant is decorated with an attribute that says if they've
         reciprocally paired themselves with another participant.
         """
-        participants = annotate_reciprocally_paired(self.participants_to_handle())
-        with_keys = ((self.priority_key(par), par) for par in participants)
+        participants = self.participants_with_pairing()
+        self.prepare(participants)
+        # Kept for the rest of the run (keys are consulted again when bumping)
+        self.priority_keys = {par.pk: self.priority_key(par) for par in participants}
+        with_keys = ((self.priority_keys[par.pk], par) for par in participants)
         for priority_key, participant in sorted(with_keys):
             yield participant, priority_key
 
-    def participants_to_handle(self):
+    def participants_with_pairing(self) -> list[AnnotatedParticipant]:
+        """Participants to be ranked, annotated with reciprocal pairing."""
+        return list(annotate_reciprocally_paired(self.participants_to_handle()))
+
+    def prepare(self, participants: list[AnnotatedParticipant]) -> None:
+        """Compute (in bulk) anything that's needed to rank these participants."""
+
+    def participants_to_handle(self) -> QuerySet[models.Participant]:
         """QuerySet of participants to be ranked."""
         raise NotImplementedError
 
@@ -120,13 +186,43 @@ class ParticipantRanker:
         raise NotImplementedError
 
 
-class SingleTripParticipantRanker(ParticipantRanker):
+class LotteryParticipantRanker(ParticipantRanker, abc.ABC):
+    """Rank participants using a random number, weighted by affiliation.
+
+    Subclasses decide which participants to rank, and how to key them.
+    """
+
+    lottery_key: str
+
+    def __init__(self, secret: str | None = None) -> None:
+        # Only simulations should use anything but the configured secret!
+        self.secret = secret
+        # Computed in one batch when ranking, keyed by participant ID.
+        self._affiliation_weights: dict[int, float] = {}
+
+    def prepare(self, participants: list[AnnotatedParticipant]) -> None:
+        super().prepare(participants)
+        self._affiliation_weights = affiliation_weighted_rands(
+            participants, self.lottery_key, self.secret
+        )
+
+    def affiliation_weight(self, participant: models.Participant) -> float:
+        """Return the participant's affiliation-weighted random number."""
+        if participant.pk not in self._affiliation_weights:
+            self._affiliation_weights.update(
+                affiliation_weighted_rands([participant], self.lottery_key, self.secret)
+            )
+        return self._affiliation_weights[participant.pk]
+
+
+class SingleTripParticipantRanker(LotteryParticipantRanker):
     def __init__(self, trip: models.Trip):
+        super().__init__()
         self.trip = trip
+        self.lottery_key = f"trip-{trip.pk}"
 
     def priority_key(self, participant: models.Participant) -> float:
-        lottery_key = f"trip-{self.trip.pk}"
-        return affiliation_weighted_rand(participant, lottery_key)
+        return self.affiliation_weight(participant)
 
     def participants_to_handle(self) -> QuerySet[models.Participant]:
         return models.Participant.objects.filter(signup__trip=self.trip)
@@ -140,6 +236,13 @@ class TripCounts(NamedTuple):
     total: int
 
 
+class ParticipantHistory(NamedTuple):
+    """Past participation that factors into a participant's Winter School rank."""
+
+    trip_counts: TripCounts
+    trips_led: int
+
+
 class WinterSchoolPriorityRank(NamedTuple):
     """An ordered list of factors for identifying a participant's rank, or lottery number.
 
@@ -159,8 +262,13 @@ class WinterSchoolPriorityRank(NamedTuple):
     affiliation_weight: float
 
 
-class WinterSchoolParticipantRanker(ParticipantRanker):
-    def __init__(self, execution_datetime: datetime | None = None):
+class WinterSchoolParticipantRanker(LotteryParticipantRanker):
+    def __init__(
+        self,
+        execution_datetime: datetime | None = None,
+        secret: str | None = None,
+    ):
+        super().__init__(secret)
         # It's important that we be able to simulate the future time with `execution_datetime`
         # If test-running the lottery in advance, we want the same ranking to be used later
         self.lottery_runtime = execution_datetime or local_now()
@@ -169,18 +277,85 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
         self.jan_1st = self.today.replace(month=1, day=1)
         self.lottery_key = f"ws-{today.isoformat()}"
 
+        # Populated in bulk when ranking, keyed by participant ID.
+        # (Participants absent from this table have their history queried directly)
+        self._history: dict[int, ParticipantHistory] = {}
+        self.priority_keys: dict[int, WinterSchoolPriorityRank] = {}
+
+    def __iter__(self):
+        self.load_history()
+        yield from super().__iter__()
+
+    def load_history(self) -> None:
+        self._history = self.fetch_history()
+
+    def fetch_history(self) -> dict[int, ParticipantHistory]:
+        """Count past trips for every participant to be ranked.
+
+        Ranking each participant requires knowing how many trips they attended,
+        flaked on, and led. Querying this per participant results in thousands
+        of queries for a typical Winter School week, so we instead fetch history
+        for all participants at once, using a fixed number of queries.
+        """
+        participants = self.participants_to_handle()
+        par_pks: list[int] = list(participants.values_list("pk", flat=True))
+
+        on_trip: dict[int, set[int]] = defaultdict(set)
+        for par_pk, trip_pk in models.SignUp.objects.filter(
+            participant__in=participants,
+            on_trip=True,
+            trip__program=enums.Program.WINTER_SCHOOL.value,
+            trip__trip_date__gt=self.jan_1st,
+            trip__trip_date__lt=self.today,
+        ).values_list("participant_id", "trip_id"):
+            on_trip[par_pk].add(trip_pk)
+
+        flaked: dict[int, set[int]] = defaultdict(set)
+        for par_pk, trip_pk in (
+            without_old_feedback(
+                models.Feedback.objects.filter(
+                    participant__in=participants,
+                    showed_up=False,
+                    trip__program=enums.Program.WINTER_SCHOOL.value,
+                )
+            )
+            .values_list("participant_id", "trip_id")
+            .distinct()
+        ):
+            flaked[par_pk].add(trip_pk)
+
+        trips_led: dict[int, int] = dict(
+            models.Trip.leaders.through.objects.filter(
+                participant__in=participants,
+                trip__trip_date__gt=self._led_trips_cutoff,
+                trip__trip_date__lt=self.today,
+            )
+            .values_list("participant_id")
+            .annotate(Count("trip_id"))
+        )
+
+        return {
+            pk: ParticipantHistory(
+                trip_counts=self._trip_counts(on_trip[pk], flaked[pk]),
+                trips_led=trips_led.get(pk, 0),
+            )
+            for pk in par_pks
+        }
+
     def get_rank_override(self, participant: models.Participant) -> int:
         """Return any present rank overrides. For 99% of people, returns 0."""
         # TODO: Use a cleaner memoization pattern, lru_cache maybe.
         if not hasattr(self, "adjustments_by_participant"):
-            adjustments = models.LotteryAdjustment.objects.filter(
-                expires__gt=self.lottery_runtime
-            )
-            self.adjustments_by_participant = dict(
-                adjustments.values_list("participant_id", "adjustment")
-            )
+            self.adjustments_by_participant = self.fetch_adjustments()
         return self.adjustments_by_participant.get(participant.pk, 0)
 
+    def fetch_adjustments(self) -> dict[int, int]:
+        """Return all adjustments in effect for this lottery, by participant ID."""
+        adjustments = models.LotteryAdjustment.objects.filter(
+            expires__gt=self.lottery_runtime
+        )
+        return dict(adjustments.values_list("participant_id", "adjustment"))
+
     def participants_to_handle(self) -> QuerySet[models.Participant]:
         # For simplicity, only look at participants who actually have signups
         return models.Participant.objects.filter(
@@ -210,7 +385,7 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
 
         # Ties are resolved by a random number
         # (MIT students/affiliates are more likely to come first)
-        affiliation_weight = affiliation_weighted_rand(participant, self.lottery_key)
+        affiliation_weight = self.affiliation_weight(participant)
 
         # Lower = higher in the list
         return WinterSchoolPriorityRank(
@@ -220,6 +395,17 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
             affiliation_weight,
         )
 
+    def cached_priority_key(
+        self, participant: models.Participant
+    ) -> WinterSchoolPriorityRank:
+        """Return the key computed when ranking (or compute it, just once).
+
+        A participant's key doesn't change over the course of a lottery run.
+        """
+        if participant.pk not in self.priority_keys:
+            self.priority_keys[participant.pk] = self.priority_key(participant)
+        return self.priority_keys[participant.pk]
+
     def flake_factor(self, participant: models.Participant) -> int:
         """Return a number indicating past "flakiness".
 
@@ -250,10 +436,18 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
         participants could easily jump the queue every Winter School if they
         just lead a few trips once and then stop).
         """
-        last_year = self.today - timedelta(days=365)
-        within_last_year = Q(trip_date__gt=last_year, trip_date__lt=self.today)
+        if participant.pk in self._history:
+            return self._history[participant.pk].trips_led
+
+        within_last_year = Q(
+            trip_date__gt=self._led_trips_cutoff, trip_date__lt=self.today
+        )
         return participant.trips_led.filter(within_last_year).count()
 
+    @property
+    def _led_trips_cutoff(self) -> date:
+        return self.today - timedelta(days=365)
+
     def number_ws_trips(self, participant: models.Participant) -> TripCounts:
         """Count trips the participant attended, flaked, and the total.
 
@@ -265,6 +459,9 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
         - Participant flaked, so leader removed them & left feedback
         - Participant flaked. Leader left feedback, but left them on the trip
         """
+        if participant.pk in self._history:
+            return self._history[participant.pk].trip_counts
+
         marked_on_trip = set(
             participant.trip_set.filter(
                 program=enums.Program.WINTER_SCHOOL.value, signup__on_trip=True
@@ -272,8 +469,10 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
             .filter(trip_date__gt=self.jan_1st, trip_date__lt=self.today)
             .values_list("pk", flat=True)
         )
-        flaked = self.trips_flaked(participant)
+        return self._trip_counts(marked_on_trip, self.trips_flaked(participant))
 
+    @staticmethod
+    def _trip_counts(marked_on_trip: set[int], flaked: set[int]) -> TripCounts:
         # Some leaders mark flakes, but don't remove participants
         # To calculate total, we can't double-count trips
         total = marked_on_trip.union(flaked)
@@ -301,5 +500,93 @@ class WinterSchoolParticipantRanker(ParticipantRanker):
 
         return max(
             non_drivers,
-            key=lambda signup: self.priority_key(signup.participant),
+            key=lambda signup: self.cached_priority_key(signup.participant),
+        )
+
+
+class BumpOrder:
+    """Non-drivers on each trip, ordered by priority (lowest priority last).
+
+    When a driver needs a spot on a full trip, the lowest-priority non-driver
+    is bumped. Rather than re-rank everybody on the trip each time, the order
+    is kept up to date as participants join & leave trips.
+    """
+
+    def __init__(
+        self,
+        ranker: WinterSchoolParticipantRanker,
+        has_no_car: Callable[[int], bool],
+    ) -> None:
+        self.ranker = ranker
+        self.has_no_car = has_no_car
+        self._ordered: dict[int, list[tuple[WinterSchoolPriorityRank, int]]] = (
+            defaultdict(list)
+        )
+        self._signups: dict[int, models.SignUp] = {}
+
+    def _sort_key(self, signup: models.SignUp) -> tuple[WinterSchoolPriorityRank, int]:
+        key = self.ranker.priority_keys.get(signup.participant_id)
+        if key is None:
+            key = self.ranker.cached_priority_key(signup.participant)
+        return (key, signup.pk)
+
+    def update(self, signup: models.SignUp) -> None:
+        """Record that the signup joined or left its trip (or neither)."""
+        if signup.on_trip and self.has_no_car(signup.participant_id):
+            if signup.pk not in self._signups:
+                insort(self._ordered[signup.trip_id], self._sort_key(signup))
+            self._signups[signup.pk] = signup  # (Always hold the latest instance)
+        elif self._signups.pop(signup.pk, None) is not None:
+            self._ordered[signup.trip_id].remove(self._sort_key(signup))
+
+    def lowest(self, trip_id: int) -> models.SignUp | None:
+        """Return the lowest-priority non-driver on the trip, if any."""
+        ordered = self._ordered.get(trip_id)
+        return self._signups[ordered[-1][1]] if ordered else None
+
+
+class LegacyComparison(NamedTuple):
+    """One lottery's ranking, both as it is now & as it was before keyed hashing."""
+
+    legacy: list[tuple[models.Participant, Any]]
+    new: list[tuple[models.Participant, Any]]
+
+    @property
+    def displacement(self) -> dict[int, int]:
+        """Map each participant to how many places they moved (positive = later)."""
+        legacy_index = {par.pk: i for i, (par, _) in enumerate(self.legacy)}
+        return {par.pk: i - legacy_index[par.pk] for i, (par, _) in enumerate(self.new)}
+
+    def reproduces(self, lottery_log: str) -> bool:
+        """Return if the legacy ranking is exactly what a single-trip lottery logged.
+
+        Single-trip lotteries log every participant in order, with their key.
+        """
+        logged_keys = [
+            line.rsplit(", ", 1)[-1].removesuffix(")")
+            for line in lottery_log.splitlines()
+            if re.match(r"^\s*\d+\. ", line)
+        ]
+        return logged_keys == [str(key) for _, key in self.legacy]
+
+
+def compare_with_legacy(ranker: LotteryParticipantRanker) -> LegacyComparison:
+    """Rank participants both with & without keyed hashing.
+
+    Only the random number changes; any other ranking factors are unaffected.
+    """
+    ranked = list(ranker)
+
+    def legacy_key(participant: models.Participant, key: Any) -> Any:
+        legacy_weight = legacy_affiliation_weighted_rand(
+            participant, ranker.lottery_key
         )
+        if isinstance(key, WinterSchoolPriorityRank):
+            return key._replace(affiliation_weight=legacy_weight)
+        return legacy_weight
+
+    with_legacy_keys = ((legacy_key(par, key), par) for par, key in ranked)
+    return LegacyComparison(
+        legacy=[(par, key) for key, par in sorted(with_legacy_keys)],
+        new=ranked,
+    )
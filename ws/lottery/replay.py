@@ -0,0 +1,234 @@
+"""Export everything a Winter School lottery reads, then replay it offline.
+
+Reproducing a lottery run would otherwise require a copy of the production
+database. Instead, the inputs to one run (signups, lottery preferences, and
+the history which factors into each participant's rank) are written to a
+single gzipped JSON file. That file can be replayed anywhere, without any
+database access, with the same outcome as the real run.
+
+Replays use the very same ranking & placement code as the real lottery.
+Ranking depends on `settings.PRNG_SEED_SECRET` (which is never exported),
+so outcomes are only identical when replayed with the same secret.
+
+To limit what's shared, only participants' names & affiliations are exported.
+"""
+
+import gzip
+import json
+from collections.abc import Collection
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, cast
+
+from ws import enums, models
+from ws.lottery import AnnotatedParticipant
+from ws.lottery.ledger import TripLedger
+from ws.lottery.memory import LotteryPrefs, WinterSchoolWeek
+from ws.lottery.rank import (
+    ParticipantHistory,
+    TripCounts,
+    WinterSchoolParticipantRanker,
+)
+from ws.lottery.run import (
+    InMemoryWinterSchoolLotteryRunner,
+    OptimalWinterSchoolLotteryRunner,
+)
+
+# Bumped whenever the format changes (old files can't be replayed)
+VERSION = 2
+
+
+def export_snapshot(execution_datetime: datetime) -> dict[str, Any]:
+    """Return (JSON-serializable) inputs to the lottery, as it would run now."""
+    ranker = WinterSchoolParticipantRanker(execution_datetime)
+    week = WinterSchoolWeek.load(after=ranker.today)
+
+    participant_ids = {
+        *week.signups_by_participant,
+        *week.prefs,
+        *(partner.pk for partner in week.partners.values()),
+    }
+    participants = models.Participant.objects.filter(pk__in=participant_ids)
+    return {
+        "version": VERSION,
+        "execution_datetime": ranker.lottery_runtime.isoformat(),
+        "trips": [
+            {
+                "pk": trip.pk,
+                "name": trip.name,
+                "trip_date": trip.trip_date.isoformat(),
+                "maximum_participants": trip.maximum_participants,
+            }
+            for trip in week.trips.values()
+        ],
+        "participants": list(
+            participants.order_by("pk").values("pk", "name", "affiliation")
+        ),
+        # In the order in which participants ranked them
+        "signups": [
+            [signup.pk, signup.participant_id, signup.trip_id, signup.on_trip]
+            for signup_list in week.signups_by_participant.values()
+            for signup in signup_list
+        ],
+        "lottery_info": [
+            [pk, prefs.car_status, prefs.paired_with_id]
+            for pk, prefs in sorted(week.prefs.items())
+        ],
+        "separations": sorted(
+            models.LotterySeparation.objects.filter(
+                initiator_id__in=participant_ids, recipient_id__in=participant_ids
+            ).values_list("initiator_id", "recipient_id")
+        ),
+        "adjustments": sorted(ranker.fetch_adjustments().items()),
+        "history": [
+            [pk, *history.trip_counts, history.trips_led]
+            for pk, history in sorted(ranker.fetch_history().items())
+        ],
+        "leader_drivers": sorted(
+            TripLedger.count_leader_drivers(list(week.trips.values())).items()
+        ),
+        "waitlists": [
+            [trip_id, pk, week.lowest_manual_orders.get(pk)]
+            for trip_id, pk in sorted(week.waitlist_ids.items())
+        ],
+        "waitlist_signups": [
+            [
+                wl_signup.pk,
+                wl_signup.signup_id,
+                wl_signup.waitlist_id,
+                wl_signup.manual_order,
+            ]
+            for wl_signup in week.waitlisted.values()
+        ],
+    }
+
+
+def write_snapshot(snapshot: dict[str, Any], path: Path) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+
+
+def read_snapshot(path: Path) -> dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        snapshot: dict[str, Any] = json.load(f)
+    if snapshot.get("version") != VERSION:
+        raise ValueError(f"Expected a version {VERSION} snapshot")
+    return snapshot
+
+
+class Snapshot:
+    """Lottery inputs, rebuilt as (unsaved) model instances."""
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.data = data
+        self.execution_datetime = datetime.fromisoformat(data["execution_datetime"])
+        self.participants: dict[int, models.Participant] = {
+            par["pk"]: models.Participant(**par) for par in data["participants"]
+        }
+        self.separations = {tuple(pair) for pair in data["separations"]}
+        self.adjustments: dict[int, int] = dict(data["adjustments"])
+        self.history = {
+            pk: ParticipantHistory(
+                TripCounts(attended, flaked, total), trips_led=trips_led
+            )
+            for pk, attended, flaked, total, trips_led in data["history"]
+        }
+
+    def load_week(self) -> WinterSchoolWeek:
+        """Build the week from scratch (placements modify it)."""
+        data = self.data
+        trips = [
+            models.Trip(
+                pk=trip["pk"],
+                name=trip["name"],
+                trip_date=date.fromisoformat(trip["trip_date"]),
+                maximum_participants=trip["maximum_participants"],
+                algorithm="lottery",
+                program=enums.Program.WINTER_SCHOOL.value,
+            )
+            for trip in data["trips"]
+        ]
+        signups = [
+            models.SignUp(
+                pk=pk,
+                participant=self.participants[participant_id],
+                trip_id=trip_id,
+                on_trip=on_trip,
+            )
+            for pk, participant_id, trip_id, on_trip in data["signups"]
+        ]
+        prefs = {
+            pk: LotteryPrefs(car_status, paired_with_id)
+            for pk, car_status, paired_with_id in data["lottery_info"]
+        }
+        return WinterSchoolWeek(
+            trips=trips,
+            signups=signups,
+            prefs=prefs,
+            partners={
+                pk: self.participants[p.paired_with_id]
+                for pk, p in prefs.items()
+                if p.paired_with_id is not None
+            },
+            leader_drivers=dict(data["leader_drivers"]),
+            waitlist_ids={trip_id: pk for trip_id, pk, _ in data["waitlists"]},
+            waitlist_signups=[
+                models.WaitListSignup(
+                    pk=pk,
+                    signup_id=signup_id,
+                    waitlist_id=waitlist_id,
+                    manual_order=manual_order,
+                )
+                for pk, signup_id, waitlist_id, manual_order in data["waitlist_signups"]
+            ],
+            lowest_manual_orders={
+                pk: lowest for _, pk, lowest in data["waitlists"] if lowest is not None
+            },
+        )
+
+
+class SnapshotRanker(WinterSchoolParticipantRanker):
+    """Rank participants exactly as the real lottery did, from a snapshot."""
+
+    def __init__(self, snapshot: Snapshot, week: WinterSchoolWeek) -> None:
+        super().__init__(snapshot.execution_datetime)
+        self.snapshot = snapshot
+        self.week = week
+        self.adjustments_by_participant = snapshot.adjustments
+
+    def load_history(self) -> None:
+        self._history = self.snapshot.history
+
+    def participants_with_pairing(self) -> list[AnnotatedParticipant]:
+        participants = []
+        for pk in self.week.signups_by_participant:
+            participant = cast(AnnotatedParticipant, self.snapshot.participants[pk])
+            participant.reciprocally_paired = int(self.week.reciprocally_paired(pk))
+            participants.append(participant)
+        return participants
+
+
+class ReplayLotteryRunner(InMemoryWinterSchoolLotteryRunner):
+    """Replay a lottery from a snapshot. Nothing is ever saved."""
+
+    def __init__(self, snapshot: Snapshot) -> None:
+        self.snapshot = snapshot
+        super().__init__(snapshot.execution_datetime, dry_run=True)
+
+    def load_week(self) -> WinterSchoolWeek:
+        week = self.snapshot.load_week()
+        self.ranker = SnapshotRanker(self.snapshot, week)
+        return week
+
+    def load_separations(
+        self, participant_ids: Collection[int]
+    ) -> set[tuple[int, int]]:
+        return {
+            (one, other)
+            for one, other in self.snapshot.separations
+            if one in participant_ids and other in participant_ids
+        }
+
+
+class OptimalReplayLotteryRunner(ReplayLotteryRunner, OptimalWinterSchoolLotteryRunner):
+    """Replay a lottery from a snapshot, with optimal placement."""
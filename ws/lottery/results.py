@@ -0,0 +1,85 @@
+"""Structured results of a lottery run, as JSON lines.
+
+Each line is one compact JSON object, with a `type` of:
+
+- `run`: metadata about the lottery run (always the first record)
+- `decision`: where one participant (or pair) was placed or waitlisted
+- `bump`: a participant was moved off a trip to make room for a driver
+- `phase`: time spent & queries made in one phase of the run
+- `summary`: totals for the whole run (always the last record)
+
+Records are written (and flushed) as the run progresses, so a run which dies
+partway still leaves a record of every decision made. Logs are read back one
+line at a time, so even very large logs needn't be loaded into memory.
+"""
+
+import json
+from collections.abc import Collection, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+# Only these records describe (and may be filtered by) participants & trips
+PARTICIPANT_RECORD_TYPES = frozenset({"decision", "bump"})
+
+
+class ResultLog:
+    """Append records to a JSON lines file (created upon the first record).
+
+    The file is opened only to append each record, so every record is on disk
+    as soon as it's written (and no file is left open by unfinished runs).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def write(self, record_type: str, **fields: Any) -> None:
+        record = {"type": record_type, **fields}
+        with self.path.open("a", encoding="utf-8") as log:
+            log.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def _involves_participant(record: dict[str, Any], participant_pk: int) -> bool:
+    return participant_pk in {
+        record.get("participant_pk"),
+        record.get("paired_with_pk"),
+    }
+
+
+def _involves_trip(record: dict[str, Any], trip_pk: int) -> bool:
+    return trip_pk in {
+        record.get("trip_pk"),
+        record.get("placed_trip_pk"),
+        *record.get("ranked_trips", ()),
+    }
+
+
+def read_records(
+    lines: Iterable[str],
+    *,
+    participant_pk: int | None = None,
+    trip_pk: int | None = None,
+    types: Collection[str] = (),
+) -> Iterator[dict[str, Any]]:
+    """Yield records from a result log, optionally filtering them.
+
+    Filtering by participant or trip excludes all records which do not
+    describe participants (e.g. the run's metadata and timing).
+    """
+    if participant_pk is not None or trip_pk is not None:
+        types = set(types or PARTICIPANT_RECORD_TYPES) & PARTICIPANT_RECORD_TYPES
+        if not types:
+            return
+
+    # Records are compact, so we can skip most lines without parsing them.
+    type_markers = [f'"type":{json.dumps(record_type)}' for record_type in types]
+    for line in lines:
+        if type_markers and not any(marker in line for marker in type_markers):
+            continue
+        record = json.loads(line)
+        if participant_pk is not None and not _involves_participant(
+            record, participant_pk
+        ):
+            continue
+        if trip_pk is not None and not _involves_trip(record, trip_pk):
+            continue
+        yield record
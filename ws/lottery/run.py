@@ -1,20 +1,40 @@
+import contextlib
+import hashlib
 import io
 import json
 import logging
-from collections.abc import Mapping
+from collections import Counter
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
 from datetime import datetime
+from functools import cached_property
 from pathlib import Path
+from time import monotonic
 from types import MappingProxyType
+from typing import Any
 
+from django.db import connection, transaction
 from mitoc_const import affiliations
 
 from ws import enums, models, settings
+from ws.lottery import AnnotatedParticipant, optimize
 from ws.lottery.handle import (
+    RankedSignupTable,
     SingleTripParticipantHandler,
     WinterSchoolParticipantHandler,
+    par_is_driver,
+    ranked_signups,
 )
-from ws.lottery.rank import SingleTripParticipantRanker, WinterSchoolParticipantRanker
+from ws.lottery.ledger import DRIVER_CAR_STATUSES, TripLedger
+from ws.lottery.memory import WinterSchoolWeek
+from ws.lottery.rank import (
+    BumpOrder,
+    SingleTripParticipantRanker,
+    WinterSchoolParticipantRanker,
+    WinterSchoolPriorityRank,
+)
+from ws.lottery.results import ResultLog
 from ws.utils.dates import closest_wed_at_noon, local_now
+from ws.utils.signups import add_to_waitlist, deferred_signup_counts
 
 # Map two-letter codes to a human-readable label
 AFFILIATION_MAPPING: Mapping[str, str] = MappingProxyType(
@@ -26,6 +46,17 @@ AFFILIATION_MAPPING: Mapping[str, str] = MappingProxyType(
 )
 
 
+class QueryCounter:
+    """Count every query executed (see `connection.execute_wrapper`)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute: Callable[..., Any], *args: Any) -> Any:
+        self.count += 1
+        return execute(*args)
+
+
 class LotteryRunner:
     """Parent class for a lottery executor.
 
@@ -41,11 +72,23 @@ class LotteryRunner:
         self._participants_seen: dict[int, bool] = {}
         self._participants_handled: dict[int, bool] = {}
 
+        # Once loaded, tracks open slots & drivers for each trip in the lottery.
+        # (Trips missing from the ledger are counted in the database)
+        self.ledger: TripLedger | None = None
+
+        # If configured, structured results are written here as the run progresses
+        self.results: ResultLog | None = None
+
     @property
     def logger_id(self) -> str:
         """Get a unique logger object per each instance."""
         return f"{__name__}.{id(self)}"
 
+    def record(self, record_type: str, **fields: Any) -> None:
+        """Write a record to the structured result log (see `ws.lottery.results`)."""
+        if self.results is not None:
+            self.results.write(record_type, **fields)
+
     def handled(self, participant: models.Participant) -> bool:
         return self._participants_handled.get(participant.pk, False)
 
@@ -74,6 +117,115 @@ class LotteryRunner:
         """
         return trip.signup_set.filter(on_trip=True).last()
 
+    # Placement primitives
+    # --------------------
+    # Handlers decide where participants should go, using only these methods
+    # to inspect and modify signups. By default, they read & write the database.
+    def is_driver(self, participant: models.Participant) -> bool:
+        return par_is_driver(participant)
+
+    def paired_with(self, participant: models.Participant) -> models.Participant | None:
+        try:
+            return participant.lotteryinfo.paired_with
+        except models.LotteryInfo.DoesNotExist:
+            return None
+
+    def reciprocally_paired_with(
+        self, participant: models.Participant
+    ) -> models.Participant | None:
+        try:
+            return participant.lotteryinfo.reciprocally_paired_with
+        except models.LotteryInfo.DoesNotExist:
+            return None
+
+    def open_slots(self, trip: models.Trip) -> int:
+        if self.ledger and self.ledger.tracks(trip):
+            return self.ledger.open_slots(trip.pk)
+        # The trip's own count may be stale (or deferred), so count signups.
+        on_trip = models.SignUp.objects.filter(trip=trip, on_trip=True).count()
+        return trip.maximum_participants - on_trip
+
+    def count_drivers_on_trip(self, trip: models.Trip) -> int:
+        if self.ledger and self.ledger.tracks(trip):
+            return self.ledger.num_drivers(trip.pk)
+        participant_drivers = models.SignUp.objects.filter(
+            trip=trip,
+            participant__lotteryinfo__car_status__in=DRIVER_CAR_STATUSES,
+            on_trip=True,
+        )
+        lottery_leaders = trip.leaders.filter(lotteryinfo__isnull=False)
+        num_leader_drivers: int = sum(
+            leader.lotteryinfo.is_driver for leader in lottery_leaders
+        )
+        return participant_drivers.count() + num_leader_drivers
+
+    def has_unhandled_drivers(
+        self,
+        trip: models.Trip,
+        excluding: Collection[models.Participant],
+    ) -> bool:
+        """Return if any drivers not yet handled signed up for the trip."""
+        driver_signups = models.SignUp.objects.filter(
+            trip=trip,
+            on_trip=False,  # If on the trip, we know they're handled.
+            participant__lotteryinfo__car_status__in=DRIVER_CAR_STATUSES,
+            # TODO (Django 2): Exclude reciprocally-paired participants where both are signed up.
+            # These participants cannot bump.
+            # This is simpler in Django 2 (see `annotate_reciprocally_paired()`)
+        ).exclude(participant_id__in=[par.pk for par in excluding])
+
+        return any(not self.handled(signup.participant) for signup in driver_signups)
+
+    def get_signup(
+        self,
+        participant: models.Participant,
+        trip: models.Trip,
+    ) -> models.SignUp:
+        return models.SignUp.objects.get(participant=participant, trip=trip)
+
+    def has_signup(self, participant: models.Participant, trip: models.Trip) -> bool:
+        return models.SignUp.objects.filter(participant=participant, trip=trip).exists()
+
+    def _record_in_ledger(self, signup: models.SignUp, was_on_trip: bool) -> None:
+        if not (self.ledger and self.ledger.tracks(signup.trip)):
+            return
+        if signup.on_trip != was_on_trip:
+            self.ledger.record(
+                signup.trip_id,
+                is_driver=self.is_driver(signup.participant),
+                change=1 if signup.on_trip else -1,
+            )
+
+    def add_to_trip(self, signup: models.SignUp) -> None:
+        was_on_trip = signup.on_trip
+        signup.on_trip = True
+        signup.save()
+        self._record_in_ledger(signup, was_on_trip)
+
+    def remove_from_trip(self, signup: models.SignUp) -> None:
+        was_on_trip = signup.on_trip
+        signup.on_trip = False
+        signup.save()
+        self._record_in_ledger(signup, was_on_trip)
+
+    def add_to_waitlist(self, signup: models.SignUp, prioritize: bool = False) -> None:
+        was_on_trip = signup.on_trip
+        add_to_waitlist(signup, prioritize=prioritize)
+        self._record_in_ledger(signup, was_on_trip)
+
+    def check_ledger(self) -> None:
+        """Report any trips where the ledger disagrees with the database.
+
+        The ledger should always match. If it doesn't, then either signups
+        were modified outside this lottery run, or placement has a bug.
+        """
+        if self.ledger is None:
+            return
+        for trip_id, (tracked, actual) in self.ledger.discrepancies().items():
+            self.logger.error(
+                "Trip #%d expected to have %s, but has %s", trip_id, tracked, actual
+            )
+
     def __call__(self):
         raise NotImplementedError("Subclasses must implement lottery behavior")
 
@@ -92,13 +244,62 @@ class SingleTripLotteryRunner(LotteryRunner):
         return f"{__name__}.trip.{self.trip.pk}"
 
     def configure_logger(self) -> None:
-        """Configure a stream to save the log to the trip."""
+        """Configure a stream to save the log to the trip (& a structured log)."""
         self.log_stream = io.StringIO()
 
         self.handler = logging.StreamHandler(stream=self.log_stream)
         self.handler.setLevel(logging.DEBUG)
         self.logger.addHandler(self.handler)
 
+        datestring = datetime.strftime(local_now(), "%Y-%m-%dT:%H:%M:%S")
+        self.results = ResultLog(
+            Path(settings.WS_LOTTERY_LOG_DIR, f"trip_{self.trip.pk}_{datestring}.jsonl")
+        )
+
+    @cached_property
+    def lottery_infos(self) -> Mapping[int, models.LotteryInfo]:
+        """Lottery preferences of everybody signed up, keyed by participant."""
+        return {
+            info.participant_id: info
+            for info in models.LotteryInfo.objects.filter(
+                participant__signup__trip=self.trip
+            ).select_related("paired_with")
+        }
+
+    @cached_property
+    def signed_up(self) -> frozenset[int]:
+        """IDs of everybody signed up for the trip (which won't change in a run)."""
+        return frozenset(
+            models.SignUp.objects.filter(trip=self.trip).values_list(
+                "participant_id", flat=True
+            )
+        )
+
+    def is_driver(self, participant: models.Participant) -> bool:
+        info = self.lottery_infos.get(participant.pk)
+        return info is not None and info.is_driver
+
+    def paired_with(self, participant: models.Participant) -> models.Participant | None:
+        info = self.lottery_infos.get(participant.pk)
+        return info.paired_with if info else None
+
+    def has_signup(self, participant: models.Participant, trip: models.Trip) -> bool:
+        if trip.pk != self.trip.pk:
+            return super().has_signup(participant, trip)
+        return participant.pk in self.signed_up
+
+    def trip_partner(
+        self, participant: models.Participant
+    ) -> models.Participant | None:
+        """Return the participant's reciprocal partner, if both signed up."""
+        partner = self.paired_with(participant)
+        if not (partner and self.has_signup(partner, self.trip)):
+            return None
+        partner_info = self.lottery_infos.get(partner.pk)
+        if partner_info and partner_info.paired_with_id == participant.pk:
+            return partner
+        return None
+
     def _make_fcfs(self) -> None:
         """After lottery execution, mark the trip FCFS & write out the log."""
         self.trip.algorithm = "fcfs"
@@ -111,6 +312,13 @@ class SingleTripLotteryRunner(LotteryRunner):
             self.log_stream.close()
             return
 
+        self.record(
+            "run",
+            lottery="single_trip",
+            trip_pk=self.trip.pk,
+            execution_datetime=local_now().isoformat(),
+        )
+
         self.logger.info("Randomly ordering (preference to MIT affiliates)...")
         ranked_participants = list(SingleTripParticipantRanker(self.trip))
 
@@ -129,35 +337,127 @@ class SingleTripLotteryRunner(LotteryRunner):
             )
 
         self.logger.info(50 * "-")
-        for participant, _ in ranked_participants:
-            par_handler = SingleTripParticipantHandler(participant, self, self.trip)
-            par_handler.place_participant()
+        self.ledger = TripLedger.load([self.trip])
+        # (Placement only uses the ledger, so counts needn't be current)
+        with deferred_signup_counts():
+            for global_rank, (participant, key) in enumerate(
+                ranked_participants, start=1
+            ):
+                par_handler = SingleTripParticipantHandler(participant, self, self.trip)
+                json_result = par_handler.place_participant()
+                if json_result is not None:
+                    self.record(
+                        "decision", **json_result, global_rank=global_rank, rank_key=key
+                    )
+        self.check_ledger()
+        self.record("summary", participants=len(ranked_participants))
         self._make_fcfs()
 
 
-class WinterSchoolLotteryRunner(LotteryRunner):
+def ranking_digest(
+    ranked_participants: Iterable[tuple[models.Participant, Any]],
+) -> str:
+    """Summarize the order of participants (to verify it's unchanged on resume)."""
+    pks = ",".join(str(par.pk) for par, _ in ranked_participants)
+    return hashlib.sha256(pks.encode()).hexdigest()
+
+
+# Besides placement state, a run keeps the bookkeeping it reports (and resumes from).
+class WinterSchoolLotteryRunner(LotteryRunner):  # pylint: disable=too-many-instance-attributes
+    # Placements are committed (with a checkpoint) after this many participants
+    checkpoint_interval = 100
+
     def __init__(self, execution_datetime: datetime | None = None) -> None:
         self.execution_datetime = execution_datetime or local_now()
         self.ranker = WinterSchoolParticipantRanker(self.execution_datetime)
+        # Seconds spent in each phase of the run, in the order they happened
+        self.timings: dict[str, float] = {}
+        # Number of queries made in each phase of the run
+        self.query_counts: dict[str, int] = {}
+        # How many participants (or pairs) were placed, waitlisted, or neither
+        self.decision_counts: Counter[str] = Counter()
+        # Once participants are ranked, tracks who would be bumped for a driver.
+        self.bump_order: BumpOrder | None = None
+        # Once loaded, every participant's future signups (in ranked order)
+        self.signup_table: RankedSignupTable | None = None
+        # Progress of this run (only given up front when resuming a past run)
+        self.checkpoint: models.LotteryCheckpoint | None = None
         super().__init__()
         self.configure_logger()
 
+    @classmethod
+    def resume(cls) -> "WinterSchoolLotteryRunner":
+        """Return a runner to finish the latest run that never completed.
+
+        Raises LotteryCheckpoint.DoesNotExist if there's nothing to resume.
+        """
+        checkpoint = models.LotteryCheckpoint.objects.filter(completed=False).latest(
+            "last_updated"
+        )
+        runner = cls(checkpoint.execution_datetime)
+        runner.checkpoint = checkpoint
+        return runner
+
     def configure_logger(self) -> None:
-        """Configure a stream to save the log to the trip."""
+        """Configure a file for the log (and another for structured results)."""
         datestring = datetime.strftime(local_now(), "%Y-%m-%dT:%H:%M:%S")
         filename = Path(settings.WS_LOTTERY_LOG_DIR, f"ws_{datestring}.log")
-        self.handler = logging.FileHandler(filename)
+        self.handler: logging.Handler = logging.FileHandler(filename)
         self.handler.setLevel(logging.DEBUG)
         self.logger.addHandler(self.handler)
+        self.results = ResultLog(filename.with_suffix(".jsonl"))
 
     def __call__(self) -> None:
         self.logger.info(
             "Running the Winter School lottery for %s", self.execution_datetime
         )
+        self.record(
+            "run",
+            lottery="winter_school",
+            lottery_key=self.ranker.lottery_key,
+            execution_datetime=self.execution_datetime.isoformat(),
+            runner=type(self).__name__,
+            resumed_from_rank=self.checkpoint and self.checkpoint.global_rank,
+        )
         self.assign_trips()
-        self.free_for_all()
+        self.check_ledger()
+        with self.timed("free_for_all"):
+            self.free_for_all()
+        if self.checkpoint:
+            self.checkpoint.completed = True
+            self.checkpoint.save()
+        self.record(
+            "summary",
+            **self.decision_counts,
+            seconds=sum(self.timings.values()),
+            queries=sum(self.query_counts.values()),
+        )
         self.handler.close()
 
+    @contextlib.contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        """Record (and log) how long one phase of the run takes, and its queries."""
+        counter = QueryCounter()
+        start = monotonic()
+        try:
+            with connection.execute_wrapper(counter):
+                yield
+        finally:
+            self.timings[phase] = monotonic() - start
+            self.query_counts[phase] = counter.count
+            self.record(
+                "phase",
+                phase=phase,
+                seconds=self.timings[phase],
+                queries=self.query_counts[phase],
+            )
+            self.logger.info(
+                "Phase %r took %.3f seconds (%d queries)",
+                phase,
+                self.timings[phase],
+                self.query_counts[phase],
+            )
+
     def free_for_all(self) -> None:
         """Make trips first-come, first-serve.
 
@@ -171,24 +471,468 @@ class WinterSchoolLotteryRunner(LotteryRunner):
             trip.save()
 
     def signup_to_bump(self, trip: models.Trip) -> models.SignUp | None:
+        if self.bump_order and self.ledger and self.ledger.tracks(trip):
+            return self.bump_order.lowest(trip.pk)
         return self.ranker.lowest_non_driver(trip)
 
+    def load_ledger(self) -> TripLedger:
+        lottery_trips = models.Trip.objects.filter(
+            algorithm="lottery",
+            trip_date__gt=self.execution_datetime.date(),
+            program=enums.Program.WINTER_SCHOOL.value,
+        )
+        return TripLedger.load(list(lottery_trips))
+
+    def load_bump_order(self, ledger: TripLedger) -> BumpOrder:
+        """Order non-drivers already on each trip in the ledger."""
+        signups = models.SignUp.objects.filter(trip_id__in=ledger.trips)
+        with_car = frozenset(
+            models.LotteryInfo.objects.filter(participant__signup__in=signups)
+            .exclude(car_status="none")
+            .values_list("participant_id", flat=True)
+        )
+        bump_order = BumpOrder(self.ranker, has_no_car=lambda pk: pk not in with_car)
+        for signup in signups.filter(on_trip=True).select_related("participant"):
+            bump_order.update(signup)
+        return bump_order
+
+    def load_signup_table(self) -> RankedSignupTable | None:
+        return RankedSignupTable.load(after=self.execution_datetime.date())
+
+    def _track_change(self, signup: models.SignUp) -> None:
+        if self.signup_table:
+            self.signup_table.update(signup)
+        if self.bump_order and self.ledger and self.ledger.tracks(signup.trip):
+            self.bump_order.update(signup)
+
+    def add_to_trip(self, signup: models.SignUp) -> None:
+        super().add_to_trip(signup)
+        self._track_change(signup)
+
+    def remove_from_trip(self, signup: models.SignUp) -> None:
+        super().remove_from_trip(signup)
+        self._track_change(signup)
+
+    def add_to_waitlist(self, signup: models.SignUp, prioritize: bool = False) -> None:
+        super().add_to_waitlist(signup, prioritize=prioritize)
+        self._track_change(signup)
+
+    def get_signup(
+        self,
+        participant: models.Participant,
+        trip: models.Trip,
+    ) -> models.SignUp:
+        signup = self.signup_table and self.signup_table.get(participant.pk, trip.pk)
+        return signup or super().get_signup(participant, trip)
+
+    def has_signup(self, participant: models.Participant, trip: models.Trip) -> bool:
+        if self.signup_table and self.signup_table.get(participant.pk, trip.pk):
+            return True
+        return super().has_signup(participant, trip)
+
+    def ranked_signups(self, participant: models.Participant) -> list[models.SignUp]:
+        """Return the participant's signups for future trips, in ranked order."""
+        if self.signup_table:
+            return self.signup_table.ranked_signups(participant.pk)
+        return list(ranked_signups(participant, after=self.execution_datetime.date()))
+
+    def signed_up_trip_ids(self, participant: models.Participant) -> set[int]:
+        """Return trips the participant signed up for (only future trips, once loaded).
+
+        This is only used to find trips participants ranked in common.
+        """
+        if self.signup_table:
+            return self.signup_table.trip_ids(participant.pk)
+        return set(participant.trip_set.values_list("pk", flat=True))
+
     def assign_trips(self) -> None:
-        num_participants = self.ranker.participants_to_handle().count()
+        with self.timed("rank"):
+            ranked_participants = list(self.ranker)
         self.logger.info(
-            "%s participants signed up for trips this week", num_participants
-        )
-        for global_rank, (participant, key) in enumerate(self.ranker, start=1):
-            # get_affiliation_display() includes extra explanatory text we don't need
-            affiliation = AFFILIATION_MAPPING[participant.affiliation]
-            handling_header = [f"\nHandling {participant}", f"({affiliation}, {key})"]
-            self.logger.debug("\n".join(handling_header))
-            self.logger.debug("-" * max(len(line) for line in handling_header))
+            "%s participants signed up for trips this week", len(ranked_participants)
+        )
+        with self.timed("place"):
+            self.ledger = self.load_ledger()
+            self.bump_order = self.load_bump_order(self.ledger)
+            self.signup_table = self.load_signup_table()
+            self.place_participants(ranked_participants)
+
+    def place_participants(
+        self,
+        ranked_participants: list[
+            tuple[AnnotatedParticipant, WinterSchoolPriorityRank]
+        ],
+    ) -> None:
+        """Place participants in batches, each committed along with a checkpoint.
+
+        When resuming, participants handled before the checkpoint are skipped.
+        """
+        checkpoint = self.start_checkpoint(ranked_participants)
+        interval = self.checkpoint_interval
+        for start in range(checkpoint.global_rank, len(ranked_participants), interval):
+            batch = ranked_participants[start : start + interval]
+            with transaction.atomic(), deferred_signup_counts():
+                for global_rank, (participant, key) in enumerate(
+                    batch, start=start + 1
+                ):
+                    self.handle_participant(global_rank, participant, key)
+                self.save_checkpoint(checkpoint, global_rank=start + len(batch))
+
+    def start_checkpoint(
+        self,
+        ranked_participants: list[
+            tuple[AnnotatedParticipant, WinterSchoolPriorityRank]
+        ],
+    ) -> models.LotteryCheckpoint:
+        """Start a new checkpoint, or restore progress from the one being resumed."""
+        digest = ranking_digest(ranked_participants)
+        if self.checkpoint is None:
+            self.checkpoint, _ = models.LotteryCheckpoint.objects.update_or_create(
+                lottery_key=self.ranker.lottery_key,
+                defaults={
+                    "execution_datetime": self.execution_datetime,
+                    "ranking_digest": digest,
+                    "global_rank": 0,
+                    "seen": [],
+                    "handled": [],
+                    "decision_counts": {},
+                    "completed": False,
+                },
+            )
+            return self.checkpoint
+
+        if self.checkpoint.ranking_digest != digest:
+            raise ValueError(
+                f"Participants are no longer ranked as they were in {self.checkpoint}"
+            )
+        self.logger.info("Resuming after rank %d", self.checkpoint.global_rank)
+        self._participants_seen = dict.fromkeys(self.checkpoint.seen, True)
+        self._participants_handled = dict.fromkeys(self.checkpoint.handled, True)
+        self.decision_counts = Counter(self.checkpoint.decision_counts)
+        return self.checkpoint
+
+    def save_checkpoint(
+        self, checkpoint: models.LotteryCheckpoint, global_rank: int
+    ) -> None:
+        checkpoint.global_rank = global_rank
+        checkpoint.seen = [pk for pk, seen in self._participants_seen.items() if seen]
+        checkpoint.handled = [
+            pk for pk, handled in self._participants_handled.items() if handled
+        ]
+        checkpoint.decision_counts = dict(self.decision_counts)
+        checkpoint.save()
+
+    def handle_participant(
+        self,
+        global_rank: int,
+        participant: AnnotatedParticipant,
+        key: WinterSchoolPriorityRank,
+    ) -> None:
+        # get_affiliation_display() includes extra explanatory text we don't need
+        affiliation = AFFILIATION_MAPPING[participant.affiliation]
+        handling_header = [f"\nHandling {participant}", f"({affiliation}, {key})"]
+        self.logger.debug("\n".join(handling_header))
+        self.logger.debug("-" * max(len(line) for line in handling_header))
+        par_handler = WinterSchoolParticipantHandler(participant, self)
+
+        json_result = par_handler.place_participant()
+        if json_result is not None:
+            self.record_decision(json_result, global_rank, key)
+
+    def record_decision(
+        self,
+        json_result: dict[str, Any],
+        global_rank: int,
+        key: WinterSchoolPriorityRank,
+    ) -> None:
+        if json_result["placed_on_choice"] is not None:
+            self.decision_counts["placed"] += 1
+        elif json_result["waitlisted"]:
+            self.decision_counts["waitlisted"] += 1
+        else:
+            self.decision_counts["unplaced"] += 1
+        self.record(
+            "decision",
+            **json_result,
+            global_rank=global_rank,
+            rank_key=key,
+            has_flaked=key.flake_factor > 0,
+        )
+
+
+class InMemoryWinterSchoolLotteryRunner(WinterSchoolLotteryRunner):
+    """Run the Winter School lottery against a week of data held in memory.
+
+    Participants are placed according to the exact same rules, but instead of
+    saving every decision as it's made, all signups & waitlists for the week are
+    loaded up front and the final outcome is written in a single transaction.
+
+    In a dry run, nothing at all is written to the database (so it's safe
+    to run against a read-only replica). Instead, `report()` describes what
+    the lottery would have done.
+    """
+
+    def __init__(
+        self,
+        execution_datetime: datetime | None = None,
+        *,
+        dry_run: bool = False,
+    ) -> None:
+        self.dry_run = dry_run
+        super().__init__(execution_datetime)
+
+    def assign_trips(self) -> None:
+        with self.timed("load"):
+            self.week = self.load_week()
+        super().assign_trips()
+        if self.dry_run:
+            self.logger.info("Dry run: not saving placements")
+            if self.logger.isEnabledFor(logging.INFO):  # (Describing it isn't free)
+                self.logger.info("DIFF: %s", json.dumps(self.week.diff()))
+            return
+        with self.timed("save"):
+            self.week.save()
+
+    def place_participants(
+        self,
+        ranked_participants: list[
+            tuple[AnnotatedParticipant, WinterSchoolPriorityRank]
+        ],
+    ) -> None:
+        """Place everybody (the week is saved at once, so there's no checkpoint)."""
+        for global_rank, (participant, key) in enumerate(ranked_participants, start=1):
+            self.handle_participant(global_rank, participant, key)
+
+    def load_week(self) -> WinterSchoolWeek:
+        return WinterSchoolWeek.load(after=self.execution_datetime.date())
+
+    def load_signup_table(self) -> RankedSignupTable | None:
+        """The week already holds every signup."""
+        return None
+
+    def load_ledger(self) -> TripLedger:
+        return self.week.ledger
+
+    def check_ledger(self) -> None:
+        if not self.dry_run:  # (Otherwise, the database is expected to differ!)
+            super().check_ledger()
+
+    def free_for_all(self) -> None:
+        if self.dry_run:
+            self.logger.info("Dry run: leaving lottery trips as they are")
+            return
+        super().free_for_all()
+
+    def report(self) -> dict[str, Any]:
+        """Return a JSON-serializable report of a dry run's placements & timing."""
+        assert self.dry_run, "Saved runs have no pending changes to report"
+        return {**self.week.diff(), "timings": self.timings}
+
+    def load_bump_order(self, ledger: TripLedger) -> BumpOrder:
+        bump_order = BumpOrder(self.ranker, has_no_car=self.week.has_no_car)
+        for trip_id in ledger.trips:
+            for signup in self.week.on_trip_non_drivers(trip_id):
+                bump_order.update(signup)
+        return bump_order
+
+    def signup_to_bump(self, trip: models.Trip) -> models.SignUp | None:
+        """Return the lowest-priority non-driver (see `lowest_non_driver()`)."""
+        if self.bump_order:
+            return self.bump_order.lowest(trip.pk)
+        non_drivers = self.week.on_trip_non_drivers(trip.pk)
+        if not non_drivers:
+            return None
+        return max(
+            non_drivers,
+            key=lambda signup: self.ranker.cached_priority_key(signup.participant),
+        )
+
+    def is_driver(self, participant: models.Participant) -> bool:
+        return self.week.is_driver(participant.pk)
+
+    def paired_with(self, participant: models.Participant) -> models.Participant | None:
+        return self.week.paired_with(participant.pk)
+
+    def reciprocally_paired_with(
+        self, participant: models.Participant
+    ) -> models.Participant | None:
+        if not self.week.reciprocally_paired(participant.pk):
+            return None
+        return self.week.paired_with(participant.pk)
+
+    def has_unhandled_drivers(
+        self,
+        trip: models.Trip,
+        excluding: Collection[models.Participant],
+    ) -> bool:
+        excluded_pks = {par.pk for par in excluding}
+        return any(
+            not self.handled(signup.participant)
+            for signup in self.week.waiting_drivers(trip.pk)
+            if signup.participant_id not in excluded_pks
+        )
+
+    def get_signup(
+        self,
+        participant: models.Participant,
+        trip: models.Trip,
+    ) -> models.SignUp:
+        return self.week.get_signup(participant.pk, trip.pk)
+
+    def has_signup(self, participant: models.Participant, trip: models.Trip) -> bool:
+        return self.week.has_signup(participant.pk, trip.pk)
+
+    def add_to_trip(self, signup: models.SignUp) -> None:
+        self.week.add_to_trip(signup)
+        self._track_change(signup)
+
+    def remove_from_trip(self, signup: models.SignUp) -> None:
+        self.week.remove_from_trip(signup)
+        self._track_change(signup)
+
+    def add_to_waitlist(self, signup: models.SignUp, prioritize: bool = False) -> None:
+        self.week.add_to_waitlist(signup, prioritize=prioritize)
+        self._track_change(signup)
+
+    def ranked_signups(self, participant: models.Participant) -> list[models.SignUp]:
+        return self.week.ranked_signups(participant.pk)
+
+    def signed_up_trip_ids(self, participant: models.Participant) -> set[int]:
+        return self.week.signed_up_trip_ids(participant.pk)
+
+
+class OptimalWinterSchoolLotteryRunner(InMemoryWinterSchoolLotteryRunner):
+    """Place the whole week in one shot, as the best overall assignment.
+
+    Rather than giving each participant their best open trip in rank order,
+    this finds the placements that leave the fewest participants out (and the
+    most on their top choices), still favoring higher-priority participants.
+    See `ws.lottery.optimize` for the details.
+    """
+
+    def load_separations(
+        self, participant_ids: Collection[int]
+    ) -> set[tuple[int, int]]:
+        return set(
+            models.LotterySeparation.objects.filter(
+                initiator_id__in=participant_ids, recipient_id__in=participant_ids
+            ).values_list("initiator_id", "recipient_id")
+        )
+
+    def place_participants(
+        self,
+        ranked_participants: list[
+            tuple[AnnotatedParticipant, WinterSchoolPriorityRank]
+        ],
+    ) -> None:
+        """Solve for every placement at once, then make them all."""
+        assert self.ledger is not None
+        handled: list[
+            tuple[
+                WinterSchoolParticipantHandler,
+                list[models.SignUp],
+                int,
+                WinterSchoolPriorityRank,
+            ]
+        ] = []
+        for global_rank, (participant, key) in enumerate(ranked_participants, 1):
             par_handler = WinterSchoolParticipantHandler(participant, self)
+            self.mark_seen(participant)
+            # Like the standard lottery, pairs are placed when the second comes up.
+            if par_handler.paired and not self.seen(par_handler.paired_par):
+                continue
+            future_signups = self.ranked_signups(participant)
+            handled.append((par_handler, future_signups, global_rank, key))
+
+        units = [
+            optimize.Unit(
+                participant_ids=tuple(par.pk for par in par_handler.to_be_placed),
+                choices=tuple(
+                    signup.trip_id
+                    for signup in par_handler.desired_signups(future_signups)
+                    if signup.trip_id in self.ledger.trips
+                ),
+                drivers=sum(self.is_driver(par) for par in par_handler.to_be_placed),
+            )
+            for par_handler, future_signups, _rank, _key in handled
+        ]
+        assignment = optimize.assign(
+            units,
+            {pk: self.ledger.open_slots(pk) for pk in self.ledger.trips},
+            drivers_on_trip={
+                pk: self.ledger.num_drivers(pk) for pk in self.ledger.trips
+            },
+            separations=self.load_separations(
+                {pk for unit in units for pk in unit.participant_ids}
+            ),
+        )
+        self.logger.info("Found an assignment with total cost %d", assignment.cost)
+
+        for index, (par_handler, future_signups, global_rank, key) in enumerate(
+            handled
+        ):
+            json_result = self._make_placement(
+                par_handler,
+                future_signups,
+                trip_id=assignment.trips[index],
+                bumped_from=assignment.bumped.get(index),
+            )
+            for par in par_handler.to_be_placed:
+                self.mark_handled(par)
+            self.record_decision(json_result, global_rank, key)
 
-            json_result = par_handler.place_participant()
-            if json_result is not None:
-                json_result.update(
-                    {"global_rank": global_rank, "has_flaked": key.flake_factor > 0}
+    def _make_placement(
+        self,
+        par_handler: WinterSchoolParticipantHandler,
+        future_signups: list[models.SignUp],
+        trip_id: int,
+        bumped_from: int | None,
+    ) -> dict[str, Any]:
+        """Place (or waitlist) the participant or pair, as the solver decided."""
+        participant = par_handler.participant
+        paired_par = par_handler.paired_par
+        info: dict[str, Any] = {
+            "participant_pk": participant.pk,
+            "paired_with_pk": paired_par and paired_par.pk,
+            "is_paired": bool(par_handler.paired),
+            "affiliation": participant.affiliation,
+            "ranked_trips": [signup.trip_id for signup in future_signups],
+            "placed_on_choice": None,  # One-indexed rank
+            "trip_pk": None,  # Trip placed on (or waitlisted for)
+            "waitlisted": False,
+        }
+
+        if trip_id != optimize.UNPLACED:
+            for par in par_handler.to_be_placed:
+                self.add_to_trip(self.week.get_signup(par.pk, trip_id))
+            if bumped_from is not None:
+                # Made room for a driver, but another trip had room.
+                self.record(
+                    "bump",
+                    participant_pk=participant.pk,
+                    trip_pk=bumped_from,
+                    placed_trip_pk=trip_id,
                 )
-                self.logger.debug("RESULT: %s", json.dumps(json_result))
+            choice = [signup.trip_id for signup in future_signups].index(trip_id)
+            return {**info, "placed_on_choice": choice + 1, "trip_pk": trip_id}
+
+        if bumped_from is not None:
+            # The participant was placed, but made room for a driver.
+            self.add_to_waitlist(
+                self.week.get_signup(participant.pk, bumped_from), prioritize=True
+            )
+            self.record(
+                "bump",
+                participant_pk=participant.pk,
+                trip_pk=bumped_from,
+                placed_trip_pk=None,
+            )
+            return {**info, "waitlisted": True, "trip_pk": bumped_from}
+
+        desired_signups = par_handler.desired_signups(future_signups)
+        if not desired_signups:
+            return info
+        favorite_trip_id = desired_signups[0].trip_id
+        for par in par_handler.to_be_placed:
+            self.add_to_waitlist(self.week.get_signup(par.pk, favorite_trip_id))
+        return {**info, "waitlisted": True, "trip_pk": favorite_trip_id}
@@ -0,0 +1,227 @@
+"""Simulate many Winter School lottery runs, to measure the lottery's fairness.
+
+Any one lottery run is deterministic (see `rank.seed_for`). By varying the
+secret, though, we can sample the whole range of outcomes that participants
+might have had, then report how likely each kind of participant is to get a spot.
+
+Simulations run against a snapshot of one week which is held in memory,
+so runs need no database access & may be spread across many processes.
+"""
+
+import copy
+import logging
+import pickle
+import statistics
+from collections import Counter
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+
+import django
+from django.db import connections
+
+from ws import models
+from ws.lottery import AnnotatedParticipant
+from ws.lottery.memory import WinterSchoolWeek
+from ws.lottery.rank import WinterSchoolParticipantRanker, WinterSchoolPriorityRank
+from ws.lottery.run import AFFILIATION_MAPPING, InMemoryWinterSchoolLotteryRunner
+
+
+class WeekSnapshot:
+    """Everything needed to re-run one week's lottery, without the database."""
+
+    def __init__(
+        self,
+        execution_datetime: datetime,
+        lottery_key: str,
+        ranked: list[tuple[AnnotatedParticipant, WinterSchoolPriorityRank]],
+        week: WinterSchoolWeek,
+    ) -> None:
+        self.execution_datetime = execution_datetime
+        self.lottery_key = lottery_key
+        self.participants = [par for par, _ in ranked]
+        # Every factor besides the random number is the same for each run.
+        self.ranks: dict[int, WinterSchoolPriorityRank] = {
+            par.pk: key for par, key in ranked
+        }
+        self.week = week
+
+    @classmethod
+    def load(cls, execution_datetime: datetime) -> "WeekSnapshot":
+        ranker = WinterSchoolParticipantRanker(execution_datetime)
+        return cls(
+            execution_datetime=ranker.lottery_runtime,
+            lottery_key=ranker.lottery_key,
+            ranked=list(ranker),
+            week=WinterSchoolWeek.load(after=ranker.today),
+        )
+
+
+class SnapshotRanker(WinterSchoolParticipantRanker):
+    """Rank participants from a snapshot, with a different random number."""
+
+    def __init__(self, snapshot: WeekSnapshot, secret: str) -> None:
+        super().__init__(snapshot.execution_datetime, secret)
+        self.snapshot = snapshot
+
+    def load_history(self) -> None:
+        """Participant history is already factored into the snapshot's ranks."""
+
+    def participants_with_pairing(self) -> list[AnnotatedParticipant]:
+        return self.snapshot.participants
+
+    def priority_key(self, participant: models.Participant) -> WinterSchoolPriorityRank:
+        return self.snapshot.ranks[participant.pk]._replace(
+            affiliation_weight=self.affiliation_weight(participant)
+        )
+
+
+class SimulatedLotteryRunner(InMemoryWinterSchoolLotteryRunner):
+    """Place participants from a snapshot. Nothing is logged or saved."""
+
+    def __init__(self, snapshot: WeekSnapshot, secret: str) -> None:
+        self.snapshot = snapshot
+        super().__init__(snapshot.execution_datetime, dry_run=True)
+        self.ranker = SnapshotRanker(snapshot, secret)
+        self.logger.setLevel(logging.WARNING)
+
+    @property
+    def logger_id(self) -> str:
+        """Share one logger, since there may be thousands of simulations."""
+        return f"{__name__}.simulation"
+
+    def configure_logger(self) -> None:
+        """Write no log files."""
+
+    def load_week(self) -> WinterSchoolWeek:
+        return copy.deepcopy(self.snapshot.week)
+
+
+class Tally(NamedTuple):
+    """How many runs placed each participant on a trip (or their top choice)."""
+
+    runs: int
+    placed: Counter[int]
+    first_choice: Counter[int]
+
+    def merge(self, other: "Tally") -> "Tally":
+        return Tally(
+            self.runs + other.runs,
+            self.placed + other.placed,
+            self.first_choice + other.first_choice,
+        )
+
+
+def simulate_runs(snapshot: WeekSnapshot, secrets: Iterable[str]) -> Tally:
+    """Run the lottery once per secret, counting how often participants are placed."""
+    tally = Tally(0, Counter(), Counter())
+    for secret in secrets:
+        runner = SimulatedLotteryRunner(snapshot, secret)
+        runner.assign_trips()
+        placed: Counter[int] = Counter()
+        first_choice: Counter[int] = Counter()
+        # Signups already on a trip (e.g. placed by leaders) aren't the lottery's doing.
+        week = runner.week
+        for par_pk, signups in week.signups_by_participant.items():
+            if any(week.newly_placed(signup) for signup in signups):
+                placed[par_pk] += 1
+            if week.newly_placed(signups[0]):
+                first_choice[par_pk] += 1
+        tally = tally.merge(Tally(1, placed, first_choice))
+    return tally
+
+
+# Each worker process unpickles the snapshot just once, then reuses it.
+_worker_snapshot: list[WeekSnapshot] = []
+
+
+def _init_worker(pickled_snapshot: bytes) -> None:
+    django.setup()  # (Required to unpickle models, if processes are spawned)
+    _worker_snapshot.append(pickle.loads(pickled_snapshot))  # noqa: S301
+
+
+def _simulate_in_worker(secrets: list[str]) -> Tally:
+    return simulate_runs(_worker_snapshot[0], secrets)
+
+
+def simulate(
+    snapshot: WeekSnapshot,
+    secrets: list[str],
+    workers: int = 1,
+) -> Tally:
+    """Simulate one lottery run per secret, spread across worker processes."""
+    if workers <= 1:
+        return simulate_runs(snapshot, secrets)
+
+    # Database connections must never be shared with forked processes.
+    connections.close_all()
+    batches = [secrets[i :: workers * 4] for i in range(workers * 4)]
+    tally = Tally(0, Counter(), Counter())
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(pickle.dumps(snapshot),),
+    ) as pool:
+        for batch_tally in pool.map(_simulate_in_worker, filter(None, batches)):
+            tally = tally.merge(batch_tally)
+    return tally
+
+
+class Distribution(NamedTuple):
+    """Summary of placement probabilities across a group of participants."""
+
+    participants: int
+    mean: float
+    minimum: float
+    median: float
+    maximum: float
+
+    @classmethod
+    def of(cls, probabilities: list[float]) -> "Distribution":
+        return cls(
+            participants=len(probabilities),
+            mean=statistics.fmean(probabilities),
+            minimum=min(probabilities),
+            median=statistics.median(probabilities),
+            maximum=max(probabilities),
+        )
+
+
+def fairness_report(
+    snapshot: WeekSnapshot,
+    tally: Tally,
+) -> dict[str, dict[str, dict[str, Distribution]]]:
+    """Report placement probabilities by affiliation, flakiness, & driver status.
+
+    For each group, we describe the distribution of individual participants'
+    probability of being placed on any trip, and on their first choice.
+    """
+    affiliations = {par.pk: par.affiliation for par in snapshot.participants}
+    groupings: dict[str, Callable[[int], str]] = {
+        "affiliation": lambda pk: AFFILIATION_MAPPING.get(
+            affiliations[pk], affiliations[pk]
+        ),
+        "flake_factor": lambda pk: str(snapshot.ranks[pk].flake_factor),
+        "driver": lambda pk: (
+            "driver" if snapshot.week.is_driver(pk) else "non-driver"
+        ),
+    }
+
+    report: dict[str, dict[str, dict[str, Distribution]]] = {}
+    for grouping, group_for in groupings.items():
+        groups: dict[str, list[int]] = {}
+        for par in snapshot.participants:
+            groups.setdefault(group_for(par.pk), []).append(par.pk)
+        report[grouping] = {
+            group: {
+                "placed": Distribution.of(
+                    [tally.placed[pk] / tally.runs for pk in pks]
+                ),
+                "first_choice": Distribution.of(
+                    [tally.first_choice[pk] / tally.runs for pk in pks]
+                ),
+            }
+            for group, pks in sorted(groups.items())
+        }
+    return report
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the Winter School lottery (and count its queries) on generated "
+        "weeks of a given scale. Generated data is never saved."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--scale",
+            action="append",
+            help="Size of week to generate: small, medium, or large (may be repeated)",
+        )
+        parser.add_argument(
+            "--in-memory",
+            action="store_true",
+            help="Benchmark the in-memory runner instead of the database runner",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for generating each week"
+        )
+        parser.add_argument(
+            "--output",
+            default="ws-lottery-benchmark.json",
+            help="File to write results to",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Results from a previous benchmark, to report any regressions",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # The benchmark builds its week with `ws.tests.factories`, and factory_boy
+        # is only installed with the `test` dependency group.
+        # pylint: disable=import-outside-toplevel
+        try:
+            from ws.lottery import benchmark  # noqa: PLC0415
+        except ImportError as err:
+            raise CommandError(
+                f"Benchmarking requires test dependencies ({err})"
+            ) from err
+
+        scale_names = options["scale"] or ["small"]
+        unknown = set(scale_names) - set(benchmark.SCALES)
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(sorted(unknown))}")
+
+        previous: dict[str, dict[str, Any]] = {}
+        if options["compare"]:
+            for result in json.loads(
+                Path(options["compare"]).read_text(encoding="utf-8")
+            ):
+                previous[result["scale_name"]] = result
+
+        results = []
+        for scale_name in scale_names:
+            self.stdout.write(f"Benchmarking a {scale_name} week...")
+            result = {
+                "scale_name": scale_name,
+                **benchmark.benchmark(
+                    benchmark.SCALES[scale_name],
+                    in_memory=options["in_memory"],
+                    seed=options["seed"],
+                ),
+            }
+            results.append(result)
+
+            for phase, stats in result["phases"].items():
+                self.stdout.write(
+                    f"  {phase:15} {stats['seconds']:8.3f}s {stats['queries']:8} queries"
+                )
+            if scale_name in previous:
+                self.stdout.write(f"  Compared to {previous[scale_name]['commit']}:")
+                comparison = benchmark.compare(previous[scale_name], result)
+                for phase, change in comparison.items():
+                    ratio = change["time_ratio"]
+                    self.stdout.write(
+                        f"  {phase:15} "
+                        + (f"{ratio:8.2f}x" if ratio is not None else "       -")
+                        + f" {change['extra_queries'] or 0:+8} queries"
+                    )
+
+        Path(options["output"]).write_text(
+            json.dumps(results, indent=2), encoding="utf-8"
+        )
+        self.stdout.write(f"Results written to {options['output']}")
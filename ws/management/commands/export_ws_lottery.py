@@ -0,0 +1,27 @@
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ws.lottery import replay
+from ws.utils.dates import local_now
+
+
+class Command(BaseCommand):
+    help = (
+        "Export everything this week's Winter School lottery would read, "
+        "so that it may be replayed without the database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "output", type=Path, help="File to write (gzipped JSON, e.g. week.json.gz)"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        snapshot = replay.export_snapshot(local_now())
+        replay.write_snapshot(snapshot, options["output"])
+        self.stdout.write(
+            f"Exported {len(snapshot['signups'])} signups "
+            f"for {len(snapshot['trips'])} trips to {options['output']}"
+        )
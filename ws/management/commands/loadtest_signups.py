@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+class Command(BaseCommand):
+    help = (
+        "Rush a first-come, first-serve trip with concurrent signups & drops, "
+        "checking that it's never overfilled. Runs in a new (temporary) database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--rush",
+            default="small",
+            help="Size of rush: small, medium, or large",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for choosing who drops"
+        )
+        parser.add_argument(
+            "--output",
+            default="signup-loadtest.json",
+            help="File to write results to",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # The load test builds its rush with `ws.tests.factories`, and factory_boy
+        # is only installed with the `test` dependency group.
+        # pylint: disable=import-outside-toplevel
+        try:
+            from ws import loadtest  # noqa: PLC0415
+        except ImportError as err:
+            raise CommandError(
+                f"Load testing requires test dependencies ({err})"
+            ) from err
+
+        if options["rush"] not in loadtest.RUSHES:
+            raise CommandError(f"Unknown rush: {options['rush']}")
+
+        # Everything the rush creates is committed, so never use the real database.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            result = loadtest.rush_trip(
+                loadtest.RUSHES[options["rush"]], seed=options["seed"]
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for kind, stats in [
+            *result["requests"].items(),
+            ("lock", result["lock_waits"]),
+        ]:
+            if stats["count"]:
+                self.stdout.write(
+                    f"  {kind:8} {stats['count']:6} "
+                    f"p50={stats['p50']:8.1f}ms "
+                    f"p95={stats['p95']:8.1f}ms "
+                    f"p99={stats['p99']:8.1f}ms"
+                )
+        Path(options["output"]).write_text(
+            json.dumps(result, indent=2), encoding="utf-8"
+        )
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if result["problems"]:
+            raise CommandError("\n".join(result["problems"]))
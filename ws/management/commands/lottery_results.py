@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from ws import settings
+from ws.lottery.results import read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream records from a lottery's structured result log, "
+        "optionally only those concerning one participant or trip."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="Result log to read (default: the latest Winter School lottery)",
+        )
+        parser.add_argument(
+            "--participant", type=int, help="Only records for this participant ID"
+        )
+        parser.add_argument("--trip", type=int, help="Only records for this trip ID")
+        parser.add_argument(
+            "--type",
+            action="append",
+            dest="types",
+            help="Only records of this type (may be repeated)",
+        )
+
+    @staticmethod
+    def _latest_ws_log() -> Path:
+        logs = sorted(Path(settings.WS_LOTTERY_LOG_DIR).glob("ws_*.jsonl"))
+        if not logs:
+            raise CommandError("No Winter School lottery result logs found")
+        return logs[-1]
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = Path(options["path"]) if options["path"] else self._latest_ws_log()
+        if not path.is_file():
+            raise CommandError(f"No such result log: {path}")
+
+        with path.open(encoding="utf-8") as lines:
+            for record in read_records(
+                lines,
+                participant_pk=options["participant"],
+                trip_pk=options["trip"],
+                types=options["types"] or (),
+            ):
+                self.stdout.write(json.dumps(record, separators=(",", ":")))
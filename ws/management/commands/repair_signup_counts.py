@@ -0,0 +1,52 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import F
+
+from ws import models
+from ws.utils.signups import refresh_signup_counts, signup_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized signup counts on trips, "
+        "reporting (and fixing) any trips whose counts were wrong."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report trips with wrong counts; don't fix them",
+        )
+
+    @transaction.atomic
+    def handle(self, *args: Any, **options: Any) -> None:
+        actual = signup_counts()
+        stale = (
+            models.Trip.objects.select_for_update()
+            .annotate(
+                actual_on_trip=actual["on_trip_count"],
+                actual_waitlist=actual["waitlist_count"],
+            )
+            .exclude(
+                on_trip_count=F("actual_on_trip"),
+                waitlist_count=F("actual_waitlist"),
+            )
+            .order_by("pk")
+        )
+        stale_pks = []
+        for trip in stale:
+            stale_pks.append(trip.pk)
+            self.stdout.write(
+                f"Trip #{trip.pk}: {trip.on_trip_count} on trip (actually "
+                f"{trip.actual_on_trip}), {trip.waitlist_count} waitlisted "
+                f"(actually {trip.actual_waitlist})"
+            )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(stale_pks)} trip(s) have wrong counts")
+            return
+        refresh_signup_counts(models.Trip.objects.filter(pk__in=stale_pks))
+        self.stdout.write(f"Repaired counts on {len(stale_pks)} trip(s)")
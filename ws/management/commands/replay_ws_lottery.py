@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from ws.lottery import replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a Winter School lottery from an exported snapshot "
+        "(see export_ws_lottery), reporting what it would do."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("snapshot", type=Path, help="Exported snapshot file")
+        parser.add_argument(
+            "--optimal",
+            action="store_true",
+            help="Place everybody at once, as the best overall assignment",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            data = replay.read_snapshot(options["snapshot"])
+        except (OSError, ValueError) as err:
+            raise CommandError(f"Can't read snapshot: {err}") from err
+
+        runner_class = (
+            replay.OptimalReplayLotteryRunner
+            if options["optimal"]
+            else replay.ReplayLotteryRunner
+        )
+        runner = runner_class(replay.Snapshot(data))
+        runner()
+        self.stdout.write(json.dumps(runner.report()))
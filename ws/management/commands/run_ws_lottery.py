@@ -0,0 +1,54 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from ws import models, tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Run this week's Winter School lottery (or resume a run that died "
+        "partway through)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--in-memory",
+            action="store_true",
+            help="Place everybody in memory, saving all placements at once",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Save nothing, instead reporting what the lottery would do",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Finish the last run which never completed, from its checkpoint",
+        )
+        parser.add_argument(
+            "--optimal",
+            action="store_true",
+            help="Place everybody at once, as the best overall assignment",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["resume"] and (
+            options["in_memory"] or options["dry_run"] or options["optimal"]
+        ):
+            raise CommandError("Only runs made in the database may be resumed")
+
+        try:
+            report = tasks.run_ws_lottery(
+                in_memory=options["in_memory"],
+                dry_run=options["dry_run"],
+                resume=options["resume"],
+                optimal=options["optimal"],
+            )
+        except models.LotteryCheckpoint.DoesNotExist as err:
+            raise CommandError("There is no unfinished lottery run to resume") from err
+
+        if report is not None:
+            self.stdout.write(json.dumps(report))
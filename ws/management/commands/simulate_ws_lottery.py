@@ -0,0 +1,73 @@
+import json
+import os
+import secrets
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from ws.lottery import simulate
+from ws.utils.dates import local_now
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run this week's Winter School lottery many times (with different "
+        "secrets), reporting how likely participants are to be placed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--runs", type=int, default=1000, help="Number of lotteries to simulate"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes to run simulations in",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Output the report as JSON"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["runs"] < 1:
+            raise CommandError("At least one run must be simulated")
+
+        snapshot = simulate.WeekSnapshot.load(local_now())
+        if not snapshot.participants:
+            raise CommandError("Nobody has signed up for this week's lottery trips")
+
+        # Each run gets an unrelated secret (the real secret is never used)
+        base_secret = secrets.token_hex(16)
+        tally = simulate.simulate(
+            snapshot,
+            [f"{base_secret}-{i}" for i in range(options["runs"])],
+            workers=options["workers"],
+        )
+        report = simulate.fairness_report(snapshot, tally)
+
+        if options["json"]:
+            as_dicts = {
+                grouping: {
+                    group: {stat: dist._asdict() for stat, dist in stats.items()}
+                    for group, stats in groups.items()
+                }
+                for grouping, groups in report.items()
+            }
+            self.stdout.write(json.dumps({"runs": tally.runs, "report": as_dicts}))
+            return
+
+        self.stdout.write(
+            f"Simulated {tally.runs} lotteries for {len(snapshot.participants)} participants"
+        )
+        for grouping, groups in report.items():
+            self.stdout.write(f"\nBy {grouping.replace('_', ' ')}:")
+            for group, stats in groups.items():
+                placed, first_choice = stats["placed"], stats["first_choice"]
+                self.stdout.write(
+                    f"  {group:45} (n={placed.participants:4}) "
+                    f"placed: {placed.mean:6.1%} "
+                    f"(median {placed.median:6.1%}, "
+                    f"range {placed.minimum:6.1%}-{placed.maximum:6.1%}), "
+                    f"first choice: {first_choice.mean:6.1%}"
+                )
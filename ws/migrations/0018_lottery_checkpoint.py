@@ -0,0 +1,36 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ws", "0017_alter_car_year"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LotteryCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lottery_key", models.CharField(max_length=31, unique=True)),
+                ("execution_datetime", models.DateTimeField()),
+                ("ranking_digest", models.CharField(max_length=64)),
+                ("global_rank", models.PositiveIntegerField(default=0)),
+                ("seen", models.JSONField(default=list)),
+                ("handled", models.JSONField(default=list)),
+                ("decision_counts", models.JSONField(default=dict)),
+                ("completed", models.BooleanField(default=False)),
+                ("time_created", models.DateTimeField(auto_now_add=True)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
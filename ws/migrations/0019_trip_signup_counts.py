@@ -0,0 +1,41 @@
+# Generated by Django 4.2.25 on 2026-10-16 23:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_signups(apps, schema_editor):
+    Trip = apps.get_model("ws", "Trip")
+    SignUp = apps.get_model("ws", "SignUp")
+
+    signups = SignUp.objects.filter(trip=OuterRef("pk")).order_by()
+
+    def count(queryset):
+        counted = queryset.values("trip").annotate(count=Count("pk")).values("count")
+        return Coalesce(Subquery(counted), 0)
+
+    Trip.objects.update(
+        on_trip_count=count(signups.filter(on_trip=True)),
+        waitlist_count=count(signups.filter(waitlistsignup__isnull=False)),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ws", "0018_lottery_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="on_trip_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="waitlist_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_signups, migrations.RunPython.noop),
+    ]
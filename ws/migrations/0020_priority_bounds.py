@@ -0,0 +1,50 @@
+# Generated by Django 4.2.25 on 2026-10-17 00:20
+
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+
+
+def bound_manual_orders(apps, schema_editor):
+    Trip = apps.get_model("ws", "Trip")
+    SignUp = apps.get_model("ws", "SignUp")
+    WaitList = apps.get_model("ws", "WaitList")
+    WaitListSignup = apps.get_model("ws", "WaitListSignup")
+
+    def bound(queryset, group_by, aggregate):
+        bounded = queryset.order_by().values(group_by).annotate(bound=aggregate)
+        return Subquery(bounded.values("bound"))
+
+    signups = SignUp.objects.filter(trip=OuterRef("pk"))
+    Trip.objects.update(
+        highest_manual_order=bound(signups, "trip", Max("manual_order")),
+    )
+    wl_signups = WaitListSignup.objects.filter(waitlist=OuterRef("pk"))
+    WaitList.objects.update(
+        highest_manual_order=bound(wl_signups, "waitlist", Max("manual_order")),
+        lowest_manual_order=bound(wl_signups, "waitlist", Min("manual_order")),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ws", "0019_trip_signup_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="highest_manual_order",
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="waitlist",
+            name="highest_manual_order",
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="waitlist",
+            name="lowest_manual_order",
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(bound_manual_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ws", "0020_priority_bounds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="list_version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
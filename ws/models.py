@@ -1108,6 +1108,14 @@ class Trip(models.Model):
     maximum_participants = models.PositiveIntegerField(
         default=8, verbose_name="Max participants"
     )
+    # Maintained along with signups (see `ws.utils.signups.signups_changed`)
+    on_trip_count = models.PositiveIntegerField(default=0, editable=False)
+    waitlist_count = models.PositiveIntegerField(default=0, editable=False)
+    # At least the highest `manual_order` of any signup (see `last_of_priority`)
+    highest_manual_order = models.IntegerField(null=True, editable=False)
+    # Bumped whenever the trip's row in lists of trips may change
+    # (see `ws.templatetags.trip_tags.cached_trip_list_table`)
+    list_version = models.PositiveIntegerField(default=1, editable=False)
     difficulty_rating = models.CharField(max_length=63)
     level = models.CharField(
         max_length=255,
@@ -1204,6 +1212,95 @@ class Trip(models.Model):
     def __str__(self):  # pylint: disable=invalid-str-returned
         return self.name
 
+    # Only ever written along with the signups they describe
+    SIGNUP_FIELDS = frozenset(
+        {"on_trip_count", "waitlist_count", "highest_manual_order"}
+    )
+
+    # Field values (by attname) as last loaded from, or saved to, the database.
+    # Reassigned (never mutated), so this default is never shared.
+    _loaded_values: dict[str, Any] = {}
+
+    def save(self, *args: Any, **kwargs: Any) -> None:  # pylint: disable=signature-differs
+        """Save the trip, except for its signup counts & ordering.
+
+        Those fields are only ever written along with the signups they describe.
+        Those on this instance may well be stale, so they're not saved.
+
+        Each update also increments `list_version` (in the same query).
+        """
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            self._remember_values(kwargs.get("update_fields"))
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = [
+                field.name
+                for field in self._meta.fields
+                if not field.primary_key and field.name not in self.SIGNUP_FIELDS
+            ]
+        kwargs["update_fields"] = {*update_fields, "list_version"}
+        self.list_version = F("list_version") + 1
+        super().save(*args, **kwargs)
+
+        # The new version is deferred (loaded again, if ever needed)
+        del self.list_version
+        self._loaded_values = {
+            attname: value
+            for attname, value in self._loaded_values.items()
+            if attname != "list_version"
+        }
+        self._remember_values(kwargs["update_fields"])
+
+    @classmethod
+    def from_db(
+        cls, db: str | None, field_names: Collection[str], values: Collection[Any]
+    ) -> Self:
+        trip = super().from_db(db, field_names, values)
+        trip._loaded_values = dict(zip(field_names, values, strict=True))  # noqa: SLF001
+        return trip
+
+    # (Stubs include `from_queryset`, only added in Django 5.1; pass it along if given)
+    def refresh_from_db(  # type: ignore[override]
+        self,
+        using: str | None = None,
+        fields: Iterable[str] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        fields = None if fields is None else list(fields)
+        super().refresh_from_db(using, fields, **kwargs)
+        self._remember_values(fields)
+
+    def _remember_values(self, fields: Iterable[str] | None) -> None:
+        names = None if fields is None else set(fields)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            **self._loaded_values,
+            **{
+                field.attname: getattr(self, field.attname)
+                for field in self._meta.fields
+                if field.attname not in deferred
+                and (names is None or {field.name, field.attname} & names)
+            },
+        }
+
+    def loaded_value(self, attname: str) -> Any:
+        """Return the field's value as last loaded from (or saved to) the database.
+
+        Raises `KeyError` for fields never loaded (new trips, deferred fields).
+        """
+        return self._loaded_values[attname]
+
+    def changed_fields(self) -> set[str]:
+        """Return the attnames of loaded fields which have since been changed."""
+        return {
+            attname
+            for attname, value in self._loaded_values.items()
+            if getattr(self, attname) != value
+        }
+
     def description_to_text(self, maxchars: int | None = None) -> str:
         html = markdown2.markdown(self.description)
         raw_text = BeautifulSoup(html, "html.parser").text.strip()
@@ -1370,9 +1467,9 @@ class Trip(models.Model):
         return date_utils.fcfs_close_time(self.trip_date)
 
     @property
-    def open_slots(self):
-        accepted_signups = self.signup_set.filter(on_trip=True)
-        return self.maximum_participants - accepted_signups.count()
+    def open_slots(self) -> int:
+        """Open spots on the trip (as of when this trip was loaded)."""
+        return self.maximum_participants - self.on_trip_count
 
     @property
     def signups_open(self):
@@ -1400,7 +1497,7 @@ class Trip(models.Model):
         return timezone.now() < self.signups_open_at
 
     @property
-    def last_of_priority(self):
+    def last_of_priority(self) -> int:
         """The 'manual_order' value for a signup to be priority, but below others.
 
         That is, leader-ordered signups should go above other signups. (Let's
@@ -1408,10 +1505,7 @@ class Trip(models.Model):
         they submit the ordering - we want to be sure all their ordering goes
         above any new signups).
         """
-        last_signup = self.signup_set.last()
-        if last_signup is None:
-            return 1
-        return (last_signup.manual_order or 0) + 1
+        return (self.highest_manual_order or 0) + 1
 
     @property
     def itinerary_available_at(self) -> datetime:
@@ -1576,7 +1670,7 @@ class LotteryInfo(models.Model):
         )
 
     @property
-    def reciprocally_paired_with(self):
+    def reciprocally_paired_with(self) -> Participant | None:
         """Return requested partner if they also requested to be paired."""
         if not (self.pk and self.paired_with):  # Must be saved & paired!
             return None
@@ -1671,6 +1765,35 @@ class LotteryAdjustment(models.Model):
         return f"{effect} {self.participant.name} ({self.adjustment}) until {expires}"
 
 
+class LotteryCheckpoint(models.Model):
+    """How far a Winter School lottery run has gotten.
+
+    Participants are placed in batches, and the checkpoint is saved in the same
+    transaction as each batch of placements. If a run dies partway through, it
+    can be resumed from the checkpoint without placing anybody twice.
+    """
+
+    # Identifies the run (and, with the execution time, determines its ranking)
+    lottery_key = models.CharField(max_length=31, unique=True)
+    execution_datetime = models.DateTimeField()
+    # Hash of participant IDs in ranked order (ranking must be identical on resume)
+    ranking_digest = models.CharField(max_length=64)
+
+    # The number of ranked participants who have been handled, in order
+    global_rank = models.PositiveIntegerField(default=0)
+    seen = models.JSONField(default=list)
+    handled = models.JSONField(default=list)
+    decision_counts = models.JSONField(default=dict)
+    completed = models.BooleanField(default=False)
+
+    time_created = models.DateTimeField(auto_now_add=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        status = "completed" if self.completed else f"at rank {self.global_rank}"
+        return f"Lottery {self.lottery_key} ({status})"
+
+
 class WaitListSignup(models.Model):
     """Intermediary between initial signup and the trip's waiting list."""
 
@@ -1691,6 +1814,11 @@ class WaitList(models.Model):
     trip = models.OneToOneField(Trip, on_delete=models.CASCADE)
     unordered_signups = models.ManyToManyField(SignUp, through=WaitListSignup)
 
+    # Bounds on every `manual_order` in the waitlist, widened as orders are given.
+    # (Removing a signup never narrows them - gaps in ordering are harmless)
+    highest_manual_order = models.IntegerField(null=True, editable=False)
+    lowest_manual_order = models.IntegerField(null=True, editable=False)
+
     def __str__(self) -> str:
         return f"Waitlist for {self.trip}"
 
@@ -1710,10 +1838,9 @@ class WaitList(models.Model):
     @property
     def first_of_priority(self) -> int:
         """The 'manual_order' value to be first in the waitlist."""
-        first_signup = self.signups.first()
-        if first_signup is None:
+        if self.highest_manual_order is None:
             return 10
-        return (first_signup.waitlistsignup.manual_order or 0) + 1
+        return self.highest_manual_order + 1
 
     @property
     def last_of_priority(self) -> int:
@@ -1724,16 +1851,10 @@ class WaitList(models.Model):
         waitlist, but to not surpass others who were previously added to the top of the
         waitlist.
         """
-        last_wl_signup = (
-            self.waitlistsignup_set.filter(manual_order__isnull=False)
-            .order_by(F("manual_order").desc(nulls_last=True))
-            .last()
-        )
-
         # Larger number == sooner or list
-        if last_wl_signup is None or last_wl_signup.manual_order is None:
+        if self.lowest_manual_order is None:
             return 10
-        return last_wl_signup.manual_order - 1
+        return self.lowest_manual_order - 1
 
 
 class LeaderApplication(models.Model):
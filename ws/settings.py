@@ -150,9 +150,14 @@ CELERY_BEAT_SCHEDULE = {
         "task": "ws.tasks.send_sole_itineraries",
         "schedule": crontab(minute=0, hour=4),
     },
+    "run-closed-lotteries": {
+        "task": "ws.tasks.run_closed_lotteries",
+        "schedule": crontab(),  # Every minute
+    },
     "run-ws-lottery": {
         "task": "ws.tasks.run_ws_lottery",
         "schedule": crontab(minute=0, hour=14, month_of_year=[1, 2], day_of_week=3),
+        "kwargs": {"in_memory": True},
     },
     "email-all-activity-chairs-about-unapproved-trips": {
         "task": "ws.tasks.email_all_activity_chairs_about_unapproved_trips",
@@ -1 +1 @@
-from . import auth_signals, signup_signals  # noqa: F401
+from . import auth_signals, signup_signals, trip_signals  # noqa: F401
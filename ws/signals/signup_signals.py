@@ -16,22 +16,47 @@ from django.db.models.signals import (
 from django.dispatch import receiver
 from kombu.exceptions import OperationalError
 
-from ws import enums, tasks
+import ws.signups as signup_service
 from ws.celery_config import app
-from ws.models import LeaderSignUp, SignUp, Trip, WaitList
-from ws.utils.signups import trip_or_wait, update_queues_if_trip_open
+from ws.models import LeaderSignUp, SignUp, Trip, WaitList, WaitListSignup
+from ws.utils.signups import signups_changed, widen_priority_bounds
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=SignUp)
-def new_fcfs_signup(sender, instance, created, raw, using, update_fields, **kwargs):
-    """Handles first-come, first-serve signups:
+def count_saved_signup(sender, instance, created, raw, using, update_fields, **kwargs):
+    """Keep the trip's signup counts current."""
+    if update_fields is None or "on_trip" in update_fields:
+        signups_changed(trip_ids=[instance.trip_id])
 
-    When a participant tries to sign up, put them on the trip, or its waiting list.
-    """
-    if created and not getattr(instance, "skip_signals", False):
-        trip_or_wait(instance)
+
+@receiver(post_delete, sender=SignUp)
+def count_deleted_signup(sender, instance, using, **kwargs):
+    signups_changed(trip_ids=[instance.trip_id])
+
+
+@receiver(post_save, sender=WaitListSignup)
+def count_new_waitlist_signup(sender, instance, created, **kwargs):
+    if created:
+        signups_changed(waitlist_ids=[instance.waitlist_id])
+
+
+@receiver(post_delete, sender=WaitListSignup)
+def count_deleted_waitlist_signup(sender, instance, using, **kwargs):
+    signups_changed(waitlist_ids=[instance.waitlist_id])
+
+
+@receiver(post_save, sender=SignUp)
+def order_saved_signup(sender, instance, created, raw, using, update_fields, **kwargs):
+    """Keep the trip's bounds on `manual_order` current."""
+    if update_fields is None or "manual_order" in update_fields:
+        widen_priority_bounds(signups=[instance])
+
+
+@receiver(post_save, sender=WaitListSignup)
+def order_saved_waitlist_signup(sender, instance, created, **kwargs):
+    widen_priority_bounds(wl_signups=[instance])
 
 
 @receiver(pre_delete, sender=Trip)
@@ -49,9 +74,8 @@ def empty_waitlist(sender, instance, using, **kwargs):
 
 @receiver(post_delete, sender=SignUp)
 def free_spot_on_trip(sender, instance, using, **kwargs):
-    """When a participant deletes a signup, update queues if applicable."""
-    if not getattr(instance, "skip_signals", False):
-        update_queues_if_trip_open(instance.trip)
+    """When a signup is deleted, update queues (once committed) if applicable."""
+    signup_service.rebalance_on_commit([instance.trip_id])
 
 
 @receiver(post_save, sender=LeaderSignUp)
@@ -97,51 +121,35 @@ def revoke_existing_task(sender, instance, raw, using, update_fields, **kwargs):
     First-come, first-serve trips don't need a lottery task, and changing
     the lottery time must result in a new scheduled lottery time.
 
-    If we're revoking the task due to changing lottery times,
-    `add_lottery_task` will ensure that new task is scheduled.
+    Lotteries are now run by the periodic `run_closed_lotteries` task
+    (so new trips get no task), but trips created before then may still
+    have a lottery task scheduled.
     """
-    try:
-        trip = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:  # New trip, initiated with no task
+    if instance.pk is None:  # New trip, initiated with no task
         return
 
+    fields = ["signups_close_at", "algorithm", "lottery_task_id"]
+    try:
+        saved = {field: instance.loaded_value(field) for field in fields}
+    except KeyError:  # Trip wasn't loaded from the database (or only partly)
+        try:
+            saved = sender.objects.values(*fields).get(pk=instance.pk)
+        except sender.DoesNotExist:
+            return
+
     # TODO: There's a race condition here; we should lock `trip` exclusively
-    new_close_time = instance.signups_close_at != trip.signups_close_at
-    needs_revoke = new_close_time or trip.algorithm != "lottery"
-    if trip.lottery_task_id and needs_revoke:
+    new_close_time = instance.signups_close_at != saved["signups_close_at"]
+    needs_revoke = new_close_time or saved["algorithm"] != "lottery"
+    if saved["lottery_task_id"] and needs_revoke:
         try:
-            app.control.revoke(trip.lottery_task_id)
+            app.control.revoke(saved["lottery_task_id"])
         except OperationalError:
             # Log the exception, but don't raise exceptions, preventing trip saving
-            logger.exception("Failed to revoke lottery task for trip %s", trip.pk)
+            logger.exception("Failed to revoke lottery task for trip %s", instance.pk)
         else:
             instance.lottery_task_id = None
 
 
-@receiver(post_save, sender=Trip)
-def add_lottery_task(sender, instance, created, raw, using, update_fields, **kwargs):
-    """Add a task to execute the lottery at the time the trip closes.
-
-    If the signups close at some point in the past, this will result in the
-    lottery being executed immediately.
-    """
-    trip = instance
-
-    if trip.program_enum == enums.Program.WINTER_SCHOOL:
-        return  # Winter School lotteries are handled separately
-    if trip.lottery_task_id or trip.algorithm != "lottery":
-        return  # Only new lottery trips get a new task
-
-    try:
-        task_id = tasks.run_lottery.apply_async((trip.pk,), eta=trip.signups_close_at)
-    except OperationalError:
-        logger.exception("Failed to make lottery task for trip %s", trip.pk)
-    else:
-        trip.lottery_task_id = task_id
-        # Use update() to avoid repeated signal on post_save
-        sender.objects.filter(pk=trip.pk).update(lottery_task_id=task_id)
-
-
 @receiver(pre_delete, sender=Trip)
 def revoke_lottery_task(sender, instance, using, **kwargs):
     """Before deleting a Trip, de-schedule the lottery task."""
@@ -0,0 +1,35 @@
+"""Keep cached rows in lists of trips current (see `Trip.list_version`).
+
+Trip edits and signup changes bump the version directly; leaders & their
+ratings (shown in each row) are handled here.
+"""
+
+# Ruff will complain about the large number of arguments. We can ignore for now.
+# ruff: noqa: PLR0913
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from ws.models import LeaderRating, Trip
+from ws.utils.dates import local_date
+
+
+@receiver(m2m_changed, sender=Trip.leaders.through)
+def leaders_changed(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    if action not in {"post_add", "post_remove", "pre_clear"}:
+        return
+    if not reverse:
+        trips = Trip.objects.filter(pk=instance.pk)
+    elif pk_set is not None:
+        trips = Trip.objects.filter(pk__in=pk_set)
+    else:  # Clearing all trips led by the participant
+        trips = instance.trips_led.all()
+    trips.update(list_version=F("list_version") + 1)
+
+
+@receiver(post_save, sender=LeaderRating)
+@receiver(post_delete, sender=LeaderRating)
+def rating_changed(sender, instance, using, **kwargs):
+    """Leaders are listed with their ratings as of each (upcoming) trip."""
+    upcoming = instance.participant.trips_led.filter(trip_date__gte=local_date())
+    upcoming.update(list_version=F("list_version") + 1)
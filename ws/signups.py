@@ -0,0 +1,138 @@
+"""Sign up for trips, drop off, and reorder or resize trips.
+
+These are the entry points for changing who's on a trip (or its waitlist).
+A new signup is placed right away, since the participant should learn
+where they landed. Anything which frees up spots, though, only affects
+*others* on the trip. Such trips are collected, then rebalanced just once
+each after the transaction commits. The caller's transaction never waits
+on a rebalance, and a bulk change (dropping many signups at once, say)
+rebalances each trip once, rather than after every single signup.
+
+Signups deleted by other means (e.g. when deleting a participant) are
+handled the same way (see `ws.signals.signup_signals`).
+"""
+
+from collections.abc import Iterable
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import transaction
+from django.http import HttpRequest
+
+from ws import models
+from ws.utils import signups as signup_utils
+
+# Trips rebalanced by the callbacks of the transaction which is committing.
+# (Only written to during the commit, so a rolled-back transaction leaves it empty)
+_rebalanced_trips: ContextVar[set[int] | None] = ContextVar(
+    "rebalanced_trips", default=None
+)
+# Trips being reordered, which should not then be rebalanced
+_final_trips: ContextVar[frozenset[int]] = ContextVar(
+    "final_trips", default=frozenset()
+)
+
+
+def sign_up(
+    signup: models.SignUp,
+    request: HttpRequest | None = None,
+    trip_must_be_open: bool = False,
+) -> models.SignUp:
+    """Save the signup (if new), placing it on a first-come, first-serve trip.
+
+    The trip stays locked from creation through placement, so that
+    signups are placed in the same order in which they were created.
+    """
+    with transaction.atomic():
+        if signup.trip.algorithm == "fcfs":
+            locked_trip = (
+                models.Trip.objects.select_for_update()
+                .only("maximum_participants", "on_trip_count", "waitlist_count")
+                .get(pk=signup.trip_id)
+            )
+            # A spot freed by a recent drop may not yet have gone to the waitlist.
+            # Those already waiting come first!
+            if locked_trip.open_slots > 0 and locked_trip.waitlist_count:
+                signup_utils.update_queues_if_trip_open(signup.trip)
+        if signup.pk is None:
+            signup.save()
+        return signup_utils.trip_or_wait(
+            signup, request, trip_must_be_open=trip_must_be_open
+        )
+
+
+def drop(signup: models.SignUp) -> None:
+    """Remove the signup, giving its spot to the next on the waitlist (if any)."""
+    drop_all([signup])
+
+
+@transaction.atomic(savepoint=False)
+def drop_all(signups: Iterable[models.SignUp]) -> None:
+    """Remove signups (possibly on many trips), rebalancing each trip just once."""
+    signups = list(signups)
+    # Lock trips (in a consistent order) so that their signup counts stay accurate
+    trips = models.Trip.objects.filter(pk__in={signup.trip_id for signup in signups})
+    list(trips.select_for_update().order_by("pk").values_list("pk", flat=True))
+    for signup in signups:
+        signup.delete()  # (Rebalances on commit, see `ws.signals.signup_signals`)
+
+
+@transaction.atomic(savepoint=False)
+def reorder(
+    trip: models.Trip,
+    ordered_signups: list[models.SignUp],
+    removed: Iterable[models.SignUp] = (),
+) -> None:
+    """Remove some signups, then place all others in exactly the given order.
+
+    The ordering is final; the trip is not rebalanced afterwards (at least,
+    not for any signups removed here).
+    """
+    models.Trip.objects.select_for_update().only("pk").get(pk=trip.pk)
+    token = _final_trips.set(_final_trips.get() | {trip.pk})
+    try:
+        drop_all(removed)
+    finally:
+        _final_trips.reset(token)
+    signup_utils.apply_ordering(trip, ordered_signups)
+
+
+def resize(trip: models.Trip, maximum_participants: int) -> None:
+    """Change the trip's size, rebalancing the trip once committed.
+
+    Raises `ValidationError` if the trip can't be that size.
+    """
+    trip.maximum_participants = maximum_participants
+    trip.full_clean()
+    with transaction.atomic(savepoint=False):
+        models.Trip.objects.select_for_update().only("pk").get(pk=trip.pk)
+        trip.save()
+        rebalance_on_commit([trip.pk])
+
+
+def rebalance_on_commit(trip_ids: Iterable[int]) -> None:
+    """Rebalance each trip's queues once the current transaction commits.
+
+    Outside of a transaction, trips are rebalanced immediately.
+    """
+    to_rebalance = frozenset(trip_ids) - _final_trips.get()
+    if not to_rebalance:
+        return
+    rebalanced = _rebalanced_trips.get()
+    if rebalanced is None:
+        rebalanced = set()
+        _rebalanced_trips.set(rebalanced)
+    # Django discards callbacks from a rolled-back transaction (or savepoint),
+    # so the trip IDs go with them. Callbacks which commit share `rebalanced`.
+    transaction.on_commit(partial(_rebalance, to_rebalance, rebalanced))
+
+
+def _rebalance(trip_ids: frozenset[int], rebalanced: set[int]) -> None:
+    # The next transaction to commit should rebalance its trips anew.
+    if _rebalanced_trips.get() is rebalanced:
+        _rebalanced_trips.set(None)
+    trip_ids -= rebalanced
+    rebalanced.update(trip_ids)
+    # Each trip is rebalanced in its own (brief) transaction.
+    for trip in models.Trip.objects.filter(pk__in=trip_ids, algorithm="fcfs"):
+        signup_utils.update_queues_if_trip_open(trip)
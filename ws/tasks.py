@@ -3,6 +3,7 @@ import logging
 from collections.abc import Iterator
 from datetime import UTC, datetime, timedelta
 from time import monotonic
+from typing import Any
 
 import requests
 from celery import shared_task
@@ -14,7 +15,13 @@ from ws import cleanup, enums, models
 from ws.email import approval, renew
 from ws.email.sole import send_email_to_funds
 from ws.email.trips import send_trips_summary
-from ws.lottery.run import SingleTripLotteryRunner, WinterSchoolLotteryRunner
+from ws.lottery import batch
+from ws.lottery.run import (
+    InMemoryWinterSchoolLotteryRunner,
+    OptimalWinterSchoolLotteryRunner,
+    SingleTripLotteryRunner,
+    WinterSchoolLotteryRunner,
+)
 from ws.utils import dates as date_utils
 from ws.utils import geardb
 
@@ -206,10 +213,49 @@ def send_sole_itineraries() -> None:
 
 
 @shared_task
-def run_ws_lottery() -> None:
+def run_ws_lottery(
+    *,
+    in_memory: bool = False,
+    dry_run: bool = False,
+    resume: bool = False,
+    optimal: bool = False,
+) -> dict[str, Any] | None:
+    """Run the Winter School lottery for this week's trips.
+
+    With `in_memory`, all placements are made without touching the database,
+    then written back in a single transaction (the outcome is identical).
+
+    A dry run writes nothing (it's always in memory), instead reporting
+    what the lottery would do.
+
+    With `optimal`, everybody is placed at once as the best overall assignment
+    (rather than greedily, in rank order). This is always done in memory.
+
+    Otherwise, placements are committed in batches as the run progresses.
+    If a run dies partway through, `resume` finishes it from its last
+    checkpoint (this never applies in memory, where nothing is saved until
+    the very end).
+    """
+    if resume:
+        logger.info("Resuming the last Winter School lottery run")
+        WinterSchoolLotteryRunner.resume()()
+        return None
+
+    in_memory_runner = (
+        OptimalWinterSchoolLotteryRunner
+        if optimal
+        else InMemoryWinterSchoolLotteryRunner
+    )
+    if dry_run:
+        logger.info("Commencing Winter School lottery dry run")
+        dry_runner = in_memory_runner(dry_run=True)
+        dry_runner()
+        return dry_runner.report()
+
     logger.info("Commencing Winter School lottery run")
-    runner = WinterSchoolLotteryRunner()
+    runner = in_memory_runner() if in_memory or optimal else WinterSchoolLotteryRunner()
     runner()
+    return None
 
 
 @shared_task
@@ -247,6 +293,40 @@ def run_lottery(trip_id: int) -> None:
     runner()
 
 
+def _lottery_batch_key(trip_id: int) -> str:
+    return f"lottery-batch-pending-{trip_id}"
+
+
+@shared_task
+def run_closed_lotteries() -> None:
+    """Run the lottery for every (non-WS) trip whose signups have closed.
+
+    Trips which share no participants are run in separate batches, so that
+    batches may be handled in parallel by different workers.
+
+    Trips already dispatched in a batch are skipped until that batch has run
+    (or `LOCK_EXPIRE` passes), so that backed-up workers don't receive the
+    same batches from every sweep.
+    """
+    trip_ids = [
+        trip_id
+        for trip_id in batch.closed_lottery_trips().values_list("pk", flat=True)
+        if cache.add(_lottery_batch_key(trip_id), "true", LOCK_EXPIRE)
+    ]
+    for trip_ids_in_batch in batch.independent_batches(trip_ids):
+        run_lottery_batch.delay(trip_ids_in_batch)
+
+
+@shared_task
+def run_lottery_batch(trip_ids: list[int]) -> None:
+    """Run the lottery for each trip (idempotent, like `run_lottery`)."""
+    try:
+        ran = batch.run_batch(trip_ids)
+    finally:
+        cache.delete_many([_lottery_batch_key(trip_id) for trip_id in trip_ids])
+    logger.info("Ran lotteries for %d of %d trips", len(ran), len(trip_ids))
+
+
 @shared_task
 def email_all_activity_chairs_about_unapproved_trips() -> None:
     pending_trips_by_activity: dict[enums.Activity, list[int]] = {}
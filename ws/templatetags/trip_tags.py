@@ -1,12 +1,15 @@
 import enum
 from collections.abc import Collection, Iterable
 from datetime import timedelta
-from typing import TYPE_CHECKING, Any, TypedDict
+from typing import Any
 
 from django import template
 from django.contrib.auth.models import User
-from django.db.models import Case, Count, IntegerField, QuerySet, Sum, When
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.template.loader import get_template
 from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
 
 import ws.utils.dates as date_utils
 import ws.utils.perms as perm_utils
@@ -18,19 +21,6 @@ from ws.utils.feedback import feedback_cutoff
 register = template.Library()
 
 
-class TripListAnnotations(TypedDict):
-    num_signups: int
-    signups_on_trip: int
-
-
-if TYPE_CHECKING:
-    from django_stubs_ext import WithAnnotations
-
-    AnnotatedTrip = WithAnnotations[models.Trip, TripListAnnotations]
-else:
-    AnnotatedTrip = object
-
-
 class TripStage(enum.IntEnum):
     FCFS_OPEN = 1
     LOTTERY_OPEN = 2
@@ -80,7 +70,6 @@ class TripStage(enum.IntEnum):
         assert trip.signups_open, "Unexpected trip status!"
 
         if trip.algorithm == "fcfs":
-            # `trip.open_slots` works, but includes a SQL query
             if signups_on_trip >= trip.maximum_participants:
                 return cls.FULL_BUT_ACCEPTING_SIGNUPS
             return cls.FCFS_OPEN
@@ -100,19 +89,13 @@ def program_icon(program: enums.Program, default: str) -> str:
     return icons.ICON_BY_PROGRAM[program] or default
 
 
-def annotated_for_trip_list(trips: QuerySet[models.Trip]) -> QuerySet[AnnotatedTrip]:
-    """Modify a trips queryset to have annotated fields used in tags."""
-    # Each trip will need information about its leaders, so prefetch models
-    trips = trips.prefetch_related("leaders", "leaders__leaderrating_set")
+def annotated_for_trip_list(trips: QuerySet[models.Trip]) -> QuerySet[models.Trip]:
+    """Modify a trips queryset to prefetch everything used in tags.
 
-    # Django 2.0: Use conditional aggregation instead!
-    signup_on_trip = Case(
-        When(signup__on_trip=True, then=1), default=0, output_field=IntegerField()
-    )
-    return trips.annotate(
-        num_signups=Count("signup"),
-        signups_on_trip=Sum(signup_on_trip),
-    )
+    Signup counts needn't be aggregated (see `Trip.on_trip_count`).
+    """
+    # Each trip will need information about its leaders, so prefetch models
+    return trips.prefetch_related("leaders", "leaders__leaderrating_set")
 
 
 @register.inclusion_tag("for_templatetags/simple_trip_list.html")
@@ -144,6 +127,95 @@ def trip_list_table(
         "approve_mode": approve_mode,
         "show_trip_stage": show_trip_stage,
         "show_signups_on_trip": show_signups_on_trip,
+        "rows": None,  # Rendered from `trip_list`
+    }
+
+
+# The only fields needed to find a trip's cached row (see `cached_trip_list_table`)
+ROW_KEY_FIELDS = (
+    "pk",
+    "list_version",
+    "trip_date",
+    "algorithm",
+    "maximum_participants",
+    "on_trip_count",
+    "signups_open_at",
+    "signups_close_at",
+)
+# Changes to the row not covered by `list_version` (e.g. a leader's name) expire
+ROW_CACHE_TIMEOUT = int(timedelta(days=1).total_seconds())
+
+
+def _row_cache_key(
+    trip: models.Trip,
+    show_trip_stage: bool,
+    show_signups_on_trip: bool,
+) -> str:
+    # Besides the trip itself, its row depends upon the current date & time
+    stage = (
+        TripStage.stage_for_trip(trip, trip.on_trip_count).value
+        if show_trip_stage
+        else None
+    )
+    return ":".join(
+        str(part)
+        for part in (
+            "trip-list-row",
+            trip.pk,
+            trip.list_version,
+            stage,
+            trip.in_past,
+            show_signups_on_trip,
+        )
+    )
+
+
+@register.inclusion_tag("for_templatetags/trip_list_table.html")
+def cached_trip_list_table(
+    trip_list: Iterable[models.Trip],
+    show_trip_stage: bool = False,
+    show_signups_on_trip: bool = True,
+) -> dict[str, Any]:
+    """Render a (potentially very long) table of trips, mostly from cached rows.
+
+    Trips need only have `ROW_KEY_FIELDS` loaded; only trips without a cached
+    row are fully queried. Rows don't depend on who's viewing them, so
+    anonymous & logged-in users share the same cached rows.
+    """
+    trips = list(trip_list)
+    keys = [
+        _row_cache_key(trip, show_trip_stage, show_signups_on_trip) for trip in trips
+    ]
+    rows = cache.get_many(keys)
+
+    missing = {
+        trip.pk: key for trip, key in zip(trips, keys, strict=True) if key not in rows
+    }
+    if missing:
+        row_template = get_template("for_templatetags/trip_list_row.html")
+        new_rows = {
+            missing[trip.pk]: row_template.render(
+                {
+                    "trip": trip,
+                    "approve_mode": False,
+                    "show_trip_stage": show_trip_stage,
+                    "show_signups_on_trip": show_signups_on_trip,
+                }
+            )
+            for trip in annotated_for_trip_list(
+                models.Trip.objects.filter(pk__in=missing).order_by()
+            )
+        }
+        cache.set_many(new_rows, ROW_CACHE_TIMEOUT)
+        rows.update(new_rows)
+
+    return {
+        "trip_list": trips,
+        "approve_mode": False,
+        "show_trip_stage": show_trip_stage,
+        "show_signups_on_trip": show_signups_on_trip,
+        # (Trips deleted since being listed have no row)
+        "rows": [mark_safe(rows[key]) for key in keys if key in rows],  # noqa: S308
     }
 
 
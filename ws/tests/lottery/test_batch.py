@@ -0,0 +1,155 @@
+from datetime import date, datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.test import TestCase
+from freezegun import freeze_time
+
+from ws import enums, models, tasks
+from ws.lottery import batch
+from ws.tests import factories
+
+CLOSED = datetime(2020, 1, 10, 12, tzinfo=ZoneInfo("America/New_York"))
+
+
+def lottery_trip(**kwargs):
+    kwargs.setdefault("signups_close_at", CLOSED)
+    return factories.TripFactory.create(
+        algorithm="lottery", program=enums.Program.CLIMBING.value, **kwargs
+    )
+
+
+@freeze_time("2020-01-10 12:05:00 EST")
+class ClosedLotteryTripsTests(TestCase):
+    def test_only_closed_non_ws_lotteries(self):
+        closed = lottery_trip()
+        lottery_trip(signups_close_at=datetime(2020, 1, 11, tzinfo=CLOSED.tzinfo))
+        factories.TripFactory.create(
+            algorithm="fcfs",
+            program=enums.Program.CLIMBING.value,
+            signups_close_at=CLOSED,
+        )
+        factories.TripFactory.create(
+            algorithm="lottery",
+            program=enums.Program.WINTER_SCHOOL.value,
+            signups_close_at=CLOSED,
+        )
+        self.assertEqual(list(batch.closed_lottery_trips()), [closed])
+
+    def test_past_trips_ignored(self):
+        """Trips which already happened get no lottery (nor its emails)."""
+        lottery_trip(trip_date=date(2020, 1, 9))
+        self.assertFalse(batch.closed_lottery_trips().exists())
+
+
+class IndependentBatchesTests(TestCase):
+    def test_trips_sharing_participants_are_batched(self):
+        one, two, three, four = (lottery_trip() for _ in range(4))
+        par = factories.ParticipantFactory.create()
+        other_par = factories.ParticipantFactory.create()
+        factories.SignUpFactory.create(participant=par, trip=one)
+        factories.SignUpFactory.create(participant=par, trip=three)
+        factories.SignUpFactory.create(participant=other_par, trip=three)
+        factories.SignUpFactory.create(participant=other_par, trip=four)
+        factories.SignUpFactory.create(trip=two)
+
+        self.assertEqual(
+            batch.independent_batches([four.pk, three.pk, two.pk, one.pk]),
+            [[one.pk, three.pk, four.pk], [two.pk]],
+        )
+
+    def test_no_trips(self):
+        self.assertEqual(batch.independent_batches([]), [])
+
+
+@freeze_time("2020-01-10 12:05:00 EST")
+class RunBatchTests(TestCase):
+    def test_runs_each_lottery_once(self):
+        trip = lottery_trip(maximum_participants=1)
+        other_trip = lottery_trip(maximum_participants=2)
+        driver = factories.LotteryInfoFactory.create(car_status="own").participant
+        factories.SignUpFactory.create(participant=driver, trip=trip)
+        factories.SignUpFactory.create(participant=driver, trip=other_trip)
+        factories.SignUpFactory.create(trip=trip)
+
+        self.assertEqual(
+            batch.run_batch([trip.pk, other_trip.pk]), [trip.pk, other_trip.pk]
+        )
+        trip.refresh_from_db()
+        self.assertEqual(trip.algorithm, "fcfs")
+        self.assertEqual(trip.signup_set.filter(on_trip=True).count(), 1)
+        self.assertEqual(
+            list(other_trip.signup_set.values_list("participant", "on_trip")),
+            [(driver.pk, True)],
+        )
+
+        # Running again changes nothing, since trips are now FCFS.
+        self.assertEqual(batch.run_batch([trip.pk, other_trip.pk]), [])
+
+    def test_deleted_trip(self):
+        trip = lottery_trip()
+        trip_id = trip.pk
+        trip.delete()
+        self.assertEqual(batch.run_batch([trip_id]), [])
+
+    def test_uses_preloaded_lottery_info(self):
+        trip = lottery_trip(maximum_participants=3)
+        alice = factories.ParticipantFactory.create()
+        bob = factories.ParticipantFactory.create()
+        factories.LotteryInfoFactory.create(participant=alice, paired_with=bob)
+        factories.LotteryInfoFactory.create(participant=bob, paired_with=alice)
+        factories.SignUpFactory.create(participant=alice, trip=trip)
+        factories.SignUpFactory.create(participant=bob, trip=trip)
+
+        infos = batch.load_lottery_infos([trip.pk])
+        self.assertEqual(set(infos), {alice.pk, bob.pk})
+
+        runner = batch.BatchedSingleTripLotteryRunner(trip, infos)
+        with self.assertNumQueries(1):  # Just who signed up for this trip
+            self.assertTrue(runner.is_driver(alice))  # Renting counts!
+            self.assertEqual(runner.paired_with(alice), bob)
+            self.assertEqual(runner.trip_partner(bob), alice)
+
+
+@freeze_time("2020-01-10 12:05:00 EST")
+class RunClosedLotteriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_dispatches_independent_batches(self):
+        one, two = lottery_trip(), lottery_trip()
+        with patch.object(tasks.run_lottery_batch, "delay") as delay:
+            tasks.run_closed_lotteries()
+        self.assertEqual(
+            [call.args for call in delay.call_args_list], [([one.pk],), ([two.pk],)]
+        )
+
+    def test_pending_batches_not_dispatched_again(self):
+        one = lottery_trip()
+        with patch.object(tasks.run_lottery_batch, "delay") as delay:
+            tasks.run_closed_lotteries()
+            two = lottery_trip()
+            tasks.run_closed_lotteries()
+        self.assertEqual(
+            [call.args for call in delay.call_args_list], [([one.pk],), ([two.pk],)]
+        )
+
+    def test_dispatched_again_once_batch_runs(self):
+        """Should the lottery somehow not run, a later sweep tries again."""
+        trip = lottery_trip()
+        with (
+            patch.object(tasks.run_lottery_batch, "delay") as delay,
+            patch.object(batch, "run_batch", return_value=[]),
+        ):
+            tasks.run_closed_lotteries()
+            tasks.run_lottery_batch([trip.pk])
+            tasks.run_closed_lotteries()
+        self.assertEqual(
+            [call.args for call in delay.call_args_list], [([trip.pk],), ([trip.pk],)]
+        )
+
+    def test_new_trips_get_no_lottery_task(self):
+        trip = lottery_trip()
+        self.assertIsNone(models.Trip.objects.get(pk=trip.pk).lottery_task_id)
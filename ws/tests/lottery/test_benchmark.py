@@ -0,0 +1,135 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from freezegun import freeze_time
+
+from ws import enums, models
+from ws.lottery import benchmark
+from ws.utils.dates import local_now
+
+TINY = benchmark.Scale(participants=30, trips=4, paired=0.2, separated=0.1)
+
+
+@freeze_time("2020-01-15 09:00:00 EST")
+class GenerateWeekTests(TestCase):
+    def test_generated_week(self):
+        trips = benchmark.generate_week(TINY, local_now())
+        self.assertEqual(len(trips), 4)
+        self.assertTrue(
+            all(
+                trip.algorithm == "lottery"
+                and trip.program == enums.Program.WINTER_SCHOOL.value
+                and trip.trip_date > local_now().date()
+                for trip in trips
+            )
+        )
+
+        signups = models.SignUp.objects.filter(trip__in=trips)
+        self.assertEqual(
+            signups.values("participant_id").distinct().count(),
+            TINY.participants,
+        )
+        self.assertEqual(models.LotterySeparation.objects.count(), 3)
+
+        # Paired participants ranked exactly the same trips, in the same order
+        for info in models.LotteryInfo.objects.filter(paired_with__isnull=False):
+            ranked = signups.order_by("order")
+            self.assertEqual(
+                list(
+                    ranked.filter(participant=info.participant).values_list(
+                        "trip_id", flat=True
+                    )
+                ),
+                list(
+                    ranked.filter(participant=info.paired_with).values_list(
+                        "trip_id", flat=True
+                    )
+                ),
+            )
+
+    def test_same_seed_same_week(self):
+        def describe(trips):
+            return [
+                (trip.maximum_participants, trip.signup_set.count()) for trip in trips
+            ]
+
+        week = describe(benchmark.generate_week(TINY, local_now(), seed=7))
+        self.assertEqual(
+            week, describe(benchmark.generate_week(TINY, local_now(), seed=7))
+        )
+        self.assertNotEqual(
+            week, describe(benchmark.generate_week(TINY, local_now(), seed=8))
+        )
+
+
+@freeze_time("2020-01-15 09:00:00 EST")
+class BenchmarkTests(TestCase):
+    def test_benchmark_rolls_back(self):
+        for in_memory in [False, True]:
+            result = benchmark.benchmark(TINY, in_memory=in_memory)
+            self.assertFalse(models.Trip.objects.exists())
+            self.assertFalse(models.Participant.objects.exists())
+
+            self.assertEqual(result["scale"]["participants"], 30)
+            self.assertEqual(result["runner"], "in_memory" if in_memory else "database")
+            self.assertLessEqual(
+                {"rank", "place", "free_for_all"}, set(result["phases"])
+            )
+            self.assertGreater(result["phases"]["rank"]["queries"], 0)
+            outcome = result["outcome"]
+            self.assertEqual(
+                outcome["placed"] + outcome["waitlisted"] + outcome["unplaced"],
+                outcome["signups"],
+            )
+
+    def test_compare(self):
+        previous = {"phases": {"rank": {"seconds": 2.0, "queries": 10}}}
+        current = {
+            "phases": {
+                "rank": {"seconds": 3.0, "queries": 12},
+                "load": {"seconds": 1.0, "queries": 5},
+            }
+        }
+        self.assertEqual(
+            benchmark.compare(previous, current),
+            {
+                "rank": {"time_ratio": 1.5, "extra_queries": 2},
+                "load": {"time_ratio": None, "extra_queries": None},
+            },
+        )
+
+
+@freeze_time("2020-01-15 09:00:00 EST")
+class BenchmarkCommandTests(TestCase):
+    def test_unknown_scale(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_ws_lottery", scale=["enormous"])
+
+    def test_writes_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir, "results.json")
+            stdout = StringIO()
+            with patch.dict(benchmark.SCALES, {"tiny": TINY}):
+                call_command(
+                    "benchmark_ws_lottery",
+                    scale=["tiny"],
+                    output=str(output),
+                    stdout=stdout,
+                )
+                call_command(
+                    "benchmark_ws_lottery",
+                    scale=["tiny"],
+                    output=str(Path(tmpdir, "again.json")),
+                    compare=str(output),
+                    stdout=stdout,
+                )
+            (result,) = json.loads(output.read_text(encoding="utf-8"))
+
+        self.assertEqual(result["scale_name"], "tiny")
+        self.assertIn("rank", result["phases"])
+        self.assertIn("Compared to", stdout.getvalue())
@@ -1,5 +1,9 @@
-from django.test import TestCase
+import sys
+from unittest.mock import patch
 
+from django.test import SimpleTestCase, TestCase
+
+from ws import models
 from ws.lottery import graphs
 from ws.tests import factories
 
@@ -309,3 +313,47 @@ class GraphTests(TestCase):
 
         for par in all_pars:
             self.assertFalse(graph.isolated_cycles(par))
+
+
+class LargeGraphTests(SimpleTestCase):
+    """Large graphs are handled without recursion (or any database access)."""
+
+    @staticmethod
+    def _make_graph(num_participants, blocks):
+        pars = [models.Participant(pk=pk) for pk in range(1, num_participants + 1)]
+        with patch.object(
+            graphs.SeparationGraph, "_relevant_blocks", return_value=iter(blocks)
+        ):
+            return graphs.SeparationGraph(pars), pars
+
+    def test_long_cycle(self):
+        size = 5 * sys.getrecursionlimit()
+        blocks = [(pk, pk % size + 1) for pk in range(1, size + 1)]
+        graph, pars = self._make_graph(size, blocks)
+
+        cycles = graph.isolated_cycles(pars[0])
+        self.assertEqual(len(cycles), 1)
+        cycle = cycles[0]
+        self.assertEqual(cycle, graphs.Cycle(pars))
+        self.assertEqual(graph.isolated_cycles(pars[-1]), [cycle])
+
+        # Breaking the cycle leaves just a long chain, ending in a terminus.
+        graph.remove(pars[size // 2])
+        self.assertEqual(graph.isolated_cycles(pars[0]), [])
+        self.assertEqual(len(graph.current_graph), size - 2)
+
+    def test_long_chain_into_cycle(self):
+        """Participants leading into a cycle are not themselves part of a cycle."""
+        size = 5 * sys.getrecursionlimit()
+        blocks = [(pk, pk + 1) for pk in range(1, size)]
+        blocks.append((size, size - 1))
+        graph, pars = self._make_graph(size, blocks)
+
+        self.assertEqual(graph.isolated_cycles(pars[0]), [])
+        self.assertEqual(graph.isolated_cycles(pars[-1]), [graphs.Cycle(pars[-2:])])
+
+        # Removal only affects neighbors, leaving the rest of the chain intact.
+        graph.remove(pars[-1])
+        self.assertFalse(graph.isolated_cycles(pars[-2]))
+        self.assertEqual(len(graph.current_graph), size - 2)
+        self.assertEqual(list(graph.participants_affected_by_blocks)[-1], pars[-2])
@@ -1,6 +1,8 @@
+from datetime import date
 from unittest import mock
 
 from django.test import SimpleTestCase, TestCase
+from freezegun import freeze_time
 
 from ws import enums, models
 from ws.lottery import annotate_reciprocally_paired, handle, run
@@ -130,6 +132,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
                 "affiliation": "NA",
                 "ranked_trips": [],
                 "placed_on_choice": None,
+                "trip_pk": None,
                 "waitlisted": False,
             },
         )
@@ -168,6 +171,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
                 "is_paired": True,
                 "ranked_trips": [self.trip.pk],
                 "placed_on_choice": 1,
+                "trip_pk": self.trip.pk,
                 "waitlisted": False,
             },
         )
@@ -209,6 +213,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
                 # Alex wasn't placed on any trip, or even waitlisted! (Neither was John)
                 "ranked_trips": [self.trip.pk],
                 "placed_on_choice": None,
+                "trip_pk": None,
                 "waitlisted": False,
             },
         )
@@ -244,6 +249,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
                 # John ranked two trips! From his perspective, he had his second choice.
                 "ranked_trips": [other_trip.pk, self.trip.pk],
                 "placed_on_choice": 2,
+                "trip_pk": self.trip.pk,
                 "waitlisted": False,
             },
         )
@@ -283,6 +289,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
                 # Cher ranked two trips, got her first choice
                 "ranked_trips": [other_trip.pk, self.trip.pk],
                 "placed_on_choice": 1,
+                "trip_pk": other_trip.pk,
                 "waitlisted": False,
             },
         )
@@ -313,6 +320,7 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
         # Now, try to place the participant, even though both trips are full!
         info = self._place_participant(par)
         self.assertTrue(info["waitlisted"])
+        self.assertEqual(info["trip_pk"], preferred_trip.pk)
         signup = models.SignUp.objects.get(participant=par, trip=preferred_trip)
         self.assertFalse(signup.on_trip)
         self.assertTrue(signup.waitlistsignup)
@@ -482,9 +490,11 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
         # Driver gets the trip, bumps one of the two.
         self._place_participant(driver)
         self._assert_on_trip(driver, preferred_trip)
+        preferred_trip.refresh_from_db()
         self.assertFalse(preferred_trip.open_slots)
 
         # Though there's room on the second trip, we chose to keep them together
+        second_trip.refresh_from_db()
         self.assertTrue(second_trip.open_slots)
         waitlisted_signup = preferred_trip.waitlist.signups.get()
         self.assertIn(waitlisted_signup.participant, [one, two])
@@ -682,3 +692,75 @@ class WinterSchoolPlacementTests(TestCase, Helpers):
         self._place_participant(main_driver)
 
         self._assert_on_trip(main_driver, trip, on_trip=False)
+
+
+class RankedSignupTableTests(TestCase):
+    def setUp(self):
+        self.trip, self.other_trip = (
+            factories.TripFactory.create(
+                algorithm="lottery",
+                program=enums.Program.WINTER_SCHOOL.value,
+                trip_date=date(2020, 1, 18),
+            )
+            for _ in range(2)
+        )
+        self.par = factories.ParticipantFactory.create()
+        self.second = factories.SignUpFactory.create(
+            participant=self.par, trip=self.trip, order=2
+        )
+        self.first = factories.SignUpFactory.create(
+            participant=self.par, trip=self.other_trip, order=1
+        )
+
+        # Signups for trips which aren't in this week's lottery are excluded.
+        factories.SignUpFactory.create(
+            participant=self.par,
+            trip=factories.TripFactory.create(
+                algorithm="fcfs", trip_date=date(2020, 1, 18)
+            ),
+        )
+        factories.SignUpFactory.create(
+            participant=self.par,
+            trip=factories.TripFactory.create(
+                algorithm="lottery", trip_date=date(2020, 1, 11)
+            ),
+        )
+
+    def test_loaded_once(self):
+        with self.assertNumQueries(1):
+            table = handle.RankedSignupTable.load(after=date(2020, 1, 15))
+            self.assertEqual(
+                table.ranked_signups(self.par.pk), [self.first, self.second]
+            )
+            self.assertEqual(
+                table.trip_ids(self.par.pk), {self.trip.pk, self.other_trip.pk}
+            )
+            self.assertEqual(table.get(self.par.pk, self.trip.pk), self.second)
+            self.assertIsNone(table.get(self.par.pk, 37))
+            self.assertEqual(table.ranked_signups(37), [])
+
+    def test_signups_placed_on_trip_are_not_ranked(self):
+        table = handle.RankedSignupTable.load(after=date(2020, 1, 15))
+        signup = models.SignUp.objects.get(pk=self.first.pk)
+        signup.on_trip = True
+        table.update(signup)
+
+        self.assertEqual(table.ranked_signups(self.par.pk), [self.second])
+        self.assertIs(table.get(self.par.pk, self.other_trip.pk), signup)
+        # Every trip is still one the participant signed up for.
+        self.assertEqual(
+            table.trip_ids(self.par.pk), {self.trip.pk, self.other_trip.pk}
+        )
+
+    @freeze_time("2020-01-15 09:00:00 EST")
+    def test_runner_reads_from_table(self):
+        runner = run.WinterSchoolLotteryRunner()
+        runner.signup_table = runner.load_signup_table()
+        with self.assertNumQueries(0):
+            self.assertEqual(runner.ranked_signups(self.par), [self.first, self.second])
+            self.assertEqual(runner.get_signup(self.par, self.trip), self.second)
+            self.assertTrue(runner.has_signup(self.par, self.trip))
+
+        # Placing a participant removes the signup from their ranked signups.
+        runner.add_to_trip(runner.get_signup(self.par, self.other_trip))
+        self.assertEqual(runner.ranked_signups(self.par), [self.second])
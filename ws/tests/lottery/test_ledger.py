@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from ws import models
+from ws.lottery.ledger import TripCount, TripLedger
+from ws.tests import factories
+
+
+class TripLedgerTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(maximum_participants=4)
+        self.other_trip = factories.TripFactory.create(maximum_participants=2)
+
+        driver = factories.ParticipantFactory.create()
+        factories.LotteryInfoFactory.create(participant=driver, car_status="own")
+        self.driver_signup = factories.SignUpFactory.create(
+            participant=driver, trip=self.trip, on_trip=True
+        )
+        factories.SignUpFactory.create(trip=self.trip, on_trip=True)
+        factories.SignUpFactory.create(trip=self.trip, on_trip=False)
+
+        # Leaders only count towards drivers, not slots.
+        leader = factories.ParticipantFactory.create()
+        factories.LotteryInfoFactory.create(participant=leader, car_status="rent")
+        self.trip.leaders.add(leader)
+
+    def test_load(self):
+        with self.assertNumQueries(3):
+            ledger = TripLedger.load([self.trip, self.other_trip])
+        self.assertEqual(
+            ledger.counts(),
+            {
+                self.trip.pk: TripCount(on_trip=2, drivers=2),
+                self.other_trip.pk: TripCount(on_trip=0, drivers=0),
+            },
+        )
+        self.assertEqual(ledger.open_slots(self.trip.pk), 2)
+        self.assertEqual(ledger.open_slots(self.other_trip.pk), 2)
+        self.assertTrue(ledger.tracks(self.trip))
+        self.assertFalse(ledger.tracks(factories.TripFactory.create()))
+
+    def test_record(self):
+        ledger = TripLedger.load([self.trip])
+        ledger.record(self.trip.pk, is_driver=True, change=-1)
+        ledger.record(self.trip.pk, is_driver=False, change=1)
+        self.assertEqual(ledger.open_slots(self.trip.pk), 2)
+        self.assertEqual(ledger.num_drivers(self.trip.pk), 1)
+
+    def test_discrepancies(self):
+        ledger = TripLedger.load([self.trip, self.other_trip])
+        self.assertEqual(ledger.discrepancies(), {})
+
+        # Somebody else modifies signups, without going through the ledger.
+        self.driver_signup.on_trip = False
+        self.driver_signup.save()
+        self.assertEqual(
+            ledger.discrepancies(),
+            {self.trip.pk: (TripCount(2, 2), TripCount(1, 1))},
+        )
+
+        ledger.record(self.trip.pk, is_driver=True, change=-1)
+        self.assertEqual(ledger.discrepancies(), {})
+        self.assertEqual(models.SignUp.objects.filter(on_trip=True).count(), 1)
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from ws.lottery.optimize import UNPLACED, Unit, _Solver, assign
+
+A, B, C = 1, 2, 3
+
+
+class AssignTests(TestCase):
+    def test_nobody_signed_up(self):
+        assignment = assign([], {A: 2})
+        self.assertEqual(assignment.trips, [])
+        self.assertEqual(assignment.cost, 0)
+
+    def test_priority_breaks_ties(self):
+        units = [Unit((10,), (A,)), Unit((11,), (A,))]
+        self.assertEqual(assign(units, {A: 1}).trips, [A, UNPLACED])
+
+    def test_second_choice_to_place_somebody_else(self):
+        """Greedy placement would leave the second participant with nothing."""
+        units = [Unit((10,), (A, B)), Unit((11,), (A,))]
+        self.assertEqual(assign(units, {A: 1, B: 1}).trips, [B, A])
+
+    def test_first_choices_preferred(self):
+        units = [Unit((10,), (A, B)), Unit((11,), (B, A))]
+        self.assertEqual(assign(units, {A: 1, B: 1}).trips, [A, B])
+
+    def test_chain_of_moves(self):
+        units = [Unit((10,), (A, B)), Unit((11,), (B, C)), Unit((12,), (A,))]
+        self.assertEqual(assign(units, {A: 1, B: 1, C: 1}).trips, [B, C, A])
+
+    def test_full_trips_and_unknown_trips(self):
+        units = [Unit((10,), (C, A)), Unit((11,), (B,))]
+        self.assertEqual(assign(units, {A: 1, B: 0}).trips, [A, UNPLACED])
+
+    def test_pairs_placed_together(self):
+        units = [Unit((10,), (A, B)), Unit((11, 12), (A,))]
+        self.assertEqual(assign(units, {A: 2, B: 1}).trips, [B, A])
+
+    def test_pairs_are_not_split(self):
+        units = [Unit((10,), (A,)), Unit((11, 12), (A,))]
+        self.assertEqual(assign(units, {A: 2}).trips, [A, UNPLACED])
+
+    def test_separated_participants(self):
+        units = [Unit((10,), (A, B)), Unit((11,), (A, B))]
+        self.assertEqual(
+            assign(units, {A: 2, B: 2}, separations=[(11, 10)]).trips, [A, B]
+        )
+
+    def test_separation_leaves_participant_unplaced(self):
+        units = [Unit((10,), (A,)), Unit((11,), (A,))]
+        self.assertEqual(
+            assign(units, {A: 2}, separations=[(10, 11)]).trips, [A, UNPLACED]
+        )
+
+    def test_driver_bumps_lowest_non_driver(self):
+        units = [
+            Unit((10,), (A,)),
+            Unit((11,), (A,)),
+            Unit((12,), (A,), drivers=1),
+        ]
+        assignment = assign(units, {A: 2}, drivers_on_trip={A: 1})
+        self.assertEqual(assignment.trips, [A, UNPLACED, A])
+        self.assertEqual(assignment.bumped, {1: A})
+
+    def test_no_bump_with_enough_drivers(self):
+        units = [Unit((10,), (A,)), Unit((11,), (A,), drivers=1)]
+        assignment = assign(units, {A: 1}, drivers_on_trip={A: 2})
+        self.assertEqual(assignment.trips, [A, UNPLACED])
+        self.assertEqual(assignment.bumped, {})
+
+    def test_bumped_participant_placed_elsewhere(self):
+        """Like the standard lottery, bumped participants take any open trip."""
+        units = [Unit((10,), (A, B)), Unit((11,), (A,), drivers=1)]
+        solver = _Solver(units, {A: 1, B: 1}, separations=())
+        solver.assign(0, A)  # (The solver itself would have chosen B instead)
+        self.assertEqual(solver.ensure_drivers({A: 1}, min_drivers=2), {0: A})
+        self.assertEqual(solver.trips, [B, A])
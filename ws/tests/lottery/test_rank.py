@@ -136,19 +136,50 @@ class SeedTests(unittest.TestCase):
         """
         # MIT undergraduates get an advantage: their number is more likely to be lower
         mit_undergrad = models.Participant(pk=12, affiliation="MU")
-        seed = rank.seed_for(mit_undergrad, "trip-142")
-        random.seed(seed)
+        rand = rank.random_floats([mit_undergrad], "trip-142")[mit_undergrad.pk]
         self.assertEqual(
-            random.random() - 0.3,
+            rand - 0.3,
             rank.affiliation_weighted_rand(mit_undergrad, "trip-142"),
         )
 
         # Non-affiliates are just a random number
         non_affiliate = models.Participant(pk=24, affiliation="NA")
-        seed = rank.seed_for(non_affiliate, "trip-142")
-        random.seed(seed)
+        rand = rank.random_floats([non_affiliate], "trip-142")[non_affiliate.pk]
+        self.assertEqual(
+            rand, rank.affiliation_weighted_rand(non_affiliate, "trip-142")
+        )
+
+    def test_random_floats_depend_on_secret(self):
+        """Without knowing the secret, participants can't know their number."""
+        par = models.Participant(pk=12, affiliation="MU")
+        rand = rank.random_floats([par], "ws-2020-01-15")[12]
+        self.assertTrue(0 <= rand < 1)
+        with patch.object(settings, "PRNG_SEED_SECRET", "a-different-secret"):
+            self.assertNotEqual(rank.random_floats([par], "ws-2020-01-15")[12], rand)
+
+    def test_batch_matches_individual(self):
+        """Computing numbers in one batch gives the same values as one at a time."""
+        participants = [
+            models.Participant(pk=pk, affiliation="MG") for pk in range(1, 50)
+        ]
+        batch = rank.affiliation_weighted_rands(participants, "ws-2020-01-15")
+        self.assertEqual(
+            batch,
+            {
+                par.pk: rank.affiliation_weighted_rand(par, "ws-2020-01-15")
+                for par in participants
+            },
+        )
+        # Numbers are unique to each participant.
+        self.assertEqual(len(set(batch.values())), len(participants))
+
+    def test_legacy_rand_uses_seeded_mersenne_twister(self):
+        """The legacy number is what reseeding the global RNG used to give."""
+        mit_undergrad = models.Participant(pk=12, affiliation="MU")
+        random.seed(rank.seed_for(mit_undergrad, "trip-142"))
         self.assertEqual(
-            random.random(), rank.affiliation_weighted_rand(non_affiliate, "trip-142")
+            random.random() - 0.3,
+            rank.legacy_affiliation_weighted_rand(mit_undergrad, "trip-142"),
         )
 
 
@@ -421,3 +452,129 @@ class FlakeFactorTests(TestCase):
             rank.TripCounts(attended=0, flaked=1, total=1),
         )
         self.assertEqual(5, self.ranker.flake_factor(self.participant))
+
+
+@freeze_time("Wed, 24 Jan 2018 09:00:00 EST")
+class BulkHistoryTests(TestCase):
+    @staticmethod
+    def _ws_trip(trip_date: date, algorithm: str = "fcfs") -> models.Trip:
+        return cast(
+            models.Trip,
+            TripFactory.create(
+                program=enums.Program.WINTER_SCHOOL.value,
+                trip_date=trip_date,
+                algorithm=algorithm,
+            ),
+        )
+
+    def setUp(self) -> None:
+        past_trips = [
+            self._ws_trip(date(2018, 1, 13)),
+            self._ws_trip(date(2018, 1, 14)),
+            self._ws_trip(date(2018, 1, 20)),
+        ]
+        upcoming_trip = self._ws_trip(date(2018, 1, 27), algorithm="lottery")
+
+        self.participants = [
+            ParticipantFactory.create(affiliation=aff)
+            for aff in ["MU", "MG", "NA", "NA", "MA"]
+        ]
+        for par in self.participants:
+            SignUpFactory.create(participant=par, trip=upcoming_trip)
+        reliable, flaky, leader, newcomer, disputed = self.participants
+
+        for trip in past_trips:
+            SignUpFactory.create(participant=reliable, trip=trip, on_trip=True)
+            SignUpFactory.create(participant=flaky, trip=trip, on_trip=False)
+            FeedbackFactory.create(participant=flaky, trip=trip, showed_up=False)
+            trip.leaders.add(leader)
+        SignUpFactory.create(participant=leader, trip=past_trips[0], on_trip=True)
+        self._ws_trip(date(2017, 6, 1)).leaders.add(leader)
+
+        # On the trip, but two leaders disagree about whether they showed up
+        SignUpFactory.create(participant=disputed, trip=past_trips[1], on_trip=True)
+        FeedbackFactory.create(participant=disputed, trip=past_trips[1])
+        FeedbackFactory.create(
+            participant=disputed, trip=past_trips[1], showed_up=False
+        )
+        self.assertEqual(newcomer.signup_set.count(), 1)
+
+    def test_history_matches_individual_queries(self) -> None:
+        ranker = rank.WinterSchoolParticipantRanker()
+        with self.assertNumQueries(4):
+            ranker.load_history()
+
+        individually = rank.WinterSchoolParticipantRanker()
+        for par in self.participants:
+            self.assertEqual(
+                ranker.number_ws_trips(par), individually.number_ws_trips(par)
+            )
+            self.assertEqual(
+                ranker.number_trips_led(par), individually.number_trips_led(par)
+            )
+
+    def test_history_served_without_queries(self) -> None:
+        ranker = rank.WinterSchoolParticipantRanker()
+        ranker.load_history()
+        ranker.get_rank_override(self.participants[0])  # (Loads adjustments)
+        with self.assertNumQueries(0):
+            for par in self.participants:
+                ranker.priority_key(par)
+
+    def test_ranking_is_unchanged(self) -> None:
+        ranked = list(rank.WinterSchoolParticipantRanker())
+        self.assertEqual(len(ranked), 5)
+
+        with patch.object(rank.WinterSchoolParticipantRanker, "load_history"):
+            unloaded = rank.WinterSchoolParticipantRanker()
+            self.assertEqual(list(unloaded), ranked)
+
+    def test_keys_kept_from_ranking(self) -> None:
+        ranker = rank.WinterSchoolParticipantRanker()
+        ranked = list(ranker)
+        with self.assertNumQueries(0):
+            for par, key in ranked:
+                self.assertEqual(ranker.cached_priority_key(par), key)
+
+
+class BumpOrderTests(SimpleTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.ranker = rank.WinterSchoolParticipantRanker()
+        self.ranker.priority_keys = {
+            pk: rank.WinterSchoolPriorityRank(0, 0, 0, weight)
+            for pk, weight in [(1, 0.5), (2, 0.9), (3, 0.1), (4, 0.7)]
+        }
+        self.bump_order = rank.BumpOrder(self.ranker, has_no_car=lambda pk: pk != 4)
+
+    def _signup(self, participant_id: int, on_trip: bool = True) -> models.SignUp:
+        return models.SignUp(
+            pk=participant_id * 10,
+            participant_id=participant_id,
+            trip_id=37,
+            on_trip=on_trip,
+        )
+
+    def _lowest(self) -> int | None:
+        signup = self.bump_order.lowest(37)
+        return signup.participant_id if signup else None
+
+    def test_lowest_priority_non_driver(self) -> None:
+        self.assertIsNone(self.bump_order.lowest(37))
+        for participant_id in [1, 2, 3, 4]:
+            self.bump_order.update(self._signup(participant_id))
+
+        self.assertEqual(self._lowest(), 2)
+        self.assertIsNone(self.bump_order.lowest(38))
+
+    def test_leaving_the_trip(self) -> None:
+        for participant_id in [1, 2, 3]:
+            self.bump_order.update(self._signup(participant_id))
+
+        self.bump_order.update(self._signup(2, on_trip=False))
+        self.assertEqual(self._lowest(), 1)
+
+        # Updates for signups never on the trip (or already gone) are harmless
+        self.bump_order.update(self._signup(2, on_trip=False))
+        self.bump_order.update(self._signup(4))  # (Has a car, so never bumped)
+        self.assertEqual(self._lowest(), 1)
@@ -0,0 +1,142 @@
+import gzip
+import json
+import random
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from freezegun import freeze_time
+
+from ws import enums, models
+from ws.lottery import replay, run
+from ws.tests import factories
+from ws.utils.dates import local_now
+
+
+# Ticking ensures that signups & waitlist entries are saved with distinct times.
+@freeze_time("2020-01-15 09:00:00 EST", tick=True)
+class ReplayTests(TestCase):
+    def setUp(self):
+        rand = random.Random("replay")
+        trips = [
+            factories.TripFactory.create(
+                algorithm="lottery",
+                program=enums.Program.WINTER_SCHOOL.value,
+                maximum_participants=size,
+                trip_date=date(2020, 1, 18),
+            )
+            for size in [1, 2, 3, 3]
+        ]
+        past_trip = factories.TripFactory.create(
+            program=enums.Program.WINTER_SCHOOL.value, trip_date=date(2020, 1, 11)
+        )
+        leader = factories.ParticipantFactory.create()
+        factories.LotteryInfoFactory.create(participant=leader, car_status="own")
+        trips[3].leaders.add(leader)
+        past_trip.leaders.add(leader)
+
+        participants = []
+        for i in range(16):
+            par = factories.ParticipantFactory.create(
+                name=f"Participant {i}",
+                affiliation=rand.choice(["MU", "MG", "NA", "NU"]),
+            )
+            car_status = rand.choice(["none", "none", "own", None])
+            if car_status is not None:
+                factories.LotteryInfoFactory.create(
+                    participant=par, car_status=car_status
+                )
+            for order, trip in enumerate(rand.sample(trips, rand.randint(1, 3))):
+                factories.SignUpFactory.create(participant=par, trip=trip, order=order)
+            participants.append(par)
+        factories.SignUpFactory.create(participant=leader, trip=trips[0])
+
+        # Past attendance, flakes, and adjustments all affect rank.
+        for par in participants[:3]:
+            factories.SignUpFactory.create(
+                participant=par, trip=past_trip, on_trip=True
+            )
+        factories.FeedbackFactory.create(
+            participant=participants[0], trip=past_trip, showed_up=False
+        )
+        factories.LotteryAdjustmentFactory.create(
+            participant=participants[4], adjustment=-1
+        )
+        factories.LotterySeparationFactory.create(
+            initiator=participants[5], recipient=participants[6]
+        )
+
+        # A reciprocal pair, and somebody already waitlisted.
+        one, two = participants[7], participants[8]
+        for par, other in [(one, two), (two, one)]:
+            models.LotteryInfo.objects.update_or_create(
+                participant=par, defaults={"paired_with": other}
+            )
+            models.SignUp.objects.get_or_create(participant=par, trip=trips[2])
+        factories.WaitListSignupFactory.create(
+            signup=factories.SignUpFactory.create(trip=trips[0])
+        )
+
+    def _replay(self, runner_class):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "week.json.gz")
+            replay.write_snapshot(replay.export_snapshot(local_now()), path)
+            snapshot = replay.Snapshot(replay.read_snapshot(path))
+
+        runner = runner_class(snapshot)
+        with self.assertNumQueries(0):
+            runner()
+        return runner
+
+    @staticmethod
+    def _placements(report):
+        return {kind: report[kind] for kind in ["placed", "waitlisted", "bumped"]}
+
+    def test_identical_to_dry_run(self):
+        dry_run = run.InMemoryWinterSchoolLotteryRunner(dry_run=True)
+        dry_run()
+
+        replayed = self._replay(replay.ReplayLotteryRunner)
+        self.assertTrue(dry_run.report()["placed"])
+        self.assertEqual(
+            self._placements(replayed.report()), self._placements(dry_run.report())
+        )
+        self.assertEqual(replayed.ranker.priority_keys, dry_run.ranker.priority_keys)
+        self.assertEqual(replayed.decision_counts, dry_run.decision_counts)
+
+    def test_optimal_identical_to_dry_run(self):
+        dry_run = run.OptimalWinterSchoolLotteryRunner(dry_run=True)
+        dry_run()
+
+        replayed = self._replay(replay.OptimalReplayLotteryRunner)
+        self.assertEqual(
+            self._placements(replayed.report()), self._placements(dry_run.report())
+        )
+
+    def test_other_versions_rejected(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "week.json.gz")
+            with gzip.open(path, "wt") as f:
+                json.dump({"version": replay.VERSION + 1}, f)
+            with self.assertRaises(ValueError):
+                replay.read_snapshot(path)
+            with self.assertRaises(CommandError):
+                call_command("replay_ws_lottery", path)
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "week.json.gz")
+            call_command("export_ws_lottery", path, stdout=StringIO())
+            stdout = StringIO()
+            call_command("replay_ws_lottery", path, stdout=stdout)
+
+        report = json.loads(stdout.getvalue())
+        self.assertTrue(report["placed"])
+        self.assertFalse(
+            models.SignUp.objects.filter(on_trip=True)
+            .exclude(trip__trip_date=date(2020, 1, 11))
+            .exists()
+        )
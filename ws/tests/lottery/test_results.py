@@ -0,0 +1,133 @@
+import json
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from freezegun import freeze_time
+
+from ws import enums, settings
+from ws.lottery import run
+from ws.lottery.results import ResultLog, read_records
+from ws.tests import factories
+
+
+class ResultLogTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = Path(tmpdir, "results.jsonl")
+
+    def _read(self, **filters):
+        with self.path.open(encoding="utf-8") as lines:
+            return list(read_records(lines, **filters))
+
+    def test_nothing_written(self):
+        """The log file is only created once there's a record to write."""
+        ResultLog(self.path)
+        self.assertFalse(self.path.exists())
+
+    def test_written_incrementally(self):
+        log = ResultLog(self.path)
+        log.write("run", lottery_key="ws-2020-01-15")
+        self.assertEqual(
+            self.path.read_text(encoding="utf-8"),
+            '{"type":"run","lottery_key":"ws-2020-01-15"}\n',
+        )
+        log.write("decision", participant_pk=1, trip_pk=3)
+        self.assertEqual(len(self._read()), 2)
+
+    def test_filters(self):
+        log = ResultLog(self.path)
+        log.write("run", lottery_key="ws-2020-01-15")
+        log.write(
+            "decision",
+            participant_pk=1,
+            paired_with_pk=2,
+            ranked_trips=[3, 4],
+            trip_pk=4,
+        )
+        log.write("decision", participant_pk=5, ranked_trips=[3], trip_pk=None)
+        log.write("bump", participant_pk=6, trip_pk=4, placed_trip_pk=7)
+        log.write("summary", placed=2)
+
+        def participants(**filters):
+            return [record.get("participant_pk") for record in self._read(**filters)]
+
+        self.assertEqual(participants(participant_pk=2), [1])
+        self.assertEqual(participants(trip_pk=3), [1, 5])
+        self.assertEqual(participants(trip_pk=7), [6])
+        self.assertEqual(participants(trip_pk=4, types=["bump"]), [6])
+        self.assertEqual(participants(participant_pk=1, types=["run"]), [])
+        self.assertEqual(
+            [record["type"] for record in self._read(types=["run", "summary"])],
+            ["run", "summary"],
+        )
+
+
+@freeze_time("2020-01-15 09:00:00 EST")
+class LotteryResultsTests(TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.log_dir = Path(tmpdir)
+        self.enterContext(patch.object(settings, "WS_LOTTERY_LOG_DIR", tmpdir))
+
+    def test_winter_school_results(self):
+        trip = factories.TripFactory.create(
+            algorithm="lottery",
+            program=enums.Program.WINTER_SCHOOL.value,
+            maximum_participants=1,
+            trip_date=date(2020, 1, 18),
+        )
+        signups = [factories.SignUpFactory.create(trip=trip) for _ in range(3)]
+
+        run.WinterSchoolLotteryRunner()()
+
+        stdout = StringIO()
+        call_command("lottery_results", stdout=stdout)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(records[0]["type"], "run")
+        self.assertEqual(records[0]["lottery_key"], "ws-2020-01-15")
+        self.assertEqual(records[-1]["type"], "summary")
+        self.assertEqual(records[-1]["placed"], 1)
+        self.assertEqual(records[-1]["waitlisted"], 2)
+        self.assertEqual(
+            [record["phase"] for record in records if record["type"] == "phase"],
+            ["rank", "place", "free_for_all"],
+        )
+
+        decisions = [record for record in records if record["type"] == "decision"]
+        self.assertEqual([d["global_rank"] for d in decisions], [1, 2, 3])
+        self.assertEqual({d["trip_pk"] for d in decisions}, {trip.pk})
+
+        stdout = StringIO()
+        par = signups[0].participant
+        call_command("lottery_results", participant=par.pk, stdout=stdout)
+        (decision,) = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(decision["participant_pk"], par.pk)
+
+    def test_single_trip_results(self):
+        trip = factories.TripFactory.create(
+            algorithm="lottery",
+            program=enums.Program.CLIMBING.value,
+            maximum_participants=1,
+        )
+        for _ in range(2):
+            factories.SignUpFactory.create(trip=trip)
+
+        run.SingleTripLotteryRunner(trip)()
+
+        (path,) = self.log_dir.glob(f"trip_{trip.pk}_*.jsonl")
+        with path.open(encoding="utf-8") as lines:
+            decisions = list(read_records(lines, trip_pk=trip.pk))
+        self.assertEqual([d["placed"] for d in decisions], [True, False])
+        self.assertEqual([d["waitlisted"] for d in decisions], [False, True])
+
+    def test_no_logs(self):
+        with self.assertRaises(CommandError):
+            call_command("lottery_results")
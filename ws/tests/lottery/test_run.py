@@ -1,15 +1,20 @@
+import logging
+import random
 from datetime import date, datetime
 from textwrap import dedent
 from unittest.mock import patch
 from zoneinfo import ZoneInfo
 
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.test import TestCase
 from freezegun import freeze_time
 from mitoc_const import affiliations
 
 import ws.utils.dates as date_utils
 from ws import enums, models, settings
-from ws.lottery import run
+from ws.lottery import rank, run
+from ws.lottery.memory import WinterSchoolWeek
 from ws.tests import factories
 
 
@@ -96,13 +101,13 @@ class SingleTripLotteryTests(TestCase):
             """\
             Randomly ordering (preference to MIT affiliates)...
             Participants will be handled in the following order:
-              1. Alice Aaronson       (MIT undergrad, 0.04993458051632388)
-              2. Charles Charleson    (Non-affiliate, 0.1895304657881689)
-              3. Bob Bobberson        (MIT affiliate (staff or faculty), 0.5391638258147878)
+              1. Charles Charleson    (Non-affiliate, 0.31327993330255044)
+              2. Bob Bobberson        (MIT affiliate (staff or faculty), 0.3618243103732387)
+              3. Alice Aaronson       (MIT undergrad, 0.4243873724207779)
             --------------------------------------------------
-            Single Trip Example has 2 slots, adding Alice Aaronson
-            Single Trip Example has 1 slot, adding Charles Charleson
-            Adding Bob Bobberson to the waitlist
+            Single Trip Example has 2 slots, adding Charles Charleson
+            Single Trip Example has 1 slot, adding Bob Bobberson
+            Adding Alice Aaronson to the waitlist
             """
         )
 
@@ -111,16 +116,82 @@ class SingleTripLotteryTests(TestCase):
         self.assertEqual(trip.algorithm, "fcfs")
         self.assertEqual(trip.lottery_log, expected)
 
-        # Alice & Charles were placed on the trip.
-        alice.refresh_from_db()
-        self.assertTrue(alice.on_trip)
+        # Charles & Bob were placed on the trip.
         charles.refresh_from_db()
         self.assertTrue(charles.on_trip)
-
-        # Bob was waitlisted.
         bob.refresh_from_db()
-        self.assertFalse(bob.on_trip)
-        self.assertTrue(bob.waitlistsignup)
+        self.assertTrue(bob.on_trip)
+
+        # Alice was waitlisted.
+        alice.refresh_from_db()
+        self.assertFalse(alice.on_trip)
+        self.assertTrue(alice.waitlistsignup)
+
+    def test_trip_partners_loaded_once(self):
+        """Pairing is only honored between partners who both signed up."""
+        trip = factories.TripFactory.create(
+            algorithm="lottery", program=enums.Program.CLIMBING.value
+        )
+        alice, bob, carol, dave, erin = (
+            factories.SignUpFactory.create(trip=trip).participant for _ in range(5)
+        )
+        absent = factories.ParticipantFactory.create()
+        for par, partner in [(alice, bob), (bob, alice), (carol, dave), (erin, absent)]:
+            factories.LotteryInfoFactory.create(participant=par, paired_with=partner)
+        factories.LotteryInfoFactory.create(participant=absent, paired_with=erin)
+
+        runner = run.SingleTripLotteryRunner(trip)
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertEqual(runner.trip_partner(alice), bob)
+                self.assertEqual(runner.trip_partner(bob), alice)
+                self.assertIsNone(runner.trip_partner(carol))  # Not reciprocal
+                self.assertIsNone(runner.trip_partner(dave))
+                self.assertIsNone(runner.trip_partner(erin))  # Partner absent
+                self.assertEqual(runner.paired_with(erin), absent)
+
+    def test_legacy_ranking_reproduces_old_run(self):
+        """The legacy random numbers explain lotteries run before keyed hashing."""
+        trip = factories.TripFactory.create(
+            pk=838249, algorithm="fcfs", program=enums.Program.CLIMBING.value
+        )
+        for pk, name, affiliation in [
+            (1021, "Alice Aaronson", affiliations.MIT_UNDERGRAD.CODE),
+            (1022, "Bob Bobberson", affiliations.MIT_AFFILIATE.CODE),
+            (1023, "Charles Charleson", affiliations.NON_AFFILIATE.CODE),
+        ]:
+            factories.SignUpFactory.create(
+                participant__pk=pk,
+                participant__name=name,
+                participant__affiliation=affiliation,
+                trip=trip,
+            )
+        # This exact log was written by the lottery before switching to keyed hashing.
+        old_log = dedent(
+            """\
+            Randomly ordering (preference to MIT affiliates)...
+            Participants will be handled in the following order:
+              1. Alice Aaronson       (MIT undergrad, 0.04993458051632388)
+              2. Charles Charleson    (Non-affiliate, 0.1895304657881689)
+              3. Bob Bobberson        (MIT affiliate (staff or faculty), 0.5391638258147878)
+            --------------------------------------------------
+            Single Trip Example has 2 slots, adding Alice Aaronson
+            Single Trip Example has 1 slot, adding Charles Charleson
+            Adding Bob Bobberson to the waitlist
+            """
+        )
+
+        comparison = rank.compare_with_legacy(rank.SingleTripParticipantRanker(trip))
+        self.assertTrue(comparison.reproduces(old_log))
+        self.assertEqual(
+            [par.name for par, _ in comparison.legacy],
+            ["Alice Aaronson", "Charles Charleson", "Bob Bobberson"],
+        )
+        self.assertEqual(
+            [par.name for par, _ in comparison.new],
+            ["Charles Charleson", "Bob Bobberson", "Alice Aaronson"],
+        )
+        self.assertEqual(comparison.displacement, {1021: 2, 1022: -1, 1023: -1})
 
 
 @freeze_time("2020-01-15 09:00:00 EST")
@@ -173,6 +244,12 @@ class WinterSchoolLotteryTests(TestCase):
             trip.refresh_from_db()
             self._assert_fcfs_at_noon(trip)
 
+    def test_free_for_all_queries(self):
+        """Each trip is saved without first being fetched again."""
+        runner = run.WinterSchoolLotteryRunner()
+        with self.assertNumQueries(3):  # One for the trips, one update per trip
+            runner.free_for_all()
+
     def test_non_ws_trips_ignored(self):
         """Participants with signups for non-WS trips are handled.
 
@@ -209,3 +286,286 @@ class WinterSchoolLotteryTests(TestCase):
         self.assertEqual(outside_iap_trip.algorithm, "lottery")
         office_day.refresh_from_db()
         self.assertEqual(office_day.signups_open_at, date_utils.local_now())
+
+
+# Ticking ensures that signups & waitlist entries are saved with distinct times.
+@freeze_time("2020-01-15 09:00:00 EST", tick=True)
+class InMemoryWinterSchoolLotteryTests(TestCase):
+    def setUp(self):
+        rand = random.Random("in-memory")
+        trips = [
+            factories.TripFactory.create(
+                algorithm="lottery",
+                program=enums.Program.WINTER_SCHOOL.value,
+                maximum_participants=size,
+                trip_date=date(2020, 1, 18),
+            )
+            for size in [1, 2, 3, 3, 4]
+        ]
+        leader = factories.ParticipantFactory.create()
+        factories.LotteryInfoFactory.create(participant=leader, car_status="own")
+        trips[3].leaders.add(leader)
+
+        car_statuses = ["none", "none", "none", "own", "rent", "self", None]
+        participants = []
+        for i in range(24):
+            par = factories.ParticipantFactory.create(
+                name=f"Participant {i}",
+                affiliation=rand.choice(["MU", "MG", "NA", "NU"]),
+            )
+            car_status = rand.choice(car_statuses)
+            if car_status is not None:
+                factories.LotteryInfoFactory.create(
+                    participant=par, car_status=car_status
+                )
+            for order, trip in enumerate(rand.sample(trips, rand.randint(1, 4))):
+                factories.SignUpFactory.create(participant=par, trip=trip, order=order)
+            participants.append(par)
+
+        # One reciprocal pair (who share some trips), one unrequited pairing.
+        for one, two in [(participants[0], participants[1])]:
+            for par, other in [(one, two), (two, one)]:
+                models.LotteryInfo.objects.update_or_create(
+                    participant=par, defaults={"paired_with": other}
+                )
+            for trip in trips[2:]:
+                for par in (one, two):
+                    models.SignUp.objects.get_or_create(participant=par, trip=trip)
+        models.LotteryInfo.objects.update_or_create(
+            participant=participants[2], defaults={"paired_with": participants[3]}
+        )
+
+    @staticmethod
+    def _placements():
+        return {
+            "signups": sorted(
+                models.SignUp.objects.values_list(
+                    "participant_id", "trip_id", "on_trip"
+                )
+            ),
+            "on_trip": {
+                trip.pk: [
+                    s.participant_id for s in trip.signup_set.filter(on_trip=True)
+                ]
+                for trip in models.Trip.objects.all()
+            },
+            "waitlists": {
+                trip.pk: [
+                    (s.participant_id, s.waitlistsignup.manual_order)
+                    for s in trip.waitlist.signups
+                ]
+                for trip in models.Trip.objects.all()
+            },
+        }
+
+    def test_same_outcome_as_database_runner(self):
+        with transaction.atomic():
+            runner = run.WinterSchoolLotteryRunner()
+            runner.assign_trips()
+            # Slots & drivers tracked throughout the run match the database.
+            with self.assertNoLogs(runner.logger, level="ERROR"):
+                runner.check_ledger()
+            expected = self._placements()
+            transaction.set_rollback(True)
+
+        # Sanity check that the lottery was non-trivial.
+        self.assertTrue(any(wl for wl in expected["waitlists"].values()))
+        self.assertTrue(any(on_trip for _, _, on_trip in expected["signups"]))
+        self.assertNotEqual(self._placements(), expected)
+
+        in_memory = run.InMemoryWinterSchoolLotteryRunner()
+        with patch.object(models.SignUp, "save") as save_signup:
+            in_memory.assign_trips()
+        save_signup.assert_not_called()
+        self.assertEqual(self._placements(), expected)
+        with self.assertNoLogs(in_memory.logger, level="ERROR"):
+            in_memory.check_ledger()
+
+    def test_dry_run(self):
+        """A dry run reports what would happen, without writing anything."""
+        # Whatever the random ranking, a driver bumps this (boosted) non-driver.
+        smallest_trip = models.Trip.objects.get(maximum_participants=1)
+        non_driver, driver = factories.ParticipantFactory.create_batch(2)
+        factories.LotteryAdjustmentFactory.create(participant=non_driver, adjustment=-1)
+        factories.LotteryInfoFactory.create(participant=driver, car_status="own")
+        for par in (non_driver, driver):
+            factories.SignUpFactory.create(participant=par, trip=smallest_trip)
+
+        with transaction.atomic():
+            run.WinterSchoolLotteryRunner().assign_trips()
+            expected = self._placements()
+            transaction.set_rollback(True)
+        before = self._placements()
+
+        def read_only(execute, sql, params, many, context):
+            self.assertTrue(sql.lstrip().upper().startswith("SELECT"), sql)
+            return execute(sql, params, many, context)
+
+        runner = run.InMemoryWinterSchoolLotteryRunner(dry_run=True)
+        with connection.execute_wrapper(read_only):
+            runner()
+        self.assertEqual(self._placements(), before)
+
+        report = runner.report()
+        self.assertEqual(
+            {(p["participant_pk"], p["trip_pk"]) for p in report["placed"]},
+            {
+                (par_pk, trip_pk)
+                for par_pk, trip_pk, on_trip in expected["signups"]
+                if on_trip
+            },
+        )
+        self.assertCountEqual(
+            [(w["participant_pk"], w["trip_pk"]) for w in report["waitlisted"]],
+            [
+                (par_pk, trip_pk)
+                for trip_pk, waitlisted in expected["waitlists"].items()
+                for par_pk, _manual_order in waitlisted
+            ],
+        )
+        # Anybody bumped off a trip did not stay on that trip.
+        self.assertTrue(report["bumped"])
+        for bumped in report["bumped"]:
+            self.assertNotIn(bumped, report["placed"])
+        self.assertEqual(
+            list(report["timings"]), ["load", "rank", "place", "free_for_all"]
+        )
+
+        # Trips are still open for the real lottery run.
+        self.assertFalse(models.Trip.objects.exclude(algorithm="lottery").exists())
+
+    def test_quiet_dry_run_skips_diff(self):
+        """Changes are only described for logging if they'd be logged."""
+        runner = run.InMemoryWinterSchoolLotteryRunner(dry_run=True)
+        runner.logger.setLevel(logging.WARNING)
+        with patch.object(WinterSchoolWeek, "diff") as diff:
+            runner.assign_trips()
+        diff.assert_not_called()
+
+    def test_optimal_placement(self):
+        on_trip = models.SignUp.objects.filter(on_trip=True)
+        with transaction.atomic():
+            run.InMemoryWinterSchoolLotteryRunner().assign_trips()
+            placed_greedily = on_trip.count()
+            transaction.set_rollback(True)
+
+        runner = run.OptimalWinterSchoolLotteryRunner()
+        runner.assign_trips()
+        with self.assertNoLogs(runner.logger, level="ERROR"):
+            runner.check_ledger()
+        self.assertGreaterEqual(on_trip.count(), placed_greedily)
+
+        for trip in models.Trip.objects.all():
+            on_trip = trip.signup_set.filter(on_trip=True).count()
+            self.assertLessEqual(on_trip, trip.maximum_participants)
+
+        # The reciprocal pair is either placed together, or not at all.
+        one, two = models.Participant.objects.filter(
+            name__in=["Participant 0", "Participant 1"]
+        )
+        self.assertEqual(
+            set(one.signup_set.filter(on_trip=True).values_list("trip_id")),
+            set(two.signup_set.filter(on_trip=True).values_list("trip_id")),
+        )
+
+    def test_optimal_placement_honors_separations(self):
+        one, two = models.Participant.objects.filter(
+            name__in=["Participant 4", "Participant 5"]
+        )
+        trip = factories.TripFactory.create(
+            algorithm="lottery",
+            program=enums.Program.WINTER_SCHOOL.value,
+            maximum_participants=4,
+            trip_date=date(2020, 1, 18),
+        )
+        for par in (one, two):
+            models.SignUp.objects.filter(participant=par).delete()
+            factories.SignUpFactory.create(participant=par, trip=trip)
+        factories.LotterySeparationFactory.create(initiator=one, recipient=two)
+
+        run.OptimalWinterSchoolLotteryRunner().assign_trips()
+        self.assertEqual(
+            trip.signup_set.filter(participant__in=[one, two], on_trip=True).count(),
+            1,
+        )
+
+    def test_ledger_mismatch_logged(self):
+        """If signups change outside of the lottery, the ledger reports it."""
+        runner = run.WinterSchoolLotteryRunner()
+        runner.assign_trips()
+        models.SignUp.objects.filter(on_trip=True).update(on_trip=False)
+        with self.assertLogs(runner.logger, level="ERROR") as logs:
+            runner.check_ledger()
+        self.assertIn("expected to have", logs.output[0])
+
+    def test_resume_after_failure(self):
+        """A run which dies partway can be resumed, without placing anybody twice."""
+        with transaction.atomic():
+            uninterrupted = run.WinterSchoolLotteryRunner()
+            uninterrupted.assign_trips()
+            expected = self._placements()
+            transaction.set_rollback(True)
+
+        runner = run.WinterSchoolLotteryRunner()
+        runner.checkpoint_interval = 5
+        handle_participant = runner.handle_participant
+
+        def die_at_rank_13(global_rank, *args):
+            if global_rank == 13:
+                raise RuntimeError("Worker was killed")
+            handle_participant(global_rank, *args)
+
+        with (
+            patch.object(runner, "handle_participant", side_effect=die_at_rank_13),
+            self.assertRaises(RuntimeError),
+        ):
+            runner.assign_trips()
+
+        # The batch in progress was never committed, nor was its checkpoint.
+        checkpoint = models.LotteryCheckpoint.objects.get()
+        self.assertEqual(checkpoint.global_rank, 10)
+        self.assertFalse(checkpoint.completed)
+
+        resumed = run.WinterSchoolLotteryRunner.resume()
+        with patch.object(
+            resumed, "handle_participant", wraps=resumed.handle_participant
+        ) as handle:
+            resumed()
+        self.assertEqual(handle.call_args_list[0].args[0], 11)
+        checkpoint.refresh_from_db()
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual(checkpoint.decision_counts, uninterrupted.decision_counts)
+
+        placements = self._placements()
+        self.assertEqual(placements["signups"], expected["signups"])
+        self.assertEqual(placements["on_trip"], expected["on_trip"])
+
+        # Nothing is left to resume.
+        with self.assertRaises(models.LotteryCheckpoint.DoesNotExist):
+            run.WinterSchoolLotteryRunner.resume()
+
+    def test_resume_requires_same_ranking(self):
+        runner = run.WinterSchoolLotteryRunner()
+        runner.checkpoint_interval = 5
+        with patch.object(runner, "handle_participant", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                runner.assign_trips()
+
+        # Somebody new signs up before the run is resumed.
+        factories.SignUpFactory.create(trip=models.Trip.objects.first())
+        with self.assertRaises(ValueError):
+            run.WinterSchoolLotteryRunner.resume().assign_trips()
+
+
+class RunWinterSchoolLotteryCommandTests(TestCase):
+    def test_nothing_to_resume(self):
+        with self.assertRaises(CommandError):
+            call_command("run_ws_lottery", resume=True)
+
+    def test_cannot_resume_in_memory(self):
+        with self.assertRaises(CommandError):
+            call_command("run_ws_lottery", resume=True, in_memory=True)
+
+    def test_cannot_resume_optimal(self):
+        with self.assertRaises(CommandError):
+            call_command("run_ws_lottery", resume=True, optimal=True)
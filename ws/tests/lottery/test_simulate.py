@@ -0,0 +1,100 @@
+import json
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from freezegun import freeze_time
+
+from ws import enums, models, settings
+from ws.lottery import run, simulate
+from ws.tests import factories
+from ws.utils.dates import local_now
+
+
+@freeze_time("2020-01-15 09:00:00 EST")
+class SimulateTests(TestCase):
+    def setUp(self):
+        trips = [
+            factories.TripFactory.create(
+                algorithm="lottery",
+                program=enums.Program.WINTER_SCHOOL.value,
+                maximum_participants=2,
+                trip_date=date(2020, 1, 18),
+            )
+            for _ in range(2)
+        ]
+        for i, affiliation in enumerate(["MU", "MG", "NA", "NA", "NU", "MU"]):
+            par = factories.ParticipantFactory.create(affiliation=affiliation)
+            if i % 2:
+                factories.LotteryInfoFactory.create(participant=par, car_status="own")
+            for order, trip in enumerate(trips if i % 3 else reversed(trips)):
+                factories.SignUpFactory.create(participant=par, trip=trip, order=order)
+
+    def test_real_secret_gives_real_outcome(self):
+        """Simulating with the configured secret gives the actual lottery outcome."""
+        snapshot = simulate.WeekSnapshot.load(local_now())
+        with self.assertNumQueries(0):
+            tally = simulate.simulate(snapshot, [settings.PRNG_SEED_SECRET])
+
+        runner = run.InMemoryWinterSchoolLotteryRunner(dry_run=True)
+        runner()
+        placed = {placed["participant_pk"] for placed in runner.report()["placed"]}
+        self.assertEqual(tally.runs, 1)
+        self.assertEqual(set(tally.placed), placed)
+        self.assertEqual(len(placed), 4)
+
+        # The snapshot itself was left untouched.
+        self.assertFalse(
+            any(
+                s.on_trip
+                for signups in snapshot.week.signups_by_trip.values()
+                for s in signups
+            )
+        )
+
+    def test_already_on_trip(self):
+        """Only placements made by the lottery itself are counted."""
+        signup = factories.SignUpFactory.create(
+            trip=models.Trip.objects.first(), on_trip=True
+        )
+
+        snapshot = simulate.WeekSnapshot.load(local_now())
+        tally = simulate.simulate(snapshot, [f"secret-{i}" for i in range(5)])
+        self.assertNotIn(signup.participant_id, tally.placed)
+        self.assertNotIn(signup.participant_id, tally.first_choice)
+
+    def test_report(self):
+        snapshot = simulate.WeekSnapshot.load(local_now())
+        tally = simulate.simulate(snapshot, [f"secret-{i}" for i in range(20)])
+        self.assertEqual(tally.runs, 20)
+        # Exactly 4 of 6 participants are placed every single run.
+        self.assertEqual(sum(tally.placed.values()), 80)
+
+        report = simulate.fairness_report(snapshot, tally)
+        self.assertEqual(list(report), ["affiliation", "flake_factor", "driver"])
+        self.assertEqual(
+            report["affiliation"].keys(),
+            {"MIT undergrad", "MIT grad student", "Non-affiliate", "Non-MIT undergrad"},
+        )
+        self.assertEqual(list(report["flake_factor"]), ["0"])
+        drivers = report["driver"]["driver"]["placed"]
+        non_drivers = report["driver"]["non-driver"]["placed"]
+        self.assertEqual(drivers.participants, 3)
+        self.assertEqual(non_drivers.participants, 3)
+        self.assertAlmostEqual((drivers.mean * 3 + non_drivers.mean * 3) / 6, 4 / 6)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            "simulate_ws_lottery", runs=10, workers=1, json=True, stdout=stdout
+        )
+        output = json.loads(stdout.getvalue())
+        self.assertEqual(output["runs"], 10)
+        placed = output["report"]["flake_factor"]["0"]["placed"]
+        self.assertEqual(placed["participants"], 6)
+        self.assertAlmostEqual(placed["mean"], 4 / 6)
+
+        # Nothing was actually changed.
+        self.assertFalse(models.SignUp.objects.filter(on_trip=True).exists())
+        self.assertFalse(models.Trip.objects.exclude(algorithm="lottery").exists())
@@ -1,11 +1,13 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
 from zoneinfo import ZoneInfo
 
 from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase, TestCase
 from freezegun import freeze_time
 
-from ws import enums
+from ws import enums, models
+from ws.celery_config import app
 from ws.tests import factories
 
 
@@ -229,3 +231,150 @@ class TripDatesTest(SimpleTestCase):
 
         next_month_trip = factories.TripFactory.build(trip_date=date(2020, 2, 16))
         self.assertFalse(next_month_trip.less_than_a_week_away)
+
+
+class SignupCountsTest(TestCase):
+    def test_saving_stale_trip_keeps_counts(self):
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=2)
+        factories.SignUpFactory.create(trip=trip, on_trip=True)
+        self.assertEqual(trip.on_trip_count, 0)  # Stale!
+
+        trip.name = "Renamed trip"
+        trip.save()
+
+        trip.refresh_from_db()
+        self.assertEqual(trip.name, "Renamed trip")
+        self.assertEqual(trip.on_trip_count, 1)
+        self.assertEqual(trip.open_slots, 1)
+
+
+class ListVersionTest(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create()
+
+    def _version(self) -> int:
+        return models.Trip.objects.values_list("list_version", flat=True).get(
+            pk=self.trip.pk
+        )
+
+    def test_saving(self):
+        version = self._version()
+        self.trip.name = "Renamed trip"
+        with self.assertNumQueries(1):
+            self.trip.save()
+        self.assertEqual(self._version(), version + 1)
+
+        # The new version is loaded only if needed
+        self.assertEqual(self.trip.changed_fields(), set())
+        self.assertEqual(self.trip.list_version, version + 1)
+
+    def test_saving_some_fields(self):
+        version = self._version()
+        self.trip.save(update_fields=["name"])
+        self.assertEqual(self._version(), version + 1)
+
+    def test_signups(self):
+        version = self._version()
+        factories.SignUpFactory.create(trip=self.trip, on_trip=True)
+        self.assertGreater(self._version(), version)
+
+    def test_leaders(self):
+        leader = factories.ParticipantFactory.create()
+
+        version = self._version()
+        self.trip.leaders.add(leader)
+        self.assertGreater(self._version(), version)
+
+        version = self._version()
+        leader.trips_led.clear()
+        self.assertGreater(self._version(), version)
+
+    def test_leader_rating(self):
+        leader = factories.ParticipantFactory.create()
+        self.trip.leaders.add(leader)
+
+        version = self._version()
+        factories.LeaderRatingFactory.create(participant=leader)
+        self.assertEqual(self._version(), version + 1)
+
+
+class LastOfPriorityTest(TestCase):
+    def test_no_ordered_signups(self):
+        trip = factories.TripFactory.create()
+        factories.SignUpFactory.create(trip=trip, on_trip=True)
+        trip.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(trip.last_of_priority, 1)
+
+    def test_below_ordered_signups(self):
+        trip = factories.TripFactory.create()
+        factories.SignUpFactory.create(trip=trip, on_trip=True, manual_order=4)
+        factories.SignUpFactory.create(trip=trip, on_trip=True, manual_order=2)
+        trip.refresh_from_db()
+        self.assertEqual(trip.last_of_priority, 5)
+
+
+class ChangedFieldsTest(TestCase):
+    def test_new_trip(self):
+        trip = factories.TripFactory.build()
+        self.assertEqual(trip.changed_fields(), set())
+        with self.assertRaises(KeyError):
+            trip.loaded_value("algorithm")
+
+    def test_loaded_trip(self):
+        trip = models.Trip.objects.get(pk=factories.TripFactory.create().pk)
+        self.assertEqual(trip.changed_fields(), set())
+
+        trip.algorithm = "fcfs"
+        trip.maximum_participants = 12
+        self.assertEqual(trip.changed_fields(), {"algorithm", "maximum_participants"})
+        self.assertEqual(trip.loaded_value("algorithm"), "lottery")
+
+        trip.save()
+        self.assertEqual(trip.changed_fields(), set())
+        self.assertEqual(trip.loaded_value("algorithm"), "fcfs")
+
+    def test_refreshed(self):
+        trip = factories.TripFactory.create()
+        models.Trip.objects.filter(pk=trip.pk).update(name="New name")
+        trip.name = "Local name"
+        trip.refresh_from_db(fields=["name"])
+        self.assertEqual(trip.loaded_value("name"), "New name")
+        self.assertEqual(trip.changed_fields(), set())
+
+    def test_deferred_fields(self):
+        pk = factories.TripFactory.create().pk
+        trip = models.Trip.objects.only("name").get(pk=pk)
+        with self.assertRaises(KeyError):
+            trip.loaded_value("algorithm")
+
+
+class RevokeLotteryTaskTest(TestCase):
+    def setUp(self):
+        trip = factories.TripFactory.create()
+        models.Trip.objects.filter(pk=trip.pk).update(lottery_task_id="some-task")
+        self.trip = models.Trip.objects.get(pk=trip.pk)
+
+    def test_unchanged_lottery_trip(self):
+        with patch.object(app.control, "revoke") as revoke:
+            with self.assertNumQueries(1):  # Just the update itself
+                self.trip.save()
+        revoke.assert_not_called()
+        self.assertEqual(self.trip.lottery_task_id, "some-task")
+
+    def test_close_time_changed(self):
+        self.trip.signups_close_at += timedelta(hours=1)
+        with patch.object(app.control, "revoke") as revoke:
+            with self.assertNumQueries(1):
+                self.trip.save()
+        revoke.assert_called_once_with("some-task")
+        self.assertIsNone(models.Trip.objects.get(pk=self.trip.pk).lottery_task_id)
+
+    def test_trip_not_loaded_from_database(self):
+        """Trips built by hand are compared against the database."""
+        trip = models.Trip.objects.filter(pk=self.trip.pk).values()[0]
+        trip = models.Trip(**{**trip, "algorithm": "fcfs"})
+        with patch.object(app.control, "revoke") as revoke:
+            with self.assertNumQueries(2):
+                trip.save()
+        revoke.assert_not_called()
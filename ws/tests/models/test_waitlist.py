@@ -53,3 +53,33 @@ class OrderingTests(TestCase):
         factories.WaitListSignupFactory.create(signup=spot_4, manual_order=None)
 
         self.assertEqual(list(trip.waitlist.signups), [spot_1, spot_2, spot_3, spot_4])
+
+
+class PriorityTests(TestCase):
+    def test_empty_waitlist(self) -> None:
+        waitlist = factories.TripFactory.create().waitlist
+        with self.assertNumQueries(0):
+            self.assertEqual(waitlist.first_of_priority, 10)
+            self.assertEqual(waitlist.last_of_priority, 10)
+
+    def test_bounds_widen_as_signups_are_ordered(self) -> None:
+        trip = factories.TripFactory.create()
+        factories.WaitListSignupFactory.create(signup__trip=trip, manual_order=None)
+        factories.WaitListSignupFactory.create(signup__trip=trip, manual_order=3)
+        factories.WaitListSignupFactory.create(signup__trip=trip, manual_order=-2)
+
+        waitlist = models.WaitList.objects.get(trip=trip)
+        with self.assertNumQueries(0):
+            self.assertEqual(waitlist.first_of_priority, 4)
+            self.assertEqual(waitlist.last_of_priority, -3)
+
+    def test_removal_leaves_gaps(self) -> None:
+        """Bounds never narrow, but that doesn't affect ordering."""
+        trip = factories.TripFactory.create()
+        top = factories.WaitListSignupFactory.create(signup__trip=trip, manual_order=5)
+        factories.WaitListSignupFactory.create(signup__trip=trip, manual_order=1)
+        top.delete()
+
+        waitlist = models.WaitList.objects.get(trip=trip)
+        self.assertEqual(waitlist.first_of_priority, 6)
+        self.assertEqual(waitlist.last_of_priority, 0)
@@ -2,11 +2,13 @@ from datetime import date, datetime
 from zoneinfo import ZoneInfo
 
 from bs4 import BeautifulSoup
+from django.core.cache import cache
 from django.template import Context, Template
 from django.test import TestCase
 from freezegun import freeze_time
 
 from ws import enums, models
+from ws.templatetags.trip_tags import ROW_KEY_FIELDS
 from ws.tests import factories
 
 
@@ -128,6 +130,48 @@ class TripTagsTest(TestCase):
         self.assertEqual(template.render(context), "Janet Yellin (Leader)")
 
 
+class CachedTripListTableTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.trips = [
+            factories.TripFactory.create(algorithm="fcfs", maximum_participants=4)
+            for _ in range(3)
+        ]
+        for trip in self.trips:
+            trip.leaders.add(factories.ParticipantFactory.create())
+
+    @staticmethod
+    def _render(tag: str = "cached_trip_list_table trips True") -> str:
+        template = Template(f"{{% load trip_tags %}}{{% {tag} %}}")
+        trips = models.Trip.objects.order_by("pk").only(*ROW_KEY_FIELDS)
+        return template.render(Context({"trips": trips}))
+
+    def test_same_as_uncached(self):
+        uncached = self._render("trip_list_table trips False True")
+        self.assertEqual(
+            BeautifulSoup(self._render(), "html.parser").prettify(),
+            BeautifulSoup(uncached, "html.parser").prettify(),
+        )
+
+    def test_repeat_render_from_cache(self):
+        self._render()
+        with self.assertNumQueries(1):  # Just the trips themselves
+            self._render()
+
+    def test_changed_trips_rendered_again(self):
+        self._render()
+        factories.SignUpFactory.create(trip=self.trips[1], on_trip=True)
+
+        # Trips, then the changed trip (with leaders & their ratings)
+        with self.assertNumQueries(4):
+            html = self._render()
+        spaces = [
+            row.find_all("td")[4].text.strip()
+            for row in BeautifulSoup(html, "html.parser").find("tbody").find_all("tr")
+        ]
+        self.assertEqual(spaces, ["4 / 4", "3 / 4", "4 / 4"])
+
+
 class TripStageTest(TestCase):
     @staticmethod
     def _render(trip: models.Trip, *, signups_on_trip: int) -> str:
@@ -0,0 +1,75 @@
+from django.test import TestCase, TransactionTestCase
+
+import ws.signups as signup_service
+from ws import loadtest, models
+from ws.tests import factories
+from ws.utils import signups as signup_utils
+
+
+class PercentilesTests(TestCase):
+    def test_no_durations(self):
+        self.assertEqual(
+            loadtest.percentiles([]),
+            {"count": 0, "p50": None, "p95": None, "p99": None},
+        )
+
+    def test_one_duration(self):
+        self.assertEqual(
+            loadtest.percentiles([0.5]),
+            {"count": 1, "p50": 500, "p95": 500, "p99": 500},
+        )
+
+    def test_percentiles(self):
+        stats = loadtest.percentiles([i / 1000 for i in range(1, 101)])
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50"], 50.5)
+        self.assertAlmostEqual(stats["p99"], 99.01)
+
+
+class ProblemsWithTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(
+            algorithm="fcfs", maximum_participants=2
+        )
+        self.signups = [
+            signup_service.sign_up(factories.SignUpFactory.create(trip=self.trip))
+            for _ in "abc"
+        ]
+
+    def test_first_come_first_serve(self):
+        self.assertEqual(loadtest.problems_with(self.trip, peak_on_trip=2), [])
+
+    def test_overfilled(self):
+        self.assertEqual(
+            loadtest.problems_with(self.trip, peak_on_trip=3),
+            ["3 participants were on a trip for 2"],
+        )
+
+    def test_placed_out_of_order(self):
+        first, _second, third = self.signups
+        signup_utils.add_to_waitlist(first)
+        signup_utils.trip_or_wait(third)
+
+        self.assertEqual(
+            loadtest.problems_with(self.trip, peak_on_trip=2),
+            [
+                "Later signups were placed before earlier signups",
+                "The waitlist is not in the order of signup",
+            ],
+        )
+
+
+class RushTripTests(TransactionTestCase):
+    def test_rush(self):
+        rush = loadtest.Rush(signups=16, drops=4, workers=4, trip_size=6)
+        result = loadtest.rush_trip(rush)
+
+        self.assertEqual(result["problems"], [])
+        self.assertLessEqual(result["peak_on_trip"], 6)
+        self.assertEqual(result["requests"]["signup"]["count"], 16)
+        self.assertEqual(result["requests"]["drop"]["count"], 4)
+        self.assertGreaterEqual(result["lock_waits"]["count"], 16)
+
+        trip = models.Trip.objects.get()
+        self.assertEqual(trip.signup_set.filter(on_trip=True).count(), 6)
+        self.assertEqual(trip.waitlist.signups.count(), 6)
@@ -0,0 +1,173 @@
+import contextlib
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.test import TestCase
+
+import ws.signups as signup_service
+from ws import models
+from ws.tests import factories
+from ws.utils import signups as signup_utils
+
+
+class SignUpTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(
+            algorithm="fcfs", maximum_participants=1
+        )
+
+    def test_placed_immediately(self):
+        one = signup_service.sign_up(
+            factories.SignUpFactory.build(
+                trip=self.trip, participant=factories.ParticipantFactory.create()
+            )
+        )
+        two = signup_service.sign_up(
+            factories.SignUpFactory.build(
+                trip=self.trip, participant=factories.ParticipantFactory.create()
+            )
+        )
+
+        self.assertIsNotNone(one.pk)
+        self.assertTrue(one.on_trip)
+        self.assertEqual(list(self.trip.waitlist.signups), [two])
+
+    def test_lottery_trip(self):
+        trip = factories.TripFactory.create(algorithm="lottery")
+        signup = signup_service.sign_up(
+            factories.SignUpFactory.build(
+                trip=trip, participant=factories.ParticipantFactory.create()
+            )
+        )
+        self.assertIsNotNone(signup.pk)
+        self.assertFalse(signup.on_trip)
+        self.assertFalse(models.WaitListSignup.objects.exists())
+
+    def test_waitlist_comes_first(self):
+        """A spot freed (but not yet rebalanced) goes to those already waiting."""
+        one, two = (
+            signup_service.sign_up(factories.SignUpFactory.create(trip=self.trip))
+            for _ in "ab"
+        )
+        signup_service.drop(one)  # (Not rebalanced until the test commits)
+
+        three = signup_service.sign_up(
+            factories.SignUpFactory.build(
+                trip=self.trip, participant=factories.ParticipantFactory.create()
+            )
+        )
+
+        two.refresh_from_db()
+        self.assertTrue(two.on_trip)
+        self.assertEqual(list(self.trip.waitlist.signups), [three])
+
+
+class DropTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(
+            algorithm="fcfs", maximum_participants=2
+        )
+        self.one, self.two, self.three, self.four = (
+            signup_service.sign_up(factories.SignUpFactory.create(trip=self.trip))
+            for _ in "abcd"
+        )
+
+    def test_rebalanced_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            signup_service.drop(self.one)
+            self.three.refresh_from_db()
+            self.assertFalse(self.three.on_trip)
+
+        for callback in callbacks:
+            callback()
+        self.three.refresh_from_db()
+        self.assertTrue(self.three.on_trip)
+
+    def test_rebalanced_once_per_trip(self):
+        other_trip = factories.TripFactory.create(
+            algorithm="fcfs", maximum_participants=1
+        )
+        elsewhere = signup_service.sign_up(
+            factories.SignUpFactory.create(trip=other_trip)
+        )
+
+        with (
+            mock.patch.object(
+                signup_utils,
+                "update_queues_if_trip_open",
+                wraps=signup_utils.update_queues_if_trip_open,
+            ) as update_queues,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            signup_service.drop_all([self.one, self.two, elsewhere])
+
+        self.assertCountEqual(
+            [call.args[0] for call in update_queues.call_args_list],
+            [self.trip, other_trip],
+        )
+        self.assertEqual(
+            list(self.trip.signup_set.filter(on_trip=True)), [self.three, self.four]
+        )
+
+    def test_rolled_back(self):
+        """Trips from rolled-back changes are not rebalanced by a later commit."""
+        other_trip = factories.TripFactory.create(algorithm="fcfs")
+        elsewhere = signup_service.sign_up(
+            factories.SignUpFactory.create(trip=other_trip)
+        )
+
+        dropped_pk = self.one.pk
+
+        with (
+            mock.patch.object(signup_utils, "update_queues_if_trip_open") as update,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            with contextlib.suppress(RuntimeError), transaction.atomic():
+                signup_service.drop(self.one)
+                raise RuntimeError
+            signup_service.drop(elsewhere)
+
+        update.assert_called_once_with(other_trip)
+        self.assertTrue(models.SignUp.objects.filter(pk=dropped_pk).exists())
+
+
+class ReorderTests(TestCase):
+    def test_ordering_is_final(self):
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=2)
+        one, two, three = (
+            signup_service.sign_up(factories.SignUpFactory.create(trip=trip))
+            for _ in "abc"
+        )
+
+        with (
+            mock.patch.object(signup_utils, "update_queues_if_trip_open") as update,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            signup_service.reorder(trip, [three], removed=[one, two])
+
+        update.assert_not_called()
+        self.assertEqual(list(trip.signup_set.filter(on_trip=True)), [three])
+
+
+class ResizeTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(
+            algorithm="fcfs", summary="Popular trip", maximum_participants=1
+        )
+        self.one, self.two = (
+            signup_service.sign_up(factories.SignUpFactory.create(trip=self.trip))
+            for _ in "ab"
+        )
+
+    def test_growing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            signup_service.resize(self.trip, 2)
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.maximum_participants, 2)
+        self.assertEqual(self.trip.on_trip_count, 2)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValidationError):
+            signup_service.resize(self.trip, -1)
@@ -1,8 +1,13 @@
+from io import StringIO
 from unittest.mock import PropertyMock, patch
 
 from django.contrib import messages
+from django.core.management import call_command
+from django.db import connection
 from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 
+import ws.signups as signup_service
 from ws import models
 from ws.tests import factories
 from ws.utils import signups as signup_utils
@@ -184,6 +189,63 @@ class AddToWaitlistTests(TestCase):
             [signup, spot_1, spot_2, spot_3, spot_4, spot_5],
         )
 
+    def test_prioritize_with_stale_waitlist(self):
+        """Each prioritized signup is ordered against the latest waitlist."""
+        trip = factories.TripFactory.create()
+        one, two = (
+            factories.SignUpFactory.create(trip=trip, on_trip=False) for _ in "ab"
+        )
+        stale_trip = models.Trip.objects.select_related("waitlist").get(pk=trip.pk)
+        one.trip = two.trip = stale_trip
+
+        signup_utils.add_to_waitlist(one, prioritize=True, top_spot=True)
+        signup_utils.add_to_waitlist(two, prioritize=True, top_spot=True)
+
+        self.assertEqual(list(trip.waitlist.signups), [two, one])
+
+
+class TripOrWaitTests(TestCase):
+    def test_trip_is_locked(self):
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=1)
+
+        signup = factories.SignUpFactory.create(trip=trip)
+        with CaptureQueriesContext(connection) as context:
+            signup_utils.trip_or_wait(signup)
+        self.assertTrue(signup.on_trip)
+        self.assertTrue(
+            any(
+                query["sql"].startswith('SELECT "ws_trip"."id"')
+                and query["sql"].endswith("FOR UPDATE")
+                for query in context.captured_queries
+            )
+        )
+
+    def test_stale_trip_size_ignored(self):
+        """Trip size is read while holding the lock, not from the instance."""
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=2)
+        factories.SignUpFactory.create(trip=trip, on_trip=True)
+
+        models.Trip.objects.filter(pk=trip.pk).update(maximum_participants=1)
+        self.assertEqual(trip.maximum_participants, 2)
+        signup = signup_utils.trip_or_wait(factories.SignUpFactory.create(trip=trip))
+
+        self.assertFalse(signup.on_trip)
+        self.assertEqual(list(trip.waitlist.signups), [signup])
+
+
+class ApplyOrderingTests(TestCase):
+    def test_lottery_trip(self):
+        """Nobody is placed on a lottery trip, but the waitlist is reordered."""
+        trip = factories.TripFactory.create(algorithm="lottery")
+        one, two, three = (factories.SignUpFactory.create(trip=trip) for _ in "abc")
+        signup_utils.add_to_waitlist(one)
+        signup_utils.add_to_waitlist(two)
+
+        signup_utils.apply_ordering(trip, [three, two, one])
+
+        self.assertFalse(trip.signup_set.filter(on_trip=True).exists())
+        self.assertEqual(list(trip.waitlist.signups), [two, one])
+
 
 class UpdateQueuesTest(TestCase):
     def test_lottery_trips_ignored(self):
@@ -257,3 +319,113 @@ class UpdateQueuesTest(TestCase):
 
         wl_signup = models.WaitListSignup.objects.get(signup__trip=trip)
         self.assertEqual(wl_signup.signup, two)
+
+    def test_shrinking_by_several(self):
+        """Those bumped keep their relative order, above the existing waitlist."""
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=4)
+        signups = [factories.SignUpFactory.create(trip=trip) for _ in range(5)]
+        for signup in signups:
+            signup_utils.trip_or_wait(signup)
+        one, two, three, four, waitlisted = signups
+        self.assertFalse(waitlisted.on_trip)
+
+        models.Trip.objects.filter(pk=trip.pk).update(maximum_participants=1)
+        trip.refresh_from_db()
+        with self.assertNumQueries(8):
+            changes = signup_utils.update_queues_if_trip_open(trip)
+
+        self.assertEqual(changes.promoted, [])
+        self.assertEqual(changes.demoted, [two, three, four])
+        self.assertEqual(list(trip.signup_set.filter(on_trip=True)), [one])
+        self.assertEqual(list(trip.waitlist.signups), [two, three, four, waitlisted])
+        trip.refresh_from_db()
+        self.assertEqual((trip.on_trip_count, trip.waitlist_count), (1, 4))
+
+    def test_expanding_by_several(self):
+        """Participants are pulled from the waitlist in its order."""
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=1)
+        signups = [factories.SignUpFactory.create(trip=trip) for _ in range(5)]
+        for signup in signups:
+            signup_utils.trip_or_wait(signup)
+        one, two, three, four, five = signups
+        # A leader moved the last participant to the top of the waitlist.
+        signup_utils.add_to_waitlist(five, prioritize=True, top_spot=True)
+
+        models.Trip.objects.filter(pk=trip.pk).update(maximum_participants=4)
+        trip.refresh_from_db()
+        with self.assertNumQueries(9):
+            changes = signup_utils.update_queues_if_trip_open(trip)
+
+        self.assertEqual(changes.promoted, [five, two, three])
+        self.assertEqual(changes.demoted, [])
+        self.assertEqual(
+            list(trip.signup_set.filter(on_trip=True)), [one, five, two, three]
+        )
+        self.assertEqual(list(trip.waitlist.signups), [four])
+        trip.refresh_from_db()
+        self.assertEqual((trip.on_trip_count, trip.waitlist_count), (4, 1))
+
+    def test_no_changes(self):
+        trip = factories.TripFactory.create(algorithm="fcfs", maximum_participants=2)
+        signup_utils.trip_or_wait(factories.SignUpFactory.create(trip=trip))
+        signup_utils.trip_or_wait(factories.SignUpFactory.create(trip=trip))
+
+        self.assertFalse(signup_utils.update_queues_if_trip_open(trip))
+
+
+class SignupCountsTests(TestCase):
+    def setUp(self):
+        self.trip = factories.TripFactory.create(
+            algorithm="fcfs", maximum_participants=1
+        )
+
+    def _assert_counts(self, on_trip, waitlisted):
+        self.trip.refresh_from_db()
+        self.assertEqual(
+            (self.trip.on_trip_count, self.trip.waitlist_count), (on_trip, waitlisted)
+        )
+
+    def test_signing_up_and_dropping(self):
+        one, _two = (
+            signup_service.sign_up(factories.SignUpFactory.create(trip=self.trip))
+            for _ in "ab"
+        )
+        self._assert_counts(1, 1)
+
+        # The waitlisted participant takes the open spot.
+        with self.captureOnCommitCallbacks(execute=True):
+            signup_service.drop(one)
+        self._assert_counts(1, 0)
+
+    def test_waitlisting_participant_on_trip(self):
+        signup = factories.SignUpFactory.create(trip=self.trip, on_trip=True)
+        self._assert_counts(1, 0)
+
+        signup_utils.add_to_waitlist(signup)
+        self._assert_counts(0, 1)
+
+    def test_apply_ordering(self):
+        one, two = (factories.SignUpFactory.create(trip=self.trip) for _ in "ab")
+
+        signup_utils.apply_ordering(self.trip, [two, one])
+
+        self._assert_counts(1, 1)
+
+    def test_deferred(self):
+        signup = factories.SignUpFactory.create(trip=self.trip, on_trip=True)
+        with signup_utils.deferred_signup_counts():
+            signup_utils.add_to_waitlist(signup)
+            self._assert_counts(1, 0)
+        self._assert_counts(0, 1)
+
+    def test_repair_command(self):
+        factories.SignUpFactory.create(trip=self.trip, on_trip=True)
+        models.Trip.objects.update(on_trip_count=3, waitlist_count=2)
+
+        stdout = StringIO()
+        call_command("repair_signup_counts", "--dry-run", stdout=stdout)
+        self.assertIn("3 on trip (actually 1)", stdout.getvalue())
+        self._assert_counts(3, 2)
+
+        call_command("repair_signup_counts", stdout=StringIO())
+        self._assert_counts(1, 0)
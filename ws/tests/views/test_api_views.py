@@ -1,11 +1,16 @@
+import json
 import time
+from typing import Any
 from unittest import mock
 
 import jwt
 import responses
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from freezegun import freeze_time
 
+import ws.signups as signup_service
 from ws import enums, models, settings, tasks
 from ws.api_views import MemberInfo
 from ws.tests import factories
@@ -496,7 +501,7 @@ class JsonLeaderParticipantSignupTest(TestCase):
         self.trip.save()
 
         # Trip is full now
-        factories.SignUpFactory.create(trip=self.trip)
+        factories.SignUpFactory.create(trip=self.trip, on_trip=True)
 
         par = factories.ParticipantFactory.create()
 
@@ -536,7 +541,7 @@ class JsonLeaderParticipantSignupTest(TestCase):
         self.trip.save()
 
         # Trip is full now
-        factories.SignUpFactory.create(trip=self.trip)
+        factories.SignUpFactory.create(trip=self.trip, on_trip=True)
 
         signup = factories.SignUpFactory.create(
             trip=self.trip, participant__name="Jane McJaney"
@@ -568,8 +573,6 @@ class AdminTripSignupsViewTest(TestCase):
         resp = self.client.get(f"/trips/{trip.pk}/admin/signups/")
         self.assertEqual(resp.status_code, 403)
 
-    # Note to future me -- this test relies on signals creating waitlist signups
-    # Ideally, we can change to just invoking `trip_or_wait`
     @freeze_time("2024-12-01 12:45")
     def test_signup_ordering(self) -> None:
         par = factories.ParticipantFactory.create(name="Tim B", user=self.user)
@@ -577,21 +580,26 @@ class AdminTripSignupsViewTest(TestCase):
             algorithm="fcfs", creator=par, maximum_participants=2
         )
 
-        first_on_trip = factories.SignUpFactory.create(trip=trip, notes="Hi")
-        second_on_trip = factories.SignUpFactory.create(trip=trip)
+        def sign_up(**kwargs: Any) -> models.SignUp:
+            return signup_service.sign_up(
+                factories.SignUpFactory.create(trip=trip, **kwargs)
+            )
+
+        first_on_trip = sign_up(notes="Hi")
+        second_on_trip = sign_up()
 
         # Two signups come in, but the leader manually ordered them!
-        second_on_waitlist = factories.SignUpFactory.create(trip=trip, on_trip=False)
+        second_on_waitlist = sign_up()
         second_on_waitlist.waitlistsignup.manual_order = -3
         second_on_waitlist.waitlistsignup.save()
 
-        top_of_waitlist = factories.SignUpFactory.create(trip=trip, on_trip=False)
+        top_of_waitlist = sign_up()
         top_of_waitlist.waitlistsignup.manual_order = -2
         top_of_waitlist.waitlistsignup.save()
 
         # This represents somebody who added themselves to the waitlist
         # Previously, they would appear at the *top* of the list!
-        bottom_of_waitlist = factories.SignUpFactory.create(trip=trip)
+        bottom_of_waitlist = sign_up()
 
         self.assertEqual(
             list(trip.waitlist.signups),
@@ -722,6 +730,75 @@ class AdminTripSignupsViewTest(TestCase):
             },
         )
 
+    def _fcfs_trip(self, signups: int, maximum_participants: int) -> models.Trip:
+        par = factories.ParticipantFactory.create(user=self.user)
+        trip: models.Trip = factories.TripFactory.create(
+            algorithm="fcfs",
+            creator=par,
+            summary="Popular trip",
+            maximum_participants=maximum_participants,
+        )
+        for _ in range(signups):
+            signup_service.sign_up(factories.SignUpFactory.create(trip=trip))
+        return trip
+
+    def _post(self, trip: models.Trip, payload: dict[str, Any]) -> Any:
+        return self.client.post(
+            f"/trips/{trip.pk}/admin/signups/",
+            json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @freeze_time("2024-12-01 12:45")
+    def test_reorder_signups(self) -> None:
+        trip = self._fcfs_trip(signups=4, maximum_participants=2)
+        one, two = trip.signup_set.filter(on_trip=True)
+        three, four = trip.waitlist.signups
+
+        resp = self._post(
+            trip,
+            {
+                "signups": [
+                    {"id": four.pk},
+                    {"id": two.pk, "deleted": True},
+                    {"id": three.pk},
+                    {"id": one.pk},
+                ],
+                "maximum_participants": 1,
+            },
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        trip.refresh_from_db()
+        self.assertEqual(trip.maximum_participants, 1)
+        self.assertFalse(models.SignUp.objects.filter(pk=two.pk).exists())
+        self.assertEqual(list(trip.signup_set.filter(on_trip=True)), [four])
+        self.assertEqual(list(trip.waitlist.signups), [three, one])
+
+    @freeze_time("2024-12-01 12:45")
+    def test_queries_do_not_scale_with_signups(self) -> None:
+        trip = self._fcfs_trip(signups=30, maximum_participants=20)
+        ordered = list(reversed(trip.on_trip_or_waitlisted))
+
+        with CaptureQueriesContext(connection) as context:
+            resp = self._post(trip, {"signups": [{"id": s.pk} for s in ordered]})
+        self.assertEqual(resp.status_code, 200)
+        # (About half of these are for the session, user, and trip)
+        self.assertLess(len(context.captured_queries), 25)
+
+        self.assertEqual(list(trip.signup_set.filter(on_trip=True)), ordered[:20])
+        self.assertEqual(list(trip.waitlist.signups), ordered[20:])
+
+    @freeze_time("2024-12-01 12:45")
+    def test_signups_changed(self) -> None:
+        trip = self._fcfs_trip(signups=3, maximum_participants=2)
+        first = trip.signup_set.first()
+        assert first is not None
+
+        resp = self._post(trip, {"signups": [{"id": first.pk}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(trip.signup_set.filter(on_trip=True).count(), 2)
+
 
 class RawMembershipStatsviewTest(TestCase):
     def setUp(self):
@@ -5,8 +5,11 @@ from typing import Any
 from zoneinfo import ZoneInfo
 
 from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.db import connection
 from django.http import HttpResponseBase, HttpResponseRedirect
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from freezegun import freeze_time
 
 import ws.utils.perms as perm_utils
@@ -79,6 +82,26 @@ class TripListViewTest(TestCase, Helpers):
         # We just say 'Upcoming trips' (no mention of date)
         self._expect_upcoming_header(soup, "Upcoming trips")
 
+    def test_rows_cached_for_all_viewers(self):
+        cache.clear()
+        trip = factories.TripFactory.create(name="Cached trip", trip_date="2019-02-22")
+        trip.leaders.add(factories.ParticipantFactory.create())
+        self._get("/trips/")
+
+        # Rows rendered for an anonymous user are shared with those logged in.
+        self.client.force_login(factories.UserFactory.create())
+        with CaptureQueriesContext(connection) as context:
+            _response, soup = self._get("/trips/")
+        self.assertIn("Cached trip", soup.find("table").get_text())
+        self.assertFalse(
+            any("ws_trip_leaders" in query["sql"] for query in context.captured_queries)
+        )
+
+        trip.name = "Renamed trip"
+        trip.save()
+        _response, soup = self._get("/trips/")
+        self.assertIn("Renamed trip", soup.find("table").get_text())
+
     def test_invalid_filter(self):
         """When an invalid date is passed, we just ignore it."""
         # Make two trips that are in the future, but before the requested cutoff
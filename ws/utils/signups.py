@@ -1,9 +1,16 @@
 import contextlib
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import NamedTuple
 
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Q, QuerySet
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.http import HttpRequest
+from django.utils import timezone
 
 from ws import models
 
@@ -45,20 +52,21 @@ def add_to_waitlist(
     top_spot: bool = False,
 ) -> models.WaitListSignup:
     """Add the given signup to the waitlist, optionally prioritizing it."""
-    signup.on_trip = False
-    signup.save()
-
-    try:
-        wl_signup = signup.waitlistsignup
-    except models.WaitListSignup.DoesNotExist:
-        wl_signup = models.WaitListSignup.objects.create(
-            signup=signup, waitlist=signup.trip.waitlist
-        )
-        if request:
-            messages.success(request, "Added to waitlist.")
+    with deferred_signup_counts():
+        signup.on_trip = False
+        signup.save()
 
-    if prioritize:
-        _prioritize_wl_signup(wl_signup, top_spot)
+        try:
+            wl_signup = signup.waitlistsignup
+        except models.WaitListSignup.DoesNotExist:
+            wl_signup = models.WaitListSignup.objects.create(
+                signup=signup, waitlist=signup.trip.waitlist
+            )
+            if request:
+                messages.success(request, "Added to waitlist.")
+
+        if prioritize:
+            _prioritize_wl_signup(wl_signup, top_spot)
     return wl_signup
 
 
@@ -92,46 +100,162 @@ def trip_or_wait(
             messages.error(request, "Trip is not an open first-come, first-serve trip")
         return signup
 
-    if not trip.open_slots:  # Trip is full, add to the waiting list
-        add_to_waitlist(signup, request, prioritize, top_spot)
-        return signup
+    with transaction.atomic(), deferred_signup_counts():
+        # Lock the trip so that concurrent signups can't each claim the last spot.
+        # Those waiting on the lock are then placed (or waitlisted) in arrival order.
+        locked_trip = (
+            models.Trip.objects.select_for_update()
+            .only("maximum_participants", "on_trip_count")
+            .get(pk=trip.pk)
+        )
+        if not locked_trip.open_slots:  # Trip is full, add to the waiting list
+            add_to_waitlist(signup, request, prioritize, top_spot)
+            return signup
+
+        signup.on_trip = True
+        signup.save()
+
+        # Since the participant is now on the trip, be sure to remove any waitlist
+        with contextlib.suppress(models.WaitListSignup.DoesNotExist):
+            signup.waitlistsignup.delete()
 
-    signup.on_trip = True
-    signup.save()
     if request:
         messages.success(request, "Signed up!")
+    return signup
 
-    # Since the participant is now on the trip, we should be sure to remove any waitlist
-    with contextlib.suppress(models.WaitListSignup.DoesNotExist):
-        signup.waitlistsignup.delete()
 
-    return signup
+class QueueChanges(NamedTuple):
+    """Signups moved between the trip & its waitlist by a rebalance."""
+
+    promoted: list[models.SignUp]  # Now on the trip
+    demoted: list[models.SignUp]  # Now atop the waitlist
+
+    def __bool__(self) -> bool:
+        return bool(self.promoted or self.demoted)
 
 
-def update_queues_if_trip_open(trip: models.Trip) -> None:
+@transaction.atomic
+def update_queues_if_trip_open(trip: models.Trip) -> QueueChanges:
     """Update queues if the trip is an open, first-come, first-serve trip.
 
     This is intended to be used when the trip size changes (either from changing
     the maximum participants, or from somebody else dropping off).
+
+    The trip is locked while the final split between trip & waitlist is
+    computed, so that concurrent drops & size changes can't double-book spots.
+    All changes are applied in bulk (and no `SignUp` signals are sent);
+    callers can use the returned summary to notify those who moved.
     """
+    changes = QueueChanges(promoted=[], demoted=[])
     if not (trip.signups_open and trip.algorithm == "fcfs"):
+        return changes
+
+    locked_trip = (
+        models.Trip.objects.select_for_update(of=("self",))
+        .select_related("waitlist")
+        .get(pk=trip.pk)
+    )
+    with deferred_signup_counts():
+        _rebalance_queues(locked_trip, changes)
+        if changes:
+            signups_changed(trip_ids=[trip.pk])
+    return changes
+
+
+def _rebalance_queues(trip: models.Trip, changes: QueueChanges) -> None:
+    """Move signups between the (locked) trip and its waitlist, recording changes."""
+    # SignUp's default ordering is the order in which participants made the trip
+    on_trip = list(trip.signup_set.filter(on_trip=True))
+    diff = trip.maximum_participants - len(on_trip)
+    if not diff:
         return
 
-    on_trip = trip.signup_set.filter(on_trip=True)
-    diff = trip.maximum_participants - on_trip.count()
-
-    waitlisted = models.WaitListSignup.objects.filter(signup__trip=trip)
+    # Spread timestamps so that trip ordering (by `last_updated`) is preserved.
+    now = timezone.now()
     if diff > 0:  # Trip is growing, add waitlisted participants if applicable
-        for waitlist_signup in waitlisted[:diff]:
-            trip_or_wait(waitlist_signup.signup)
-    elif diff < 0:  # Trip is shrinking, move lowest signups to waitlist
-        for _ in range(abs(diff)):
-            last = trip.signup_set.filter(on_trip=True).last()
-            assert last is not None  # TODO: Don't use implicit ordering, use `latest()`
-            last.on_trip = False
-            last.save()
-            # Make sure they're at the top!
-            add_to_waitlist(last, prioritize=True, top_spot=True)
+        promoted_wl_signups = list(
+            models.WaitListSignup.objects.filter(signup__trip=trip)
+            .select_related("signup")
+            .order_by(F("manual_order").desc(nulls_last=True), F("time_created"))[:diff]
+        )
+        for i, wl_signup in enumerate(promoted_wl_signups):
+            signup = wl_signup.signup
+            signup.on_trip = True
+            signup.last_updated = now + timedelta(microseconds=i)
+            changes.promoted.append(signup)
+        models.SignUp.objects.bulk_update(changes.promoted, ["on_trip", "last_updated"])
+        models.WaitListSignup.objects.filter(
+            pk__in=[wl_signup.pk for wl_signup in promoted_wl_signups]
+        ).delete()
+    else:  # Trip is shrinking, move lowest signups to the top of the waitlist
+        changes.demoted.extend(on_trip[diff:])
+        for i, signup in enumerate(changes.demoted):
+            signup.on_trip = False
+            signup.last_updated = now + timedelta(microseconds=i)
+        models.SignUp.objects.bulk_update(changes.demoted, ["on_trip", "last_updated"])
+
+        # Those who made the trip first go highest on the waitlist.
+        top = trip.waitlist.first_of_priority
+        wl_signups = models.WaitListSignup.objects.bulk_create(
+            models.WaitListSignup(
+                signup=signup,
+                waitlist=trip.waitlist,
+                manual_order=top + len(changes.demoted) - 1 - i,
+            )
+            for i, signup in enumerate(changes.demoted)
+        )
+        widen_priority_bounds(wl_signups=wl_signups)
+
+
+def apply_ordering(trip: models.Trip, ordered_signups: list[models.SignUp]) -> None:
+    """Place signups on the trip in exactly the given order (any others wait).
+
+    On first-come, first-serve trips, signups fill the trip in order, with the
+    remainder waitlisted (also in order). On other trips, nobody is placed, but
+    any existing waitlist entries are reordered.
+
+    The final state is computed up front & written in bulk (no signals are sent),
+    so callers should hold the trip's lock.
+    """
+    # Any signup on the trip, but absent from this ordering, keeps its spot.
+    if trip.algorithm == "fcfs":
+        others_on_trip = (
+            trip.signup_set.filter(on_trip=True)
+            .exclude(pk__in=[signup.pk for signup in ordered_signups])
+            .count()
+        )
+        spots = max(trip.maximum_participants - others_on_trip, 0)
+    else:
+        spots = 0
+
+    now = timezone.now()
+    waitlist = trip.waitlist
+    waitlisted: list[models.WaitListSignup] = []
+    for order, signup in enumerate(ordered_signups):
+        signup.on_trip = order < spots
+        signup.last_updated = now
+        if signup.on_trip:
+            signup.manual_order = order
+        elif trip.algorithm == "fcfs" or hasattr(signup, "waitlistsignup"):
+            # Negated, since the waitlist is ordered by descending `manual_order`
+            waitlisted.append(
+                models.WaitListSignup(
+                    signup=signup, waitlist=waitlist, manual_order=-order
+                )
+            )
+
+    with deferred_signup_counts():
+        models.SignUp.objects.bulk_update(
+            ordered_signups, ["on_trip", "manual_order", "last_updated"]
+        )
+        # Rebuild the waitlist (ordering is entirely by `manual_order`)
+        models.WaitListSignup.objects.filter(signup__in=ordered_signups).delete()
+        models.WaitListSignup.objects.bulk_create(waitlisted)
+        widen_priority_bounds(
+            signups=[signup for signup in ordered_signups if signup.on_trip],
+            wl_signups=waitlisted,
+        )
+        signups_changed(trip_ids=[trip.pk])
 
 
 def non_trip_participants(trip: models.Trip) -> QuerySet[models.Participant]:
@@ -155,9 +279,153 @@ def _prioritize_wl_signup(
     A standard use case for this is when a participant is displaced by a driver
     (they were on the trip, so they should go to the top of the waitlist).
     """
-    wl = waitlist_signup.waitlist
+    # Lock the waitlist, so that concurrent placements get distinct orders.
+    wl = models.WaitList.objects.select_for_update().get(pk=waitlist_signup.waitlist_id)
+    waitlist_signup.waitlist = wl  # (Bounds are widened on this instance)
     if top_spot:
         waitlist_signup.manual_order = wl.first_of_priority
     else:
         waitlist_signup.manual_order = wl.last_of_priority
     waitlist_signup.save()
+
+
+def widen_priority_bounds(
+    signups: Iterable[models.SignUp] = (),
+    wl_signups: Iterable[models.WaitListSignup] = (),
+) -> None:
+    """Record newly given manual orders in the bounds on their trip & waitlist.
+
+    This keeps `Trip.last_of_priority` (and the waitlist equivalents) from
+    ever needing to inspect the signups themselves.
+    """
+    trip_orders: dict[int, list[int]] = defaultdict(list)
+    trips: dict[int, models.Trip] = {}
+    for signup in signups:
+        if signup.manual_order is not None:
+            trip_orders[signup.trip_id].append(signup.manual_order)
+            if models.SignUp.trip.is_cached(signup):
+                trips[signup.trip_id] = signup.trip
+
+    wl_orders: dict[int, list[int]] = defaultdict(list)
+    waitlists: dict[int, models.WaitList] = {}
+    for wl_signup in wl_signups:
+        if wl_signup.manual_order is not None:
+            wl_orders[wl_signup.waitlist_id].append(wl_signup.manual_order)
+            if models.WaitListSignup.waitlist.is_cached(wl_signup):
+                waitlists[wl_signup.waitlist_id] = wl_signup.waitlist
+
+    for trip_id, orders in trip_orders.items():
+        _widen_trip_bounds(trip_id, max(orders), trips.get(trip_id))
+    for waitlist_id, orders in wl_orders.items():
+        _widen_waitlist_bounds(
+            waitlist_id, max(orders), min(orders), waitlists.get(waitlist_id)
+        )
+
+
+# Bounds only ever widen, so a cached instance which already covers them is trusted.
+# Otherwise, bounds are widened in the database (and on the cached instance).
+# (Postgres ignores nulls in `GREATEST` and `LEAST`)
+def _widen_trip_bounds(trip_id: int, high: int, trip: models.Trip | None) -> None:
+    known = trip.highest_manual_order if trip else None
+    if known is not None and known >= high:
+        return
+    models.Trip.objects.filter(pk=trip_id).update(
+        highest_manual_order=Greatest("highest_manual_order", Value(high))
+    )
+    if trip:
+        trip.highest_manual_order = high
+
+
+def _widen_waitlist_bounds(
+    waitlist_id: int,
+    high: int,
+    low: int,
+    waitlist: models.WaitList | None,
+) -> None:
+    if waitlist:
+        known = (waitlist.highest_manual_order, waitlist.lowest_manual_order)
+        if known[0] is not None and known[1] is not None:
+            high, low = max(high, known[0]), min(low, known[1])
+            if (high, low) == known:
+                return
+    models.WaitList.objects.filter(pk=waitlist_id).update(
+        highest_manual_order=Greatest("highest_manual_order", Value(high)),
+        lowest_manual_order=Least("lowest_manual_order", Value(low)),
+    )
+    if waitlist:
+        waitlist.highest_manual_order = high
+        waitlist.lowest_manual_order = low
+
+
+# Trip signup counts
+# ------------------
+# `Trip.on_trip_count` & `Trip.waitlist_count` are recomputed (in the same
+# transaction) whenever signups change. Signals handle individual saves;
+# anything writing in bulk must call `signups_changed` itself.
+
+# Trips (and waitlists) changed while counts are deferred
+_pending_counts: ContextVar[tuple[set[int], set[int]] | None] = ContextVar(
+    "pending_counts", default=None
+)
+
+
+def signup_counts() -> dict[str, Coalesce]:
+    """Expressions for the actual counts on each trip (to annotate or update)."""
+    signups = models.SignUp.objects.filter(trip=OuterRef("pk")).order_by()
+
+    def count(queryset: QuerySet[models.SignUp]) -> Coalesce:
+        counted = queryset.values("trip").annotate(count=Count("pk")).values("count")
+        return Coalesce(Subquery(counted), 0)
+
+    return {
+        "on_trip_count": count(signups.filter(on_trip=True)),
+        "waitlist_count": count(signups.filter(waitlistsignup__isnull=False)),
+    }
+
+
+def refresh_signup_counts(trips: QuerySet[models.Trip]) -> int:
+    """Recompute the signup counts of the given trips, returning how many."""
+    return trips.update(**signup_counts(), list_version=F("list_version") + 1)
+
+
+def signups_changed(
+    trip_ids: Iterable[int] = (),
+    waitlist_ids: Iterable[int] = (),
+) -> None:
+    """Refresh signup counts for trips (identified directly, or by waitlist)."""
+    pending = _pending_counts.get()
+    if pending is not None:
+        pending[0].update(trip_ids)
+        pending[1].update(waitlist_ids)
+        return
+    _refresh_changed(set(trip_ids), set(waitlist_ids))
+
+
+@contextlib.contextmanager
+def deferred_signup_counts() -> Iterator[None]:
+    """Refresh counts just once (on exit) for every trip whose signups change.
+
+    Counts read within are stale, so only defer code that doesn't need them!
+    """
+    if _pending_counts.get() is not None:  # Refreshed by the outermost block
+        yield
+        return
+
+    trip_ids: set[int] = set()
+    waitlist_ids: set[int] = set()
+    token = _pending_counts.set((trip_ids, waitlist_ids))
+    try:
+        yield
+    finally:
+        _pending_counts.reset(token)
+    _refresh_changed(trip_ids, waitlist_ids)
+
+
+def _refresh_changed(trip_ids: set[int], waitlist_ids: set[int]) -> None:
+    changed = Q()
+    if trip_ids:
+        changed |= Q(pk__in=trip_ids)
+    if waitlist_ids:
+        changed |= Q(waitlist__in=waitlist_ids)
+    if changed:
+        refresh_signup_counts(models.Trip.objects.filter(changed))
@@ -19,6 +19,7 @@ from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, DeleteView
 
+import ws.signups as signup_service
 from ws import forms, models
 from ws.decorators import group_required, user_info_required
 from ws.mixins import LotteryPairingMixin
@@ -49,6 +50,10 @@ class BaseSignUpView(CreateView, LotteryPairingMixin):
         if errors:
             form.errors["__all__"] = ErrorList(errors)
             return self.form_invalid(form)
+        return self.create_signup(form)
+
+    def create_signup(self, form):
+        """Save the (validated) signup."""
         return super().form_valid(form)
 
     def get_errors(self, signup):
@@ -134,6 +139,10 @@ class SignUpView(BaseSignUpView):
             errors.append("Signups aren't open!")
         return errors
 
+    def create_signup(self, form):
+        self.object = signup_service.sign_up(form.instance)
+        return redirect(self.get_success_url())
+
     @method_decorator(user_info_required)
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
@@ -161,3 +170,8 @@ class DeleteSignupView(DeleteView):
         if not drops_allowed:
             raise PermissionDenied
         return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        success_url = self.get_success_url()
+        signup_service.drop(self.object)
+        return redirect(success_url)
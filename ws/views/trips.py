@@ -40,14 +40,14 @@ from django.views.generic import (
     UpdateView,
 )
 
+import ws.signups as signup_service
 import ws.utils.dates as date_utils
 import ws.utils.perms as perm_utils
-import ws.utils.signups as signup_utils
 from ws import enums, forms, models
 from ws.decorators import group_required
 from ws.lottery.run import SingleTripLotteryRunner
 from ws.mixins import TripLeadersOnlyView
-from ws.templatetags.trip_tags import annotated_for_trip_list
+from ws.templatetags.trip_tags import ROW_KEY_FIELDS
 from ws.utils.dates import is_currently_iap, local_date
 from ws.utils.geardb import outstanding_items
 
@@ -156,7 +156,7 @@ class TripView(DetailView):
         Used if the participant has signed up, but wasn't placed.
         """
         signup = self.get_participant_signup()
-        signup_utils.trip_or_wait(signup, self.request, trip_must_be_open=True)
+        signup_service.sign_up(signup, self.request, trip_must_be_open=True)
         return self.get(request)
 
 
@@ -541,8 +541,8 @@ class TripListView(ListView):
         return start_date >= _earliest_allowed_anon_lookback_date()
 
     def get_queryset(self):
-        trips = super().get_queryset()
-        return annotated_for_trip_list(trips)
+        # Trips are rendered mostly from cached rows; load only what finds them.
+        return super().get_queryset().only(*ROW_KEY_FIELDS)
 
     def _optionally_filter_from_args(self) -> tuple[date | None, bool]:
         """Return the date at which we want to omit previous trips, plus validity boolean.